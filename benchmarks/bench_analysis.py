@@ -0,0 +1,254 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark the static analysis of enaml files on a synthetic corpus.
+
+Each benchmark times one phase of the analysis over all the files of the
+corpus. Results can be saved as JSON and compared to a previous run, which
+allows to compare two commits:
+
+    python benchmarks/bench_analysis.py --save before.json
+    git checkout other-commit
+    python benchmarks/bench_analysis.py --compare before.json
+
+"""
+import argparse
+import io
+import json
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import coverage
+from corpus import add_config_arguments, config_from_arguments, write_corpus
+from coverage.data import CoverageData
+
+from enaml_coverage_plugin import clear_analysis_cache
+from enaml_coverage_plugin.analysis import FileAnalysis
+from enaml_coverage_plugin.parser import (
+    EnamlByteParser,
+    EnamlParser,
+    EnamlStatementVisitor,
+)
+
+PLUGIN_NAME = "enaml_coverage_plugin.EnamlCoveragePlugin"
+
+
+class Corpus:
+    """Files to analyse along with artifacts used to set up the benchmarks."""
+
+    def __init__(self, paths: List[pathlib.Path]) -> None:
+        self.paths = [str(p) for p in paths]
+        self.sources = [p.read_text(encoding="utf-8") for p in paths]
+        self._parsers: List[EnamlParser] = []
+
+    @property
+    def parsers(self) -> List[EnamlParser]:
+        """Fully analysed parsers for each file of the corpus."""
+        if not self._parsers:
+            for path, text in zip(self.paths, self.sources):
+                parser = EnamlParser(text=text, filename=path)
+                parser.parse_source()
+                parser.arcs()
+                self._parsers.append(parser)
+        return self._parsers
+
+
+def bench_raw_parse(corpus: Corpus) -> float:
+    """Time EnamlParser._raw_parse, reusing precompiled code objects."""
+    parsers = []
+    for parser in corpus.parsers:
+        new = EnamlParser(text=parser.text, filename=parser.filename)
+        new.unit._code = parser.unit.code
+        parsers.append(new)
+    start = time.perf_counter()
+    for parser in parsers:
+        parser._raw_parse()
+    return time.perf_counter() - start
+
+
+def bench_find_statements(corpus: Corpus) -> float:
+    """Time the discovery of statements from precompiled code objects."""
+    byte_parsers = [EnamlByteParser(p.text, code=p.unit.code) for p in corpus.parsers]
+    start = time.perf_counter()
+    for byte_parser in byte_parsers:
+        set(byte_parser._find_statements())
+    return time.perf_counter() - start
+
+
+def bench_ast_statements(corpus: Corpus) -> float:
+    """Time the discovery of statements from already parsed enaml ASTs."""
+    visitors = [
+        (EnamlStatementVisitor(text=p.text, filename=p.filename), p.unit.ast)
+        for p in corpus.parsers
+    ]
+    start = time.perf_counter()
+    for visitor, ast in visitors:
+        visitor.visit(ast)
+    return time.perf_counter() - start
+
+
+def bench_analyze_ast(corpus: Corpus) -> float:
+    """Time the arc analysis from already parsed enaml ASTs."""
+    parsers = []
+    for parser in corpus.parsers:
+        new = EnamlParser(text=parser.text, filename=parser.filename)
+        new.unit._ast = parser.unit.ast
+        new.unit._code = parser.unit.code
+        new.parse_source()
+        parsers.append(new)
+    start = time.perf_counter()
+    for parser in parsers:
+        parser._analyze_ast()
+    return time.perf_counter() - start
+
+
+def _recorded_arcs(parser: EnamlParser) -> set:
+    """Emulate the arcs recorded while running a file.
+
+    Every line is recorded with its own number so that the translation to the
+    first line of multi-line statements is exercised.
+
+    """
+    arcs = set(parser.arcs())
+    lines = range(1, len(parser.lines) + 1)
+    arcs.update(zip(lines, lines[1:]))
+    return arcs
+
+
+def bench_translate_arcs(corpus: Corpus) -> float:
+    """Time the translation of recorded arcs by the file reporters."""
+    cases = [(FileAnalysis.from_parser(p), _recorded_arcs(p)) for p in corpus.parsers]
+    start = time.perf_counter()
+    for analysis, arcs in cases:
+        analysis.translate_arcs(arcs)
+    return time.perf_counter() - start
+
+
+def _write_data(corpus: Corpus, tmp: str) -> str:
+    """Write fake measurement data of the corpus and return the data file."""
+    data_file = str(pathlib.Path(tmp) / ".coverage")
+    data = CoverageData(data_file)
+    data.add_arcs(
+        {
+            path: set(sorted(_recorded_arcs(parser))[::2])
+            for path, parser in zip(corpus.paths, corpus.parsers)
+        }
+    )
+    data.add_file_tracers({path: PLUGIN_NAME for path in corpus.paths})
+    data.write()
+    return data_file
+
+
+def _load_coverage(data_file: str) -> coverage.Coverage:
+    cov = coverage.Coverage(data_file=data_file, config_file=False, branch=True)
+    cov.set_option("run:plugins", ["enaml_coverage_plugin"])
+    cov.load()
+    return cov
+
+
+def bench_report(corpus: Corpus) -> float:
+    """Time an end-to-end coverage report on fake measurement data."""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = _write_data(corpus, tmp)
+        clear_analysis_cache()
+        start = time.perf_counter()
+        cov = _load_coverage(data_file)
+        cov.report(file=io.StringIO())
+        return time.perf_counter() - start
+
+
+def bench_reports(corpus: Corpus) -> float:
+    """Time text, XML and JSON reports produced one after another."""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = _write_data(corpus, tmp)
+        clear_analysis_cache()
+        start = time.perf_counter()
+        cov = _load_coverage(data_file)
+        cov.report(file=io.StringIO())
+        cov.xml_report(outfile=str(pathlib.Path(tmp) / "coverage.xml"))
+        cov.json_report(outfile=str(pathlib.Path(tmp) / "coverage.json"))
+        return time.perf_counter() - start
+
+
+BENCHMARKS: Dict[str, Callable[[Corpus], float]] = {
+    "raw_parse": bench_raw_parse,
+    "find_statements": bench_find_statements,
+    "ast_statements": bench_ast_statements,
+    "analyze_ast": bench_analyze_ast,
+    "translate_arcs": bench_translate_arcs,
+    "report": bench_report,
+    "reports": bench_reports,
+}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            cwd=pathlib.Path(__file__).parent,
+        ).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--only", action="append", choices=sorted(BENCHMARKS), default=None
+    )
+    parser.add_argument("--save", type=pathlib.Path, help="write results as JSON")
+    parser.add_argument("--compare", type=pathlib.Path, help="JSON results to diff")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = config_from_arguments(args)
+        corpus = Corpus(write_corpus(pathlib.Path(tmp), args.files, config))
+        lines = sum(len(s.splitlines()) for s in corpus.sources)
+        print(f"Corpus: {args.files} files, {lines} lines")
+
+        baseline = {}
+        if args.compare:
+            baseline = json.loads(args.compare.read_text())["results"]
+
+        results = {}
+        for name in args.only or BENCHMARKS:
+            timings = [BENCHMARKS[name](corpus) for _ in range(args.repeat)]
+            results[name] = {
+                "min": min(timings),
+                "median": statistics.median(timings),
+            }
+            line = f"{name:>16}: {results[name]['min'] * 1e3:10.2f} ms"
+            if name in baseline:
+                ratio = results[name]["min"] / baseline[name]["min"]
+                line += f"  ({ratio:.2f}x baseline)"
+            print(line)
+
+    if args.save:
+        meta = {
+            "revision": _git_revision(),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "coverage": coverage.__version__,
+            "corpus": vars(config),
+            "files": args.files,
+        }
+        args.save.write_text(json.dumps({"meta": meta, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Measure the tracing overhead of the plugin on a headless enaml application.
+
+The application, in app_view.enaml, is a window holding a looper of rows, each
+row combining a template instance, a conditional block, several widgets with
+bindings in both directions, a func and many :: handlers. It is shown on Qt's offscreen
+platform and updated repeatedly: every update re-evaluates the subscriptions
+and runs the handlers of every row, the conditional blocks are toggled every
+10 updates and rows are added or removed every 25 updates.
+
+The application runs in a fresh process per mode: without coverage, under
+coverage without the plugin (the .enaml files are then traced as Python
+files, which is the cost of coverage itself) and under coverage with the
+plugin. The slowdown of each mode is reported. The overhead of the plugin is
+the ratio of the time with the plugin to the time under coverage alone, and the exit
+code is non zero if it exceeds --budget.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_app.py --budget 1.25
+
+"""
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+APPLICATION = pathlib.Path(__file__).with_name("app_view.enaml")
+
+CONFIG = """\
+[run]
+{plugins}
+include = {workload}/*
+"""
+
+MODES = ("none", "coverage", "plugin")
+
+
+def run_application(main_cls, row_cls, rows: int, updates: int) -> None:
+    from enaml.qt.QtWidgets import QApplication
+
+    view = main_cls(count=rows)
+    view.show()
+    QApplication.processEvents()
+    for i in range(updates):
+        view.tick = i
+        if i % 25 == 24:
+            view.count = rows + (i // 25) % 3
+        QApplication.processEvents()
+    view.close()
+    QApplication.processEvents()
+
+
+def measure(args: argparse.Namespace) -> None:
+    """Time the application in this process and print the result as JSON."""
+    import coverage
+    import enaml
+    from enaml.qt.qt_application import QtApplication
+
+    workload = pathlib.Path(args.workload)
+    sys.path.insert(0, str(workload))
+    app = QtApplication()  # noqa: F841
+    with enaml.imports():
+        from app_view import Main, Row
+
+    def func():
+        run_application(Main, Row, args.rows, args.updates)
+
+    # Warm up the lazily initialized parts of enaml and Qt.
+    func()
+
+    timings = []
+    cov = None
+    for i in range(args.repeat):
+        if args.mode != "none":
+            cov = coverage.Coverage(
+                data_file=str(workload / f".coverage.{args.mode}.{i}"),
+                config_file=str(workload / f"{args.mode}.rc"),
+            )
+            cov.start()
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            timings.append(time.perf_counter() - start)
+            if cov is not None:
+                cov.stop()
+
+    result = {"duration": min(timings), "lines": 0, "plugin": False}
+    if cov is not None:
+        data = cov.get_data()
+        filename = str(workload / APPLICATION.name)
+        result["lines"] = len(data.lines(filename) or ())
+        result["plugin"] = bool(data.file_tracer(filename))
+    print(json.dumps(result))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="maximal ratio of the time with the plugin to the time without it",
+    )
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--workload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args)
+        return 0
+
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env.pop("COVERAGE_CORE", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        workload = pathlib.Path(tmp)
+        (workload / APPLICATION.name).write_text(APPLICATION.read_text())
+        for mode in MODES[1:]:
+            plugins = "plugins = enaml_coverage_plugin" if mode == "plugin" else ""
+            (workload / f"{mode}.rc").write_text(
+                CONFIG.format(plugins=plugins, workload=workload)
+            )
+
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--workload", tmp]
+                + [f"--rows={args.rows}", f"--updates={args.updates}"]
+                + [f"--repeat={args.repeat}"],
+                env=env,
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            ).stdout
+            results[mode] = json.loads(output.splitlines()[-1])
+
+    base = results["none"]["duration"]
+    for mode, result in results.items():
+        duration = result["duration"]
+        line = f"{mode:>9}: {duration * 1e3:9.1f} ms  ({duration / base:.2f}x)"
+        if mode != "none":
+            line += f"  {result['lines']} lines measured"
+        if mode == "plugin" and not result["plugin"]:
+            line += " (not by the plugin)"
+        print(line)
+    overhead = results["plugin"]["duration"] / results["coverage"]["duration"]
+    print(f"Plugin overhead: {overhead:.2f}x coverage without the plugin")
+
+    if args.budget is not None and overhead > args.budget:
+        print(f"Plugin overhead above the budget of {args.budget:.2f}x")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
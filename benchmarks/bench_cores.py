@@ -0,0 +1,183 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Compare the overhead of the coverage cores on a reactive enaml workload.
+
+The workload is a graph of declarative nodes whose subscriptions, change
+handlers and funcs all run on each update of the graph, each of them being a
+code object compiled from an .enaml file. Each core (ctrace, pytrace and, when
+the interpreter and coverage support it, sysmon) runs in its own process, the
+core being selected through COVERAGE_CORE (and timid for pytrace, which is how
+older coverage versions select it).
+
+Besides the timings, the benchmark reports whether the enaml files were
+measured and attributed to the plugin, since coverage disables file tracer
+plugins with the cores unable to consult them.
+
+"""
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+import coverage
+
+WORKLOAD = """\
+from enaml.core.api import Declarative, Looper
+
+enamldef Node(Declarative): node:
+    attr index: int = 0
+    attr source: int = 0
+    attr double << source * 2 + index
+    attr label << f"node {index}: {double}"
+    attr total: int = 0
+    func bump(delta):
+        return delta + 1
+    source ::
+        node.total += bump(change["value"])
+
+enamldef Graph(Declarative): graph:
+    attr count: int = 10
+    attr tick: int = 0
+    Looper:
+        iterable << range(count)
+        Node:
+            index = loop.index
+            source << graph.tick
+"""
+
+CONFIG = """\
+[run]
+plugins = enaml_coverage_plugin
+timid = {timid}
+include = {workload}/*
+"""
+
+CORES = ("ctrace", "pytrace", "sysmon")
+
+
+def sysmon_available() -> bool:
+    return sys.version_info >= (3, 12) and coverage.version_info >= (7, 4)
+
+
+def run_workload(graph_cls, node_cls, nodes: int, updates: int) -> None:
+    graph = graph_cls(count=nodes)
+    graph.initialize()
+    children = [c for c in graph.traverse() if isinstance(c, node_cls)]
+    for i in range(updates):
+        graph.tick = i
+        # Subscriptions are evaluated lazily, read them to run them.
+        for child in children:
+            child.label
+    graph.destroy()
+
+
+def measure(args: argparse.Namespace) -> None:
+    """Time the workload in this process and print the result as JSON."""
+    import enaml
+
+    workload = pathlib.Path(args.workload)
+    sys.path.insert(0, str(workload))
+    with enaml.imports():
+        from bench_graph import Graph, Node
+
+    def func():
+        run_workload(Graph, Node, args.nodes, args.updates)
+
+    # Warm up the lazily initialized parts of enaml.
+    func()
+
+    timings = []
+    cov = None
+    for i in range(args.repeat):
+        if args.core != "none":
+            cov = coverage.Coverage(
+                data_file=str(workload / f".coverage.{i}"),
+                config_file=str(workload / f"{args.core}.rc"),
+            )
+            cov.start()
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            timings.append(time.perf_counter() - start)
+            if cov is not None:
+                cov.stop()
+
+    result = {"duration": min(timings), "measured": [], "plugin": []}
+    if cov is not None:
+        data = cov.get_data()
+        for filename in sorted(data.measured_files()):
+            if filename.endswith(".enaml"):
+                result["measured"].append(os.path.basename(filename))
+                if data.file_tracer(filename):
+                    result["plugin"].append(os.path.basename(filename))
+    print(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--core", help=argparse.SUPPRESS)
+    parser.add_argument("--workload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.core:
+        measure(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workload = pathlib.Path(tmp)
+        (workload / "bench_graph.enaml").write_text(WORKLOAD)
+        for core in CORES:
+            (workload / f"{core}.rc").write_text(
+                CONFIG.format(timid=core == "pytrace", workload=workload)
+            )
+
+        results = {}
+        for core in ("none",) + CORES:
+            if core == "sysmon" and not sysmon_available():
+                python = ".".join(map(str, sys.version_info[:2]))
+                print(
+                    f"{core:>8}: unavailable with Python {python} "
+                    f"and coverage {coverage.__version__}"
+                )
+                continue
+            env = dict(os.environ)
+            env.pop("COVERAGE_CORE", None)
+            if core != "none":
+                env["COVERAGE_CORE"] = core
+            output = subprocess.run(
+                [sys.executable, __file__, "--core", core, "--workload", tmp]
+                + [f"--nodes={args.nodes}", f"--updates={args.updates}"]
+                + [f"--repeat={args.repeat}"],
+                env=env,
+                check=True,
+                stdout=subprocess.PIPE,
+                text=True,
+            ).stdout
+            results[core] = json.loads(output.splitlines()[-1])
+
+    base = results["none"]["duration"]
+    for core, result in results.items():
+        duration = result["duration"]
+        line = f"{core:>8}: {duration * 1e3:9.1f} ms  ({duration / base:.2f}x)"
+        if core != "none":
+            measured = ", ".join(result["measured"]) or "nothing"
+            line += f"  measured {measured}"
+            line += "  (plugin)" if result["plugin"] else "  (no plugin)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
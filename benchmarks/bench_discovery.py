@@ -0,0 +1,92 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark the discovery of the enaml files of a large source tree.
+
+A tree of packages is generated, each holding a few enaml and Python files,
+along with the directories a monorepo accumulates: bytecode caches, a virtual
+environment and VCS metadata. The enaml files are found with os.walk, as a
+naive walk would, and with the finder of the plugin, first without listings
+and then with the listings persisted by a previous run.
+
+    python benchmarks/bench_discovery.py --packages 2000
+
+"""
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from enaml_coverage_plugin.discovery import EnamlFileFinder
+
+
+def generate_tree(root: pathlib.Path, packages: int, depth: int) -> None:
+    for i in range(packages):
+        parts = [f"level{(i >> (3 * d)) % 8}" for d in range(depth)]
+        package = root.joinpath(*parts, f"package{i}")
+        (package / "__pycache__").mkdir(parents=True)
+        (package / "__enamlcache__").mkdir()
+        for j in range(3):
+            (package / f"view{j}.enaml").write_text(
+                "enamldef Main(Window):\n    pass\n"
+            )
+            (package / f"module{j}.py").write_text("")
+            (package / "__pycache__" / f"module{j}.pyc").write_text("")
+            (package / "__enamlcache__" / f"view{j}.enamlc").write_text("")
+    for name in (".git/objects", ".venv/lib/python3/site-packages/enaml"):
+        directory = root / name
+        for i in range(packages):
+            (directory / f"{i}").mkdir(parents=True)
+            (directory / f"{i}" / "widget.enaml").write_text("")
+    # Keep the listings out of the racy window.
+    mtime = time.time() - 60
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (mtime, mtime))
+
+
+def walk(root: str):
+    return sorted(
+        os.path.join(dirpath, f)
+        for dirpath, _, filenames in os.walk(root)
+        for f in filenames
+        if f.endswith(".enaml")
+    )
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packages", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp) / "src"
+        generate_tree(root, args.packages, args.depth)
+        listings = os.path.join(tmp, "cache", "discovery.json")
+
+        naive, everything = timed(lambda: walk(str(root)))
+        cold_finder = EnamlFileFinder(listings)
+        cold, found = timed(lambda: cold_finder.find(str(root)))
+        warm_finder = EnamlFileFinder(listings)
+        warm, cached = timed(lambda: warm_finder.find(str(root)))
+        assert found == cached
+
+    print(f"Tree: {args.packages} packages, {len(found)} enaml files found")
+    print(f"os.walk:         {naive * 1e3:8.1f} ms ({len(everything)} files)")
+    print(f"Finder, cold:    {cold * 1e3:8.1f} ms ({cold_finder.scans} listings)")
+    print(f"Finder, cached:  {warm * 1e3:8.1f} ms ({warm_finder.scans} listings)")
+
+
+if __name__ == "__main__":
+    main()
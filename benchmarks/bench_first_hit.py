@@ -0,0 +1,145 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Compare the overhead of full tracing and of the first-hit mode.
+
+The reactive workload of bench_cores runs without coverage, with coverage
+tracing every line of the enaml files, with the first_hit option of the
+plugin, in which coverage still traces the Python files, and with the
+first-hit recorder alone, which is how long-running sessions only measuring
+the enaml files would use it. Each measure runs in its own process so that
+the recorder starts with no code object seen. The number of lines reported
+as executed is printed for each mode, the first-hit modes finding the same
+lines on this workload since its code objects run all their lines.
+
+The first-hit modes require sys.monitoring (Python 3.12+).
+
+    python benchmarks/bench_first_hit.py --nodes 50 --updates 200
+
+"""
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+import coverage
+from bench_cores import WORKLOAD, run_workload
+
+from enaml_coverage_plugin.cores import HAS_SYS_MONITORING
+from enaml_coverage_plugin.firsthit import RECORDER
+from enaml_coverage_plugin.reporter import EnamlFileReporter
+
+CONFIG = """\
+[run]
+plugins = enaml_coverage_plugin
+include = {workload}/*
+
+[enaml_coverage_plugin]
+first_hit = {first_hit}
+"""
+
+MODES = ("none", "full", "first_hit", "recorder")
+
+
+def measure(args: argparse.Namespace) -> None:
+    """Time the workload in this process and print the result as JSON."""
+    import enaml
+
+    workload = pathlib.Path(args.workload)
+    sys.path.insert(0, str(workload))
+    with enaml.imports():
+        from bench_graph import Graph, Node
+
+    cov = None
+    if args.mode == "recorder":
+        RECORDER.start()
+    elif args.mode != "none":
+        cov = coverage.Coverage(
+            data_file=str(workload / f".coverage.{args.mode}"),
+            config_file=str(workload / f"{args.mode}.rc"),
+        )
+        cov.start()
+    timings = []
+    try:
+        # The first run imports and executes each code object for the first
+        # time, it is timed separately from the steady state.
+        for _ in range(args.repeat + 1):
+            start = time.perf_counter()
+            run_workload(Graph, Node, args.nodes, args.updates)
+            timings.append(time.perf_counter() - start)
+    finally:
+        if cov is not None:
+            cov.stop()
+
+    result = {"first": timings[0], "duration": min(timings[1:]), "lines": 0}
+    filename = str(workload / "bench_graph.enaml")
+    if args.mode in ("first_hit", "recorder"):
+        # The data of the first_hit option is only saved at exit.
+        RECORDER.stop()
+        reporter = EnamlFileReporter(filename)
+        result["lines"] = len(RECORDER.executed_lines(filename, reporter))
+    elif cov is not None:
+        result["lines"] = len(cov.get_data().lines(filename) or ())
+    print(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--workload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workload = pathlib.Path(tmp)
+        (workload / "bench_graph.enaml").write_text(WORKLOAD)
+        for mode in MODES[1:]:
+            (workload / f"{mode}.rc").write_text(
+                CONFIG.format(workload=workload, first_hit=mode == "first_hit")
+            )
+
+        results = {}
+        for mode in MODES:
+            if mode in ("first_hit", "recorder") and not HAS_SYS_MONITORING:
+                python = ".".join(map(str, sys.version_info[:2]))
+                print(f"{mode:>9}: unavailable with Python {python}")
+                continue
+            env = dict(os.environ)
+            env.pop("COVERAGE_CORE", None)
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--workload", tmp]
+                + [f"--nodes={args.nodes}", f"--updates={args.updates}"]
+                + [f"--repeat={args.repeat}"],
+                env=env,
+                check=True,
+                stdout=subprocess.PIPE,
+                text=True,
+            ).stdout
+            results[mode] = json.loads(output.splitlines()[-1])
+
+    base = results["none"]["duration"]
+    for mode, result in results.items():
+        duration = result["duration"]
+        line = f"{mode:>9}: {duration * 1e3:9.1f} ms  ({duration / base:.2f}x)"
+        line += f"  first run {result['first'] * 1e3:9.1f} ms"
+        if mode != "none":
+            line += f"  {result['lines']} lines executed"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Measure the cost of loading the plugin when coverage starts.
+
+Coverage loads the plugin in every process it measures (xdist workers,
+patched subprocesses), where only the file tracer is needed. The plugin is
+loaded as coverage does in a fresh interpreter run with ``-X importtime``,
+coverage itself being imported first since it is loaded anyway. The
+cumulative import time of the plugin and the heavy modules it pulled in are
+reported. With --max-ms, the exit code is non zero if the import is slower
+than the budget or if a module of the analysis stack was imported, which
+allows to use the benchmark as a regression guard in CI.
+
+    python benchmarks/bench_import.py --repeat 5 --max-ms 50
+
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+#: Modules only needed to analyse the files, which measuring must not import.
+ANALYSIS_MODULES = (
+    "atom",
+    "enaml.core.parser",
+    "enaml.core.enaml_compiler",
+    "enaml_coverage_plugin.parser",
+    "enaml_coverage_plugin.reporter",
+)
+
+SCRIPT = """\
+import coverage
+import enaml_coverage_plugin
+
+class Registry:
+    def add_file_tracer(self, plugin):
+        pass
+
+    def add_configurer(self, plugin):
+        pass
+
+enaml_coverage_plugin.coverage_init(Registry(), {})
+"""
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times() -> Tuple[Dict[str, int], List[str]]:
+    """Cumulative import time of the top-level modules imported by the script."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        check=True,
+        stderr=subprocess.PIPE,
+        text=True,
+    ).stderr
+    cumulative: Dict[str, int] = {}
+    modules = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules.append(match.group(4))
+            if len(match.group(3)) == 1:
+                cumulative[match.group(4)] = int(match.group(2))
+    return cumulative, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="fail above this import time")
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.repeat):
+        cumulative, modules = import_times()
+        timings.append(
+            sum(
+                us
+                for name, us in cumulative.items()
+                if name.startswith("enaml_coverage_plugin")
+            )
+            / 1e3
+        )
+    heavy = sorted(
+        m for m in modules if any(m.startswith(prefix) for prefix in ANALYSIS_MODULES)
+    )
+    duration = min(timings)
+    print(
+        f"Plugin import: {duration:.1f} ms (median {statistics.median(timings):.1f} ms,"
+        f" {len(modules)} modules imported in total)"
+    )
+    print(f"Analysis modules imported: {', '.join(heavy) or 'none'}")
+
+    if args.max_ms is not None and (duration > args.max_ms or heavy):
+        print(f"Over budget ({args.max_ms} ms) or analysis modules imported")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark the re-analysis of a large enaml file after editing one handler.
+
+A single large module is generated and analysed once, then one line is added
+to a handler of the enamldef in the middle of the file, which shifts all the
+following lines. The edited file is analysed again from scratch and
+incrementally, reusing the analyses of the unchanged blocks, and both results
+are checked to be identical.
+
+    python benchmarks/bench_incremental.py --enamldefs 40
+
+"""
+import argparse
+import time
+
+from corpus import add_config_arguments, config_from_arguments, generate_module
+
+from enaml_coverage_plugin.analysis import FileAnalysis
+from enaml_coverage_plugin.blocks import BlockCache
+from enaml_coverage_plugin.parser import EnamlParser
+
+FILENAME = "bench_incremental.enaml"
+
+
+def analyse(text: str, blocks, arcs: bool) -> FileAnalysis:
+    parser = EnamlParser(
+        text=text, filename=FILENAME, line_only=not arcs, blocks=blocks
+    )
+    parser.parse_source()
+    return FileAnalysis.from_parser(parser, arcs=arcs)
+
+
+def timed(text: str, blocks, arcs: bool):
+    start = time.perf_counter()
+    analysis = analyse(text, blocks, arcs)
+    return time.perf_counter() - start, analysis
+
+
+def edit_handler(text: str, enamldefs: int) -> str:
+    """Add a statement to the first handler of the middle enamldef."""
+    marker = f"enamldef View{enamldefs // 2}("
+    start = text.index(marker)
+    handler = text.index("        label_text = str(counter)\n", start)
+    return text[:handler] + "        print(counter)\n" + text[handler:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--line-only", action="store_true", help="skip the arcs")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_arguments(args)
+    arcs = not args.line_only
+
+    text = generate_module(config)
+    edited = edit_handler(text, config.enamldefs)
+    print(f"Module: {len(text.splitlines())} lines, {config.enamldefs} enamldefs")
+
+    blocks = BlockCache()
+    cold, _ = timed(text, blocks, arcs)
+    misses = blocks.misses
+    full, expected = timed(edited, None, arcs)
+    incremental, analysis = timed(edited, blocks, arcs)
+    assert analysis.to_dict() == expected.to_dict(), "incremental analysis differs"
+
+    print(f"Incremental analysis, cold: {cold * 1e3:9.1f} ms ({misses} blocks)")
+    print(f"Full re-analysis:           {full * 1e3:9.1f} ms")
+    print(
+        f"Incremental re-analysis:    {incremental * 1e3:9.1f} ms "
+        f"({blocks.misses - misses} block re-analysed, {full / incremental:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
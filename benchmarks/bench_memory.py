@@ -0,0 +1,64 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Measure the memory used by the file reporters while reporting on a corpus.
+
+Coverage creates the reporters of all the files before analysing them one
+after the other and keeps them all alive until the end of the report. This
+benchmark reproduces this pattern and measures with tracemalloc the peak
+memory and the memory still retained by the reporters once all the files have
+been analysed. Comparing parser cache sizes shows the cost of keeping the
+full parser state around:
+
+    python benchmarks/bench_memory.py --files 200 --parser-cache-size 1000
+
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+import tracemalloc
+
+from corpus import add_config_arguments, config_from_arguments, write_corpus
+
+from enaml_coverage_plugin.reporter import EnamlFileReporter, ParserCache
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--parser-cache-size", type=int, default=8)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_corpus(pathlib.Path(tmp), args.files, config_from_arguments(args))
+        lines = sum(len(p.read_text(encoding="utf-8").splitlines()) for p in paths)
+        print(f"Corpus: {args.files} files, {lines} lines")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        parsers = ParserCache(args.parser_cache_size)
+        reporters = [EnamlFileReporter(str(p), parsers=parsers) for p in paths]
+        for reporter in reporters:
+            reporter.lines()
+            reporter.arcs()
+            reporter.exit_counts()
+        duration = time.perf_counter() - start
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    mib = 1024 * 1024
+    print(f"Parser cache size: {args.parser_cache_size}")
+    print(f"Analysis time, slowed down by tracemalloc: {duration:.2f} s")
+    print(f"Peak memory: {peak / mib:.1f} MiB")
+    print(f"Retained memory: {retained / mib:.1f} MiB")
+    print(f"Retained per file: {retained / len(reporters) / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Measure the saving brought by sharing a parsed unit across analysis steps.
+
+The legacy behavior is emulated by handing out a fresh parsed unit each time an
+analysis step asks for one, which leads to the enaml AST being built twice, for
+the statements and for the arcs, while the shared unit builds it once.
+
+"""
+import argparse
+import pathlib
+import time
+
+from enaml_coverage_plugin.parser import EnamlParsedUnit, EnamlParser
+
+DATA = pathlib.Path(__file__).parent.parent / "tests" / "data" / "test_simple.enaml"
+
+
+class LegacyEnamlParser(EnamlParser):
+    """Parser re-doing the parsing for each analysis step."""
+
+    @property
+    def unit(self) -> EnamlParsedUnit:
+        return EnamlParsedUnit(self.text, self.filename)
+
+
+def make_source(copies: int) -> str:
+    """Build a large enaml source by duplicating the test enamldef."""
+    header, _, body = DATA.read_text(encoding="utf-8").partition("enamldef Main")
+    return header + "".join(f"enamldef Main{i}" + body for i in range(copies))
+
+
+def analyse(parser_cls, text: str) -> float:
+    """Run a full analysis (statements and arcs) and return its duration."""
+    start = time.perf_counter()
+    parser = parser_cls(text=text, filename="bench.enaml")
+    parser.parse_source()
+    parser.arcs()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--copies", type=int, default=200)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    text = make_source(args.copies)
+    print(f"Source: {len(text.splitlines())} lines")
+    results = {}
+    for name, parser_cls in (("legacy", LegacyEnamlParser), ("shared", EnamlParser)):
+        results[name] = min(analyse(parser_cls, text) for _ in range(args.repeat))
+        print(f"{name:>8}: {results[name] * 1e3:8.1f} ms")
+    saving = 1 - results["shared"] / results["legacy"]
+    print(f"  saving: {saving:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Measure the cost of mapping relocated enaml code to its sources.
+
+The application of bench_app.py is compiled to __enamlcache__ in a build
+directory, which is then deployed without its sources: the code refers to the
+build directory, which is removed, and the plugin maps it to a copy of the
+sources. The application runs in a fresh process per mode, under coverage
+with the plugin:
+
+- in place: imported from the sources, traced with a static filename
+- relocated: imported from the deployment, the source is resolved once per
+  filename
+- not memoised: imported from the deployment, the source is searched on
+  every frame
+
+The cost of a single call to dynamic_source_filename, memoised or not, is
+measured as well.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_relocation.py
+
+"""
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import types
+
+from bench_app import APPLICATION, run_application
+
+CONFIG = """\
+[run]
+plugins = enaml_coverage_plugin
+source = {sources}
+"""
+
+COMPILE = """\
+import sys
+
+import enaml
+
+sys.path.insert(0, sys.argv[1])
+with enaml.imports():
+    import app_view
+"""
+
+MODES = {"in place": "sources", "relocated": "deploy", "not memoised": "deploy"}
+
+
+def disable_memoisation() -> None:
+    """Search the source of the relocated code on every frame."""
+    from enaml_coverage_plugin import plugin, relocation
+
+    def dynamic_source_filename(self, filename, frame):
+        return self._relocate(self._filename, frame.f_globals.get("__name__"))
+
+    plugin.EnamlRelocatedFileTracer.dynamic_source_filename = dynamic_source_filename
+    relocation.SourceResolver.resolve = relocation.SourceResolver.search
+
+
+def measure(args: argparse.Namespace) -> None:
+    """Time the application in this process and print the result as JSON."""
+    import coverage
+    import enaml
+    from enaml.qt.qt_application import QtApplication
+
+    root = pathlib.Path(args.root)
+    sys.path.insert(0, str(root / MODES[args.mode]))
+    if args.mode == "not memoised":
+        disable_memoisation()
+    app = QtApplication()  # noqa: F841
+    with enaml.imports():
+        from app_view import Main, Row
+
+    def func():
+        run_application(Main, Row, args.rows, args.updates)
+
+    # Warm up the lazily initialized parts of enaml and Qt.
+    func()
+
+    timings = []
+    for i in range(args.repeat):
+        cov = coverage.Coverage(
+            data_file=str(root / f".coverage.{i}"),
+            config_file=str(root / "coverage.rc"),
+        )
+        cov.start()
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            timings.append(time.perf_counter() - start)
+            cov.stop()
+
+    data = cov.get_data()
+    filename = str(root / "sources" / APPLICATION.name)
+    result = {"duration": min(timings), "lines": len(data.lines(filename) or ())}
+    print(json.dumps(result))
+
+
+def time_callback(number: int) -> None:
+    """Time a call to dynamic_source_filename, memoised or not."""
+    from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = pathlib.Path(tmp) / "app" / "views"
+        sources.mkdir(parents=True)
+        (sources / "view.enaml").touch()
+        plugin = EnamlCoveragePlugin({"include_roots": tmp})
+        filename = "/build/worker/app/views/view.enaml"
+        frame = types.SimpleNamespace(f_globals={"__name__": "app.views.view"})
+        tracer = plugin.file_tracer(filename)
+        assert tracer.dynamic_source_filename(None, frame) == str(
+            sources / "view.enaml"
+        )
+        memoised = timeit.timeit(
+            lambda: tracer.dynamic_source_filename(None, frame), number=number
+        )
+        resolver = plugin._resolver
+        searched = timeit.timeit(
+            lambda: resolver.search(filename, "app.views.view"), number=number
+        )
+    print(f"{'callback':>13}: {memoised / number * 1e9:9.0f} ns memoised")
+    print(f"{'':>13}  {searched / number * 1e9:9.0f} ns searched")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--number", type=int, default=100000)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args)
+        return
+
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env.pop("COVERAGE_CORE", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp)
+        build = root / "build"
+        build.mkdir()
+        shutil.copy(APPLICATION, build)
+        subprocess.run([sys.executable, "-c", COMPILE, str(build)], check=True)
+        shutil.copytree(
+            build, root / "deploy", ignore=shutil.ignore_patterns("*.enaml")
+        )
+        shutil.move(str(build), str(root / "sources"))
+        shutil.rmtree(root / "sources" / "__enamlcache__")
+        (root / "coverage.rc").write_text(CONFIG.format(sources=root / "sources"))
+
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--root", tmp]
+                + [f"--rows={args.rows}", f"--updates={args.updates}"]
+                + [f"--repeat={args.repeat}"],
+                env=env,
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            ).stdout
+            results[mode] = json.loads(output.splitlines()[-1])
+
+    base = results["in place"]["duration"]
+    for mode, result in results.items():
+        duration = result["duration"]
+        print(
+            f"{mode:>13}: {duration * 1e3:9.1f} ms  ({duration / base:.2f}x)"
+            f"  {result['lines']} lines measured"
+        )
+    time_callback(args.number)
+
+
+if __name__ == "__main__":
+    main()
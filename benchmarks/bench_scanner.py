@@ -0,0 +1,59 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark the scanner used by EnamlParser._raw_parse on growing modules.
+
+The time per line should stay flat as the number of enamldefs grows. The
+tokenize based pass the scanner replaced is timed for reference.
+
+"""
+import argparse
+import io
+import time
+import tokenize
+from typing import Callable
+
+from corpus import CorpusConfig, generate_module
+
+from enaml_coverage_plugin.scanner import scan_source
+
+
+def _tokenize(text: str) -> None:
+    for _ in tokenize.generate_tokens(io.StringIO(text).readline):
+        pass
+
+
+def _scan(text: str) -> None:
+    scan_source(text, set())
+
+
+def _best(func: Callable[[str], None], text: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--enamldefs", type=int, nargs="+", default=[10, 50, 200, 800])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'enamldefs':>10} {'lines':>8} {'scanner':>14} {'tokenize':>14}")
+    for count in args.enamldefs:
+        text = generate_module(CorpusConfig(enamldefs=count))
+        lines = len(text.splitlines())
+        scan = _best(_scan, text, args.repeat) / lines * 1e6
+        tokens = _best(_tokenize, text, args.repeat) / lines * 1e6
+        print(f"{count:>10} {lines:>8} {scan:>9.2f} us/l {tokens:>9.2f} us/l")
+
+
+if __name__ == "__main__":
+    main()
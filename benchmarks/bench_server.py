@@ -0,0 +1,112 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark the per-file latency of the analysis server against cold jobs.
+
+A synthetic corpus is analysed once by an analysis server started in its own
+process. Each file is then reported on by a fresh process, which is what a
+report job, an html job or an IDE gutter refresh does: the process either
+analyses the file itself or asks the warm server. The latency of a request
+to the server from a warm process is reported as well.
+
+    python benchmarks/bench_server.py --files 10
+
+"""
+import argparse
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from corpus import add_config_arguments, config_from_arguments, write_corpus
+
+from enaml_coverage_plugin.cache import source_digest
+from enaml_coverage_plugin.exclusion import LinePatterns
+from enaml_coverage_plugin.server import AnalysisClient
+from enaml_coverage_plugin.source import read_source
+
+JOB = """\
+import sys
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+EnamlCoveragePlugin({"server": sys.argv[2]}).file_reporter(sys.argv[1]).lines()
+"""
+
+
+def wait_for(path: str, timeout: float = 30.0) -> None:
+    """Wait until a server accepts connections on the socket `path`."""
+    deadline = time.monotonic() + timeout
+    while True:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(path)
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+        time.sleep(0.05)
+
+
+def cold_jobs(paths: List[pathlib.Path], server: str) -> float:
+    """Mean duration of a fresh process reporting on one file."""
+    start = time.perf_counter()
+    for path in paths:
+        subprocess.run([sys.executable, "-c", JOB, str(path), server], check=True)
+    return (time.perf_counter() - start) / len(paths)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=10)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_arguments(args)
+
+    with tempfile.TemporaryDirectory(prefix="enaml-") as tmp:
+        paths = write_corpus(pathlib.Path(tmp) / "corpus", args.files, config)
+        socket_path = os.path.join(tmp, "server.sock")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "enaml_coverage_plugin", "serve"]
+            + ["--socket", socket_path],
+            cwd=tmp,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            wait_for(socket_path)
+            client = AnalysisClient(socket_path)
+            patterns = LinePatterns()
+            digests = [source_digest(read_source(str(p))) for p in paths]
+
+            start = time.perf_counter()
+            for path, digest in zip(paths, digests):
+                assert client.analyse(str(path), digest, patterns, True) is not None
+            first = (time.perf_counter() - start) / len(paths)
+            start = time.perf_counter()
+            for path, digest in zip(paths, digests):
+                client.analyse(str(path), digest, patterns, True)
+            warm = (time.perf_counter() - start) / len(paths)
+            client.close()
+
+            alone = cold_jobs(paths, os.path.join(tmp, "missing.sock"))
+            served = cold_jobs(paths, socket_path)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"Corpus: {args.files} files")
+    print("Per-file latency:")
+    print(f"  cold process, in-process analysis: {alone * 1e3:8.1f} ms")
+    print(f"  cold process, warm server:         {served * 1e3:8.1f} ms")
+    print(f"  server, first analysis:            {first * 1e3:8.1f} ms")
+    print(f"  server, analysis in memory:        {warm * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark the tracing overhead of a widget heavy enaml workload.
+
+The workload builds a form made of many fields from the enaml standard library
+and updates the model they are bound to, which executes the bindings defined
+in the enaml stdlib. The workload is timed without coverage, under coverage
+with the default trace scope of the plugin (which ignores the enaml stdlib)
+and under coverage with an empty exclusion scope. The time needed to report
+on the collected data is measured as well.
+
+Coverage is configured to include the enaml stdlib, as happens when enaml is
+not installed in site-packages or when the measured sources span it, so that
+the difference only comes from the plugin.
+
+"""
+import argparse
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import coverage
+import enaml
+
+WORKLOAD = """\
+from enaml.core.api import Looper
+from enaml.widgets.api import Container
+from enaml.stdlib.fields import FloatField, IntField
+
+enamldef Form(Container): form:
+    attr count: int = 10
+    attr tick: int = 0
+    Looper:
+        iterable << range(count)
+        IntField:
+            value << form.tick + loop.index
+        FloatField:
+            value << (form.tick + loop.index) / 2
+"""
+
+CONFIG = """\
+[run]
+plugins = enaml_coverage_plugin
+timid = {timid}
+include =
+    {workload}/*
+    {stdlib}/*
+
+[enaml_coverage_plugin]
+{scope}
+"""
+
+
+def run_workload(form_cls, fields: int, updates: int) -> None:
+    form = form_cls(count=fields)
+    form.initialize()
+    # Create the widgets, which read the values of the bindings.
+    form.activate_proxy()
+    for i in range(updates):
+        form.tick = i
+    form.destroy()
+
+
+def timed(func: Callable[[], None], cov: Optional[coverage.Coverage]) -> float:
+    start = time.perf_counter()
+    if cov is not None:
+        cov.start()
+    try:
+        func()
+    finally:
+        if cov is not None:
+            cov.stop()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fields", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timid", action="store_true", help="use the Python tracer")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from enaml.qt.qt_application import QtApplication
+
+    app = QtApplication()  # noqa: F841
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workload = pathlib.Path(tmp) / "workload"
+        workload.mkdir()
+        (workload / "bench_form.enaml").write_text(WORKLOAD)
+        sys.path.insert(0, str(workload))
+        with enaml.imports():
+            from bench_form import Form
+
+        def func():
+            run_workload(Form, args.fields, args.updates)
+
+        # Warm up the lazily initialized parts of enaml and Qt.
+        func()
+
+        stdlib = os.path.join(os.path.dirname(enaml.__file__), "stdlib")
+        scopes = {
+            "default scope": "",
+            "no exclusion": "exclude_roots =",
+        }
+        results: Dict[str, float] = {}
+        reports: Dict[str, float] = {}
+        measured: Dict[str, List[str]] = {}
+        results["no coverage"] = min(timed(func, None) for _ in range(args.repeat))
+        for name, scope in scopes.items():
+            rc = pathlib.Path(tmp) / f"{name.replace(' ', '_')}.rc"
+            rc.write_text(
+                CONFIG.format(
+                    timid=args.timid, workload=workload, stdlib=stdlib, scope=scope
+                )
+            )
+            timings = []
+            for i in range(args.repeat):
+                cov = coverage.Coverage(
+                    data_file=str(pathlib.Path(tmp) / f".coverage.{i}"),
+                    config_file=str(rc),
+                )
+                timings.append(timed(func, cov))
+            results[name] = min(timings)
+
+            start = time.perf_counter()
+            cov.report(file=io.StringIO())
+            reports[name] = time.perf_counter() - start
+            measured[name] = sorted(
+                os.path.basename(f)
+                for f in cov.get_data().measured_files()
+                if f.endswith(".enaml")
+            )
+
+    base = results["no coverage"]
+    for name, duration in results.items():
+        line = f"{name:>14}: {duration * 1e3:9.1f} ms  ({duration / base:.2f}x)"
+        if name in reports:
+            line += f"  report {reports[name] * 1e3:9.1f} ms"
+            line += f"  measured {', '.join(measured[name])}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
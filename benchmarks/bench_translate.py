@@ -0,0 +1,89 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark the translation of recorded lines and arcs on a huge enaml file.
+
+A large module is generated and every one of its lines is considered as
+recorded, along with several arcs per line, which mimics the data collected
+on huge generated files. The translation through the array-backed first line
+index is compared to a per-element lookup in the multiline dict, which is how
+coverage's PythonParser translates lines and arcs.
+
+    python benchmarks/bench_translate.py --enamldefs 200
+
+"""
+import argparse
+import time
+from typing import Callable, Dict
+
+from corpus import add_config_arguments, config_from_arguments, generate_module
+
+from enaml_coverage_plugin.analysis import FileAnalysis
+from enaml_coverage_plugin.scanner import scan_source
+
+
+def dict_translation(multiline: Dict[int, int]):
+    """Reference translation, looking up each line in the multiline dict."""
+
+    def first_line(lineno: int) -> int:
+        if lineno < 0:
+            return -multiline.get(-lineno, -lineno)
+        return multiline.get(lineno, lineno)
+
+    def translate_lines(lines):
+        return {first_line(line) for line in lines}
+
+    def translate_arcs(arcs):
+        return {(first_line(a), first_line(b)) for (a, b) in arcs}
+
+    return translate_lines, translate_arcs
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    add_config_arguments(parser)
+    parser.set_defaults(enamldefs=200)
+    args = parser.parse_args()
+
+    text = generate_module(config_from_arguments(args))
+    count = text.count("\n") + 1
+    multiline = scan_source(text, set()).multiline
+    lines = set(range(1, count + 1))
+    arcs = {(a, b) for a in range(1, count) for b in (a + 1, a + 2, -a)}
+    arcs |= {(-a, a) for a in range(1, count)}
+    print(f"Module: {count} lines, {len(multiline)} in multi-line statements")
+    print(f"Recorded: {len(lines)} lines, {len(arcs)} arcs")
+
+    ref_lines, ref_arcs = dict_translation(multiline)
+    analysis = FileAnalysis(multiline=multiline, statements=lines)
+    build = best_of(lambda: FileAnalysis(multiline=multiline).first_lines, 1)
+    assert analysis.translate_lines(lines) == ref_lines(lines)
+    assert analysis.translate_arcs(arcs) == ref_arcs(arcs)
+
+    results = {
+        "lines (dict)": best_of(lambda: ref_lines(lines), args.repeat),
+        "lines (index)": best_of(lambda: analysis.translate_lines(lines), args.repeat),
+        "arcs (dict)": best_of(lambda: ref_arcs(arcs), args.repeat),
+        "arcs (index)": best_of(lambda: analysis.translate_arcs(arcs), args.repeat),
+    }
+    print(f"{'index build':>14}: {build * 1e3:8.2f} ms")
+    for name, duration in results.items():
+        print(f"{name:>14}: {duration * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Benchmark the traversal of enaml ASTs feeding the arc analysis.
+
+The explicit-stack walk of the plugin is compared to the recursive
+ASTVisitor it replaced, both collecting the Python code analysed for arcs, on
+three kinds of files:
+
+- a large generated module, as found in real code bases
+- a pathologically nested view, each level holding a few bindings and a
+  handler. enaml's parser needs a raised recursion limit beyond about 50
+  levels, the traversals run with the default limit.
+- an AST built directly, much deeper than the recursion limit
+
+    python benchmarks/bench_visitor.py --nesting 400 --synthetic-depth 5000
+
+"""
+import argparse
+import sys
+import time
+from typing import Callable, List
+
+from atom.api import Typed
+from corpus import add_config_arguments, config_from_arguments, generate_module
+from enaml.core.enaml_ast import ASTVisitor, ChildDef, Module, PythonModule
+from enaml.core.parser import parse
+
+from enaml_coverage_plugin.parser import enaml_python_code
+
+
+class RecursiveVisitor(ASTVisitor):
+    """The recursive visitor previously used by the plugin."""
+
+    code = Typed(list, ())
+
+    def default_visit(self, node, *args, **kwargs):
+        pass
+
+    def visit_body(self, node, *args, **kwargs):
+        for n in node.body:
+            self.visit(n, *args, **kwargs)
+
+    visit_Module = visit_body
+    visit_EnamlDef = visit_body
+    visit_ChildDef = visit_body
+    visit_TemplateInst = visit_body
+    visit_Template = visit_body
+
+    def visit_PythonModule(self, node, *args, **kwargs):
+        self.code.append(node.ast)
+
+    def visit_FuncDef(self, node, *args, **kwargs):
+        self.code.append(node.funcdef)
+
+    def visit_operator_like_node(self, node, *args, **kwargs):
+        if node.expr and isinstance(node.expr.value, PythonModule):
+            self.visit(node.expr.value, *args, **kwargs)
+
+    visit_Binding = visit_operator_like_node
+    visit_StorageExpr = visit_operator_like_node
+
+
+def recursive_python_code(root) -> List:
+    visitor = RecursiveVisitor()
+    visitor.visit(root)
+    return visitor.code
+
+
+def nested_module(depth: int) -> str:
+    """Generate a view whose widgets are nested `depth` levels deep."""
+    lines = ["from enaml.widgets.api import Container, Window", ""]
+    lines += ["enamldef Main(Window):"]
+    for level in range(1, depth + 1):
+        indent = "    " * level
+        lines += [
+            f"{indent}Container:",
+            f"{indent}    attr value{level} = {level}",
+            f"{indent}    attr double{level} << value{level} * 2",
+            f"{indent}    value{level} ::",
+            f"{indent}        if change['value']:",
+            f"{indent}            print(change)",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+LEAF = """\
+enamldef Main(Window):
+    attr a = 1
+    a ::
+        print(change)
+"""
+
+
+def synthetic_module(depth: int) -> Module:
+    """Build an AST of ChildDef nested `depth` levels deep around a module."""
+    leaf = parse(LEAF, "leaf.enaml")
+    node = leaf.body[0]
+    for _ in range(depth):
+        node = ChildDef(typename="Container", body=[node], lineno=1)
+    return Module(body=[node])
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--nesting", type=int, default=400)
+    parser.add_argument("--synthetic-depth", type=int, default=5000)
+    add_config_arguments(parser)
+    parser.set_defaults(enamldefs=200)
+    args = parser.parse_args()
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100 * args.nesting))
+    try:
+        nested = parse(nested_module(args.nesting), "nested.enaml")
+    finally:
+        sys.setrecursionlimit(limit)
+    cases = {
+        "generated": parse(generate_module(config_from_arguments(args)), "gen.enaml"),
+        f"nested ({args.nesting})": nested,
+        f"synthetic ({args.synthetic_depth})": synthetic_module(args.synthetic_depth),
+    }
+    for name, root in cases.items():
+        code = enaml_python_code(root)
+        walk = best_of(lambda: enaml_python_code(root), args.repeat)
+        try:
+            assert recursive_python_code(root) == code
+            recursive = best_of(lambda: recursive_python_code(root), args.repeat)
+        except RecursionError:
+            result = f"RecursionError (limit {sys.getrecursionlimit()})"
+        else:
+            result = f"{recursive * 1e3:8.3f} ms ({recursive / walk:.1f}x)"
+        print(f"{name:>18}: {len(code):5} code nodes")
+        print(f"{'explicit stack':>18}: {walk * 1e3:8.3f} ms")
+        print(f"{'recursive':>18}: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Generator of synthetic enaml modules used to benchmark the plugin.
+
+The generated modules are valid enaml (they can be compiled) and exercise the
+constructs the plugin has to analyse: many enamldefs, deeply nested children,
+templates, operators (=, :=, <<, >>, ::), func and async func definitions and
+large Python blocks.
+
+Run as a script to write a corpus to a directory.
+
+"""
+import argparse
+import pathlib
+import random
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass
+class CorpusConfig:
+    """Parameters controlling the size and shape of a generated module."""
+
+    #: Number of enamldef per module.
+    enamldefs: int = 10
+
+    #: Nesting depth of the children of each enamldef.
+    depth: int = 4
+
+    #: Number of children at each nesting level.
+    children: int = 2
+
+    #: Number of :: handlers per enamldef.
+    handlers: int = 3
+
+    #: Number of func and async func definitions per enamldef.
+    funcs: int = 2
+
+    #: Number of templates per module.
+    templates: int = 2
+
+    #: Number of Python functions in the module level Python block.
+    python_functions: int = 10
+
+    #: Seed of the random generator used to vary the generated code.
+    seed: int = 0
+
+
+HEADER = '''\
+"""Synthetic enaml module generated for benchmarking purposes.
+
+"""
+from enaml.widgets.api import Window, Container, Label, Field, PushButton
+from enaml.core.api import Looper, Conditional
+'''
+
+
+def _indent(lines: List[str], level: int) -> List[str]:
+    prefix = "    " * level
+    return [prefix + line if line else line for line in lines]
+
+
+def _python_body(rng: random.Random, name: str) -> List[str]:
+    """Generate the body of a function containing a mix of branches."""
+    lines = ["total = 0"]
+    for i in range(rng.randint(2, 4)):
+        kind = rng.choice(("if", "for", "while", "try", "multiline"))
+        if kind == "if":
+            lines += [
+                f"if a > {i}:",
+                f"    total += a * {i}",
+                f"elif b < {i}:",
+                "    total -= b",
+                "else:",
+                "    total += 1",
+            ]
+        elif kind == "for":
+            lines += [
+                f"for k in range({i + 2}):",
+                "    if k % 2:",
+                "        continue",
+                "    total += k",
+            ]
+        elif kind == "while":
+            lines += [
+                "n = a",
+                "while n > 0:",
+                "    n -= 1",
+                "    if n == b:",
+                "        break",
+            ]
+        elif kind == "try":
+            lines += [
+                "try:",
+                "    total += a // (b - a)",
+                "except ZeroDivisionError:",
+                "    total = -1",
+                "finally:",
+                "    total += 0",
+            ]
+        else:
+            lines += [
+                "values = [",
+                f"    {name!r},",
+                "    a,",
+                "    b,",
+                "]",
+                "total += len(values)",
+            ]
+    lines.append("return total")
+    return lines
+
+
+def _python_block(rng: random.Random, config: CorpusConfig) -> List[str]:
+    lines = []
+    for i in range(config.python_functions):
+        lines += [f"def helper_{i}(a, b):"]
+        lines += _indent(_python_body(rng, f"helper_{i}"), 1)
+        lines.append("")
+    lines += [
+        "class Model(object):",
+        '    """Plain Python class."""',
+        "",
+        "    def value(self, a, b=1):",
+        "        return helper_0(a, b)",
+        "",
+    ]
+    return lines
+
+
+def _template(index: int) -> List[str]:
+    return [
+        f"template Labeled{index}(Text):",
+        "    Label:",
+        "        text = Text",
+        "",
+        f"template Rows{index}(N, Content):",
+        "    Container:",
+        "        Looper:",
+        "            iterable = range(N)",
+        "            Content:",
+        "                pass",
+        "",
+    ]
+
+
+def _children(
+    rng: random.Random, config: CorpusConfig, prefix: str, depth: int
+) -> List[str]:
+    lines: List[str] = []
+    for i in range(config.children):
+        name = f"{prefix}_{i}"
+        if depth >= config.depth:
+            kind = rng.choice(("label", "field", "button"))
+            if kind == "label":
+                lines += [
+                    f"Label: {name}:",
+                    "    text << 'v %d' % counter",
+                    "    text >> label_text",
+                ]
+            elif kind == "field":
+                lines += [
+                    f"Field: {name}:",
+                    "    text := label_text",
+                    "    enabled << counter > 2 and (",
+                    "        counter < 10",
+                    "    )",
+                ]
+            else:
+                lines += [
+                    f"PushButton: {name}:",
+                    f"    text = {name!r}",
+                    "    clicked ::",
+                    "        counter += 1",
+                    "        if counter > 5:",
+                    "            fired()",
+                ]
+        else:
+            lines += [f"Container: {name}:", "    padding = 0"]
+            if config.templates and rng.random() < 0.3:
+                t = rng.randrange(config.templates)
+                lines += [f"    Labeled{t}({name!r}):", "        pass"]
+            lines += _indent(_children(rng, config, name, depth + 1), 1)
+    return lines
+
+
+def _enamldef(rng: random.Random, config: CorpusConfig, index: int) -> List[str]:
+    lines = [
+        f"enamldef View{index}(Window): view{index}:",
+        f'    """Generated view number {index}."""',
+        "    attr counter: int = 0",
+        "    attr label_text = 'x'",
+        "    event fired",
+    ]
+    for i in range(config.funcs):
+        lines.append(f"    func compute_{i}(a, b):")
+        lines += _indent(_python_body(rng, f"compute_{i}"), 2)
+        lines += [
+            f"    async func load_{i}():",
+            f"        return await compute_{i}(1, 2)",
+        ]
+    for i in range(config.handlers):
+        lines += [
+            "    fired ::" if i == 0 else f"    counter :: # handler {i}",
+            "        label_text = str(counter)",
+            "        for i in range(counter):",
+            "            if i > 3:",
+            "                break",
+            "        else:",
+            "            print('done')",
+        ]
+    lines += _indent(["Container:"] + _indent(_children(rng, config, "w", 1), 1), 1)
+    if config.templates:
+        lines += [f"        Rows{rng.randrange(config.templates)}(3, Label):"]
+        lines += ["            pass"]
+    lines.append("")
+    return lines
+
+
+def generate_module(config: CorpusConfig) -> str:
+    """Generate the source of an enaml module."""
+    rng = random.Random(config.seed)
+    lines = HEADER.splitlines() + [""]
+    lines += _python_block(rng, config)
+    for i in range(config.templates):
+        lines += _template(i)
+    for i in range(config.enamldefs):
+        lines += _enamldef(rng, config, i)
+    return "\n".join(lines)
+
+
+def write_corpus(
+    directory: pathlib.Path, files: int, config: CorpusConfig
+) -> List[pathlib.Path]:
+    """Write `files` generated modules to `directory`."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(files):
+        config.seed = i
+        path = directory / f"view_{i}.enaml"
+        path.write_text(generate_module(config), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options describing a corpus to a command line parser."""
+    defaults = CorpusConfig()
+    for name in CorpusConfig.__dataclass_fields__:
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=int,
+            default=getattr(defaults, name),
+            dest=name,
+        )
+
+
+def config_from_arguments(args: argparse.Namespace) -> CorpusConfig:
+    """Build a corpus configuration from parsed command line arguments."""
+    return CorpusConfig(
+        **{name: getattr(args, name) for name in CorpusConfig.__dataclass_fields__}
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", type=pathlib.Path)
+    parser.add_argument("--files", type=int, default=10)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    paths = write_corpus(args.directory, args.files, config_from_arguments(args))
+    lines = sum(len(p.read_text(encoding="utf-8").splitlines()) for p in paths)
+    print(f"Wrote {len(paths)} files ({lines} lines) to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,55 @@
 """Plugin providing coverage support for enaml files.
 
 """
+from typing import Any, Dict, Optional, Sequence
 
 
 def coverage_init(reg, options):
     """Register the enaml plugin."""
     from .plugin import EnamlCoveragePlugin
 
-    reg.add_file_tracer(EnamlCoveragePlugin())
+    plugin = EnamlCoveragePlugin(options)
+    reg.add_file_tracer(plugin)
+    reg.add_configurer(plugin)
+
+
+def analyze_many(
+    paths: Sequence[str],
+    workers: Optional[int] = None,
+    **kwargs: Any,
+) -> Dict[str, Dict[str, Any]]:
+    """Analyse enaml files in parallel and return their serialized analyses.
+
+    See enaml_coverage_plugin.batch.analyze_many for the supported keyword
+    arguments.
+
+    """
+    from .batch import analyze_many
+
+    return analyze_many(paths, workers, **kwargs)
+
+
+def clear_analysis_cache() -> None:
+    """Discard the analyses shared by the reports produced in this process.
+
+    The analyses of the enaml files are kept in memory for the life of the
+    process, so that producing several reports does not analyse the files
+    again. Edited files are analysed again anyway.
+
+    """
+    from .cache import MEMORY_CACHE
+
+    MEMORY_CACHE.clear()
+
+
+def record_first_hits(data_file: str = ".coverage") -> None:
+    """Record which code objects of the enaml files run, without coverage.
+
+    The lines of the code objects which ran are saved when the process exits to
+    a suffixed `data_file`, to merge with ``coverage combine --append``. This
+    requires sys.monitoring (Python 3.12+), RuntimeError is raised otherwise.
+
+    """
+    from .firsthit import start_recording
+
+    start_recording(data_file)
@@ -0,0 +1,222 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Command line interface of the enaml coverage plugin.
+
+``python -m enaml_coverage_plugin precompute <dirs>`` analyses all the enaml
+files found in the given directories and stores their analyses in the
+on-disk cache, using the settings of the coverage configuration file, so that
+a later report starts with all the files already analysed.
+
+``python -m enaml_coverage_plugin export`` analyses the enaml files measured
+in a coverage data file and writes their analyses to a sidecar of the data
+file, which lets reporting work where enaml is not installed.
+
+``python -m enaml_coverage_plugin serve`` starts a long-lived server keeping
+the analyses in memory and answering the report jobs on a Unix socket.
+
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+PLUGIN = "enaml_coverage_plugin"
+
+
+def find_enaml_files(roots: Iterable[str]) -> List[str]:
+    """Collect the enaml files found in files and directories, sorted."""
+    from .discovery import EnamlFileFinder
+
+    finder = EnamlFileFinder()
+    paths = set()
+    for root in roots:
+        if os.path.isfile(root):
+            paths.add(os.path.abspath(root))
+        else:
+            paths.update(finder.find(root))
+    return sorted(paths)
+
+
+def precompute(args: argparse.Namespace) -> int:
+    """Analyse enaml files ahead of time and store the analyses in the cache."""
+    import coverage
+
+    from .batch import analyze_many
+    from .cache import AnalysisCache
+    from .exclusion import LinePatterns
+
+    config = coverage.Coverage(config_file=args.rcfile).config
+    options: Dict[str, Any] = dict(config.get_plugin_options(PLUGIN))
+    if args.cache_dir:
+        options["cache_dir"] = args.cache_dir
+    cache = AnalysisCache.from_options(options)
+    if cache is None:
+        print(
+            "No cache directory: set the cache_dir option of the plugin, the "
+            "ENAML_COVERAGE_CACHE_DIR environment variable or use --cache-dir.",
+            file=sys.stderr,
+        )
+        return 2
+
+    paths = find_enaml_files(args.paths)
+    start = time.perf_counter()
+    results = analyze_many(
+        paths,
+        args.workers or int(options.get("workers") or 0) or None,
+        patterns=LinePatterns.from_config(config, options),
+        branch=bool(config.get_option("run:branch")),
+        cache=cache,
+    )
+    duration = time.perf_counter() - start
+
+    errors = {path: r["error"] for path, r in results.items() if "error" in r}
+    for path, error in errors.items():
+        print(f"{path}: {error}", file=sys.stderr)
+    print(
+        f"Analysed {len(results)} enaml files in {duration:.2f} s "
+        f"({len(errors)} errors), cache: {cache.directory}"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output)
+    return 0
+
+
+def export(args: argparse.Namespace) -> int:
+    """Export the analyses of the measured enaml files to a sidecar."""
+    import coverage
+    from coverage.data import CoverageData
+
+    from .cache import AnalysisCache
+    from .exclusion import LinePatterns
+    from .firsthit import PLUGIN_NAME
+    from .sidecar import export_sidecar, sidecar_path
+
+    config = coverage.Coverage(config_file=args.rcfile).config
+    options: Dict[str, Any] = dict(config.get_plugin_options(PLUGIN))
+    if args.cache_dir:
+        options["cache_dir"] = args.cache_dir
+    data_file = args.data_file or str(config.get_option("run:data_file"))
+    if args.paths:
+        paths = find_enaml_files(args.paths)
+    else:
+        data = CoverageData(basename=data_file)
+        data.read()
+        paths = sorted(
+            f for f in data.measured_files() if data.file_tracer(f) == PLUGIN_NAME
+        )
+    output = args.output or options.get("sidecar") or sidecar_path(data_file)
+    start = time.perf_counter()
+    sidecar = export_sidecar(
+        paths,
+        output,
+        args.workers or int(options.get("workers") or 0) or None,
+        patterns=LinePatterns.from_config(config, options),
+        cache=AnalysisCache.from_options(options),
+    )
+    duration = time.perf_counter() - start
+    print(
+        f"Exported the analyses of {len(sidecar)} of {len(paths)} enaml files "
+        f"to {output} in {duration:.2f} s"
+    )
+    return 0 if len(sidecar) == len(paths) else 1
+
+
+def serve(args: argparse.Namespace) -> int:
+    """Run an analysis server until interrupted."""
+    import coverage
+
+    from .cache import AnalysisCache
+    from .server import HAS_UNIX_SOCKETS, AnalysisServer, socket_path_from_options
+
+    config = coverage.Coverage(config_file=args.rcfile).config
+    options: Dict[str, Any] = dict(config.get_plugin_options(PLUGIN))
+    if args.cache_dir:
+        options["cache_dir"] = args.cache_dir
+    path = args.socket or socket_path_from_options(options)
+    if not HAS_UNIX_SOCKETS or not path:
+        print(
+            "No socket: set the server option of the plugin, the "
+            "ENAML_COVERAGE_SERVER environment variable or use --socket. The "
+            "server requires Unix sockets.",
+            file=sys.stderr,
+        )
+        return 2
+    try:
+        server = AnalysisServer(path, cache=AnalysisCache.from_options(options))
+    except OSError as err:
+        print(err, file=sys.stderr)
+        return 1
+    print(f"Serving the analyses of enaml files on {path}", flush=True)
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog=f"python -m {PLUGIN}")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser(
+        "precompute", help="analyse enaml files ahead of reporting"
+    )
+    command.add_argument("paths", nargs="+", help="directories or enaml files")
+    command.add_argument(
+        "--rcfile",
+        default=True,
+        help="coverage configuration file, found as coverage does by default",
+    )
+    command.add_argument("--cache-dir", help="override the cache_dir option")
+    command.add_argument(
+        "--workers", type=int, help="number of processes, 1 to analyse serially"
+    )
+    command.add_argument("--output", help="also write the analyses to a JSON file")
+    command.set_defaults(func=precompute)
+    command = commands.add_parser(
+        "export", help="export the analyses of the measured enaml files"
+    )
+    command.add_argument(
+        "paths",
+        nargs="*",
+        help="directories or enaml files, defaults to the measured files",
+    )
+    command.add_argument(
+        "--rcfile",
+        default=True,
+        help="coverage configuration file, found as coverage does by default",
+    )
+    command.add_argument("--data-file", help="override the data_file run setting")
+    command.add_argument(
+        "--output", help="sidecar file, defaults to <data file>-enaml.json.gz"
+    )
+    command.add_argument("--cache-dir", help="override the cache_dir option")
+    command.add_argument(
+        "--workers", type=int, help="number of processes, 1 to analyse serially"
+    )
+    command.set_defaults(func=export)
+    command = commands.add_parser(
+        "serve", help="serve the analyses of enaml files on a Unix socket"
+    )
+    command.add_argument(
+        "--rcfile",
+        default=True,
+        help="coverage configuration file, found as coverage does by default",
+    )
+    command.add_argument("--socket", help="override the server option")
+    command.add_argument("--cache-dir", help="override the cache_dir option")
+    command.set_defaults(func=serve)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
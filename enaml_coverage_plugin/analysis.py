@@ -0,0 +1,325 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Compact results of the static analysis of an enaml file.
+
+"""
+import collections
+import sys
+from array import array
+from typing import Any, Counter, Dict, Iterable, Mapping, Optional, Sequence, Set, Tuple
+
+from coverage import version_info as coverage_version
+from coverage.misc import NotPython
+
+TArc = Tuple[int, int]
+
+TArcFragments = Mapping[TArc, Sequence[Tuple[Optional[str], Optional[str]]]]
+
+#: Number of code objects loaded from (hits) or not found in (misses) the
+#: __enamlcache__ directories written by enaml import hooks.
+ENAML_CACHE_STATS: Counter[str] = collections.Counter()
+
+#: Separator of the description of a missing arc and of its cause, as written
+#: by the coverage version in use.
+_BECAUSE = " because " if coverage_version >= (7, 5) else ", because "
+
+
+class NotEnaml(NotPython):
+    """Exception raised when parsing fails on enaml file."""
+
+    pass
+
+
+def _lines(lines: Iterable[int]) -> "array[int]":
+    """Store line numbers as a sorted array of ints."""
+    return array("i", sorted(lines))
+
+
+def _intern(fragment: Optional[str]) -> Optional[str]:
+    """Share the fragments of message found in many files."""
+    return sys.intern(fragment) if fragment is not None else None
+
+
+class FirstLineIndex:
+    """Dense map of line numbers to the first line of their statement.
+
+    The map is an array holding the first line of each line from 0 to `size`
+    - 1 followed by the one of each negative line (exits) from -`size` to -1,
+    so that negative indexing of the array maps negative lines directly. Lines
+    out of the index are their own first line.
+
+    Most lines are the first line of their statement, so sets of lines and of
+    arcs are translated by only mapping the lines belonging to a multi-line
+    statement, the others being kept as they are by set operations.
+
+    """
+
+    __slots__ = ("_index", "_size", "_moved", "_moved_lines")
+
+    def __init__(self, multiline: Dict[int, int]) -> None:
+        size = max(multiline, default=0) + 1
+        index = array("i", range(size))
+        index.extend(range(-size, 0))
+        for line, first_line in multiline.items():
+            index[line] = first_line
+            index[-line] = -first_line
+        self._index = index
+        self._size = size
+        # Lines, and exits, which are not the first line of their statement.
+        self._moved_lines = frozenset(
+            line for line, first_line in multiline.items() if line != first_line
+        )
+        self._moved = self._moved_lines | {-line for line in self._moved_lines}
+
+    def first_line(self, lineno: int) -> int:
+        """Return the first line number of the statement including `lineno`."""
+        if -self._size <= lineno < self._size:
+            return self._index[lineno]
+        return lineno
+
+    def translate_lines(self, lines: Iterable[int]) -> Set[int]:
+        """Map the line numbers in `lines` to the first line of their statement."""
+        if not isinstance(lines, (set, frozenset)):
+            lines = set(lines)
+        moved = self._moved_lines.intersection(lines)
+        translated = set(lines)
+        if moved:
+            translated -= moved
+            translated.update(map(self._index.__getitem__, moved))
+        return translated
+
+    def translate_arcs(self, arcs: Iterable[TArc]) -> Set[TArc]:
+        """Map both ends of the arcs in `arcs` to the first line of a statement."""
+        if not isinstance(arcs, (set, frozenset)):
+            arcs = set(arcs)
+        moved = self._moved
+        affected = [arc for arc in arcs if arc[0] in moved or arc[1] in moved]
+        translated = set(arcs)
+        if affected:
+            # The other end of an affected arc may be out of the index.
+            first_line = self.first_line
+            translated.difference_update(affected)
+            translated.update((first_line(a), first_line(b)) for a, b in affected)
+        return translated
+
+
+class FileAnalysis:
+    """Everything a file reporter needs to know about an enaml file.
+
+    An analysis is either built from a parser or restored from its serialized
+    form, which allows to reuse it without parsing the file again. Files which
+    cannot be parsed are represented by an analysis carrying an error message.
+    Analyses used for line coverage only do not include the arcs, which is
+    indicated by `has_arcs`.
+
+    To keep analyses compact, lines and arcs are stored as arrays of ints,
+    from which the sets expected by coverage are built on access, and the
+    fragments of the missing arc messages are interned.
+
+    """
+
+    __slots__ = (
+        "_statements",
+        "_excluded",
+        "multiline",
+        "_arcs",
+        "_exit_lines",
+        "_exit_counts",
+        "missing_arc_fragments",
+        "_no_branch",
+        "has_arcs",
+        "error",
+        "_first_lines",
+    )
+
+    def __init__(
+        self,
+        statements: Iterable[int] = (),
+        excluded: Iterable[int] = (),
+        multiline: Optional[Dict[int, int]] = None,
+        arcs: Iterable[TArc] = (),
+        exit_counts: Optional[Dict[int, int]] = None,
+        missing_arc_fragments: Optional[TArcFragments] = None,
+        no_branch: Iterable[int] = (),
+        has_arcs: bool = True,
+        error: Optional[str] = None,
+    ) -> None:
+        self._statements = _lines(statements)
+        self._excluded = _lines(excluded)
+        self.multiline: Dict[int, int] = multiline or {}
+        self._arcs = array("i", [line for arc in sorted(set(arcs)) for line in arc])
+        exit_counts = exit_counts or {}
+        self._exit_lines = _lines(exit_counts)
+        self._exit_counts = array("i", [exit_counts[k] for k in self._exit_lines])
+        self.missing_arc_fragments: TArcFragments = {
+            arc: tuple((_intern(s), _intern(e)) for s, e in fragments)
+            for arc, fragments in (missing_arc_fragments or {}).items()
+        }
+        self._no_branch = _lines(no_branch)
+        self.has_arcs = has_arcs
+        self.error = error
+        self._first_lines: Optional[FirstLineIndex] = None
+
+    @property
+    def statements(self) -> Set[int]:
+        """Executable lines."""
+        return set(self._statements)
+
+    @property
+    def excluded(self) -> Set[int]:
+        """Excluded executable lines."""
+        return set(self._excluded)
+
+    @property
+    def arcs(self) -> Set[TArc]:
+        """Possible arcs between lines, exits being negative line numbers."""
+        arcs = self._arcs
+        return set(zip(arcs[::2], arcs[1::2]))
+
+    @property
+    def exit_counts(self) -> Dict[int, int]:
+        """Number of exits from each line."""
+        return dict(zip(self._exit_lines, self._exit_counts))
+
+    @property
+    def no_branch(self) -> Set[int]:
+        """Lines excused from branch coverage."""
+        return set(self._no_branch)
+
+    @classmethod
+    def from_parser(
+        cls, parser, no_branch: Iterable[int] = (), arcs: bool = True
+    ) -> "FileAnalysis":
+        """Collect the results of a parser on which parse_source was called.
+
+        The arcs are only analysed if `arcs` is True.
+
+        """
+        if not arcs:
+            return cls(
+                statements=parser.statements,
+                excluded=parser.excluded,
+                multiline=dict(parser._multiline),
+                no_branch=no_branch,
+                has_arcs=False,
+            )
+        return cls(
+            statements=parser.statements,
+            excluded=parser.excluded,
+            multiline=dict(parser._multiline),
+            arcs=parser.arcs(),
+            exit_counts=dict(parser.exit_counts()),
+            missing_arc_fragments=dict(parser._missing_arc_fragments),
+            no_branch=no_branch,
+        )
+
+    @classmethod
+    def from_error(cls, error: str) -> "FileAnalysis":
+        """Create the analysis of a file which could not be parsed."""
+        return cls(error=error)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FileAnalysis":
+        """Restore an analysis from the output of to_dict."""
+        if data.get("error") is not None:
+            return cls.from_error(data["error"])
+        return cls(
+            statements=data["statements"],
+            excluded=data["excluded"],
+            multiline={int(k): v for k, v in data["multiline"]},
+            arcs=(tuple(a) for a in data["arcs"]),
+            exit_counts={int(k): v for k, v in data["exit_counts"]},
+            missing_arc_fragments={
+                (s, e): [tuple(f) for f in fragments]
+                for s, e, fragments in data["missing_arc_fragments"]
+            },
+            no_branch=data["no_branch"],
+            has_arcs=data.get("has_arcs", True),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the analysis to JSON serializable builtin types."""
+        if self.error is not None:
+            return {"error": self.error}
+        return {
+            "statements": self._statements.tolist(),
+            "excluded": self._excluded.tolist(),
+            "multiline": sorted(self.multiline.items()),
+            "arcs": sorted(self.arcs),
+            "exit_counts": sorted(self.exit_counts.items()),
+            "missing_arc_fragments": [
+                [s, e, [list(f) for f in fragments]]
+                for (s, e), fragments in sorted(self.missing_arc_fragments.items())
+            ],
+            "no_branch": self._no_branch.tolist(),
+            "has_arcs": self.has_arcs,
+        }
+
+    @property
+    def first_lines(self) -> FirstLineIndex:
+        """Index of the first lines, built on first use."""
+        if self._first_lines is None:
+            self._first_lines = FirstLineIndex(self.multiline)
+        return self._first_lines
+
+    def first_line(self, lineno: int) -> int:
+        """Return the first line number of the statement including `lineno`."""
+        return self.first_lines.first_line(lineno)
+
+    def translate_lines(self, lines: Iterable[int]) -> Set[int]:
+        """Map the line numbers in `lines` to the first line of their statement."""
+        return self.first_lines.translate_lines(lines)
+
+    def translate_arcs(self, arcs: Iterable[TArc]) -> Set[TArc]:
+        """Map both ends of the arcs in `arcs` to the first line of a statement."""
+        return self.first_lines.translate_arcs(arcs)
+
+    def missing_arc_description(
+        self,
+        start: int,
+        end: int,
+        executed_arcs: Optional[Iterable[TArc]] = None,
+    ) -> str:
+        """Provide an English sentence describing a missing arc.
+
+        This mirrors PythonParser.missing_arc_description.
+
+        """
+        fragments = self.missing_arc_fragments
+        actual_start = start
+
+        if (
+            executed_arcs
+            and end < 0
+            and end == -start
+            and (end, start) not in executed_arcs
+            and (end, start) in fragments
+        ):
+            # It's a one-line callable, and we never even started it,
+            # and we have a message about not starting it.
+            start, end = end, start
+
+        msgs = []
+        for smsg, emsg in fragments.get((start, end), [(None, None)]):
+            if emsg is None:
+                if end < 0:
+                    # Hmm, maybe we have a one-line callable, let's check.
+                    if (-end, end) in fragments:
+                        return self.missing_arc_description(-end, end)
+                    emsg = "didn't jump to the function exit"
+                else:
+                    emsg = "didn't jump to line {lineno}"
+            emsg = emsg.format(lineno=end)
+
+            msg = f"line {actual_start} {emsg}"
+            if smsg is not None:
+                msg += _BECAUSE + smsg.format(lineno=actual_start)
+
+            msgs.append(msg)
+
+        return " or ".join(msgs)
@@ -0,0 +1,164 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Analysis of many enaml files at once using a pool of processes.
+
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+from .analysis import FileAnalysis
+from .cache import AnalysisCache
+from .exclusion import LinePatterns
+
+if TYPE_CHECKING:
+    from .reporter import EnamlFileReporter
+
+#: Minimal number of files for which a process pool is worth starting.
+DEFAULT_PARALLEL_THRESHOLD = 8
+
+
+def _analyse_file(
+    filename: str, patterns: Optional[LinePatterns], branch: bool
+) -> Optional[Dict[str, Any]]:
+    """Analyse a file in a worker and return the serialized analysis.
+
+    Unexpected errors are not reported here, the file will be analysed again
+    in the main process which will report them.
+
+    """
+    from .reporter import EnamlFileReporter
+
+    try:
+        reporter = EnamlFileReporter(filename, patterns=patterns, branch=branch)
+        return reporter._analyse().to_dict()
+    except Exception:
+        return None
+
+
+def analyse_files(
+    filenames: Sequence[str],
+    workers: Optional[int] = None,
+    patterns: Optional[LinePatterns] = None,
+    branch: bool = True,
+) -> List[Optional[FileAnalysis]]:
+    """Analyse enaml files in a process pool.
+
+    Returns the analyses in the order of `filenames`, None standing for files
+    whose analysis failed or for all files if the pool could not be used.
+
+    """
+    workers = min(workers or os.cpu_count() or 1, len(filenames))
+    if workers < 1:
+        return []
+    chunksize = max(1, len(filenames) // (workers * 4))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(
+                    _analyse_file,
+                    filenames,
+                    itertools.repeat(patterns),
+                    itertools.repeat(branch),
+                    chunksize=chunksize,
+                )
+            )
+    except (OSError, BrokenProcessPool):
+        return [None] * len(filenames)
+    return [FileAnalysis.from_dict(r) if r is not None else None for r in results]
+
+
+def analyze_many(
+    paths: Sequence[str],
+    workers: Optional[int] = None,
+    patterns: Optional[LinePatterns] = None,
+    branch: bool = True,
+    cache: Optional[AnalysisCache] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Analyse enaml files and return their serialized analyses by path.
+
+    The analyses are the output of FileAnalysis.to_dict, files which cannot be
+    analysed being described by an error entry, which is flagged as
+    unexpected unless the file could not be parsed. The files are analysed in a
+    pool of `workers` processes unless `workers` is 1. When a cache is given,
+    the analyses it holds are reused and the new ones are stored in it under
+    the keys used by the file reporters, so that reporting with the same
+    settings does not need to analyse the files again.
+
+    """
+    from .reporter import EnamlFileReporter
+
+    reporters = [
+        EnamlFileReporter(path, cache=cache, patterns=patterns, branch=branch)
+        for path in paths
+    ]
+    if workers != 1:
+        batch = BatchAnalyser(workers=workers, threshold=2)
+        for reporter in reporters:
+            batch.register(reporter)
+        batch.run()
+
+    results = {}
+    for path, reporter in zip(paths, reporters):
+        try:
+            if not reporter._load_cached_analysis():
+                reporter._set_analysis(reporter._analyse())
+            analysis = reporter._analysis
+            assert analysis is not None
+            results[path] = analysis.to_dict()
+        except Exception as err:
+            # Unexpected errors are reported without being cached.
+            results[path] = {
+                "error": f"{type(err).__name__}: {err}",
+                "unexpected": True,
+            }
+    return results
+
+
+class BatchAnalyser:
+    """Analyse together the files of all the reporters created by the plugin.
+
+    Coverage creates all the file reporters it needs before analysing any of
+    them, so the first time a reporter needs its analysis, the files of all
+    pending reporters can be analysed up front. When only a few files need to
+    be analysed, the reporters are left to analyse their file lazily.
+
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        threshold: int = DEFAULT_PARALLEL_THRESHOLD,
+    ) -> None:
+        self.workers = workers
+        self.threshold = threshold
+        self._pending: List["EnamlFileReporter"] = []
+
+    def register(self, reporter: "EnamlFileReporter") -> None:
+        """Register a reporter whose file should be analysed in the next batch."""
+        self._pending.append(reporter)
+
+    def run(self) -> None:
+        """Analyse the files of all the pending reporters."""
+        pending, self._pending = self._pending, []
+        todo = [r for r in pending if not r._load_cached_analysis()]
+        if len(todo) < max(self.threshold, 2):
+            return
+
+        # The reporters created by a plugin share its settings.
+        analyses = analyse_files(
+            [r.filename for r in todo],
+            self.workers,
+            patterns=todo[0]._patterns,
+            branch=todo[0]._branch,
+        )
+        for reporter, analysis in zip(todo, analyses):
+            if analysis is not None:
+                reporter._set_analysis(analysis)
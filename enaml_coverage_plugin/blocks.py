@@ -0,0 +1,241 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Incremental analysis of enaml files, one top-level block at a time.
+
+The top-level nodes of an enaml module (enamldefs, templates and the runs of
+Python statements between them) are analysed independently of one another:
+the arc analysis creates no arc between them, and the only statement which
+does not belong to one of them is line 1 where the enaml compiler sets up the
+module. A file can hence be split into blocks, each of them being analysed on
+its own, with line numbers relative to its first line, and cached under the
+hash of its text. When a file changes, only the blocks whose text changed
+are analysed again, the analyses of the others being shifted to their new
+position.
+
+"""
+import collections
+import hashlib
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+from enaml.core.parser import parse
+
+from .analysis import FileAnalysis
+from .cache import AnalysisCache
+from .parser import EnamlASTArcAnalyser, EnamlStatementVisitor
+from .scanner import scan_source
+
+#: Default number of block analyses kept in memory.
+DEFAULT_BLOCK_CACHE_SIZE = 1024
+
+#: Start of a top-level enaml construct: enamldef, template or pragma.
+_ENAML_START = re.compile(
+    r"enamldef\b|template\s+[A-Za-z_]\w*\s*\(|pragma\s+[A-Za-z_]\w*\s*(?:[(#]|$)"
+)
+
+#: Lines of a source, including their end.
+_LINES = re.compile(r"[^\n]*\n|[^\n]+$")
+
+
+class Block(NamedTuple):
+    """Top-level node of an enaml module and the lines around it."""
+
+    #: First line of the block in the file.
+    start: int
+
+    #: Source of the block.
+    text: str
+
+
+def split_blocks(text: str, multiline: Dict[int, int]) -> List[Block]:
+    """Split a source into blocks matching the top-level nodes of its AST.
+
+    A block starts on each top-level enaml construct (including the pragmas
+    preceding it) and on the first statement of each run of Python statements.
+    Blank lines and comments belong to the preceding block so that the blocks
+    cover the whole source. `multiline` is the map of the lines of multi-line
+    statements, which cannot start a block.
+
+    """
+    lines = _LINES.findall(text)
+    starts = [1]
+    # Kind of the previous top-level statement, the first block starting on
+    # line 1 whatever its first statement.
+    previous = None
+    for lineno, line in enumerate(lines, 1):
+        if line[0] in " \t\f\r\n#" or multiline.get(lineno, lineno) != lineno:
+            continue
+        match = _ENAML_START.match(line)
+        kind = match.group()[:6] if match else "python"
+        if kind == "python":
+            new_block = previous not in ("python", None)
+        else:
+            new_block = previous not in ("pragma", None)
+        if new_block:
+            starts.append(lineno)
+        previous = kind
+    starts.append(len(lines) + 1)
+    return [
+        Block(start, "".join(lines[start - 1 : end - 1]))
+        for start, end in zip(starts, starts[1:])
+    ]
+
+
+def analyse_block(text: str, filename: str, arcs: bool = True) -> FileAnalysis:
+    """Analyse a block on its own, with line numbers relative to its start.
+
+    The analysis holds the starts of the executable statements and, if `arcs`
+    is True, the arcs before their translation to the first line of the
+    statements, since those are resolved for the whole file.
+
+    The block is analysed after an empty line so that its lines are numbered
+    from 2: line 1 is the one of the module, whose entry and exit arcs are
+    the only ones which must not be shifted.
+
+    """
+    text = "\n" + text
+    module = parse(text, filename)
+    visitor = EnamlStatementVisitor(text=text, filename=filename)
+    # Visiting the body rather than the module skips line 1, which is the
+    # line of the module rather than the one of the block.
+    for node in module.body:
+        visitor.visit(node)
+    statements = visitor.statements
+    if not arcs:
+        return FileAnalysis(statements=statements, has_arcs=False)
+
+    multiline = scan_source(text, set()).multiline
+    aaa = EnamlASTArcAnalyser(text, statements, multiline, root_node=module)
+    aaa.analyse_enaml(module)
+    return FileAnalysis(
+        statements=statements,
+        arcs=aaa.arcs,
+        missing_arc_fragments=aaa.missing_arc_fragments,
+    )
+
+
+#: Line numbers formatted in the fragments of the missing arc messages, most
+#: fragments use a {lineno} placeholder instead.
+_FRAGMENT_LINE = re.compile(r"(?<=on line )\d+")
+
+
+def _shift(line: int, offset: int) -> int:
+    """Shift a line number, exits being negative line numbers.
+
+    The entry and exit of the module (-1) are left untouched.
+
+    """
+    if line > 0:
+        return line + offset
+    return line - offset if line != -1 else line
+
+
+def _shift_fragment(fragment: Optional[str], offset: int) -> Optional[str]:
+    """Shift the line numbers formatted in a fragment of a missing arc message."""
+    if fragment is None or not offset:
+        return fragment
+    return _FRAGMENT_LINE.sub(lambda m: str(int(m.group()) + offset), fragment)
+
+
+class BlockResults(NamedTuple):
+    """Analysis of a file assembled from the analyses of its blocks."""
+
+    #: Starts of the executable statements.
+    statements: set
+
+    #: Arcs before their translation to the first line of the statements.
+    arcs: Optional[set]
+
+    #: Fragments of the messages describing missing arcs.
+    missing_arc_fragments: Optional[dict]
+
+
+class BlockCache:
+    """LRU cache of the analyses of blocks, keyed by the hash of their text.
+
+    If an on-disk analysis cache is given, the analyses are also persisted in
+    it, which allows to reuse them across processes. `hits` and `misses`
+    count the blocks found in or missing from the cache.
+
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_BLOCK_CACHE_SIZE,
+        disk: Optional[AnalysisCache] = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._analyses: "collections.OrderedDict[str, FileAnalysis]" = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._analyses)
+
+    def clear(self) -> None:
+        """Discard the analyses kept in memory."""
+        self._analyses.clear()
+
+    def get(self, text: str, filename: str, arcs: bool) -> FileAnalysis:
+        """Retrieve the analysis of a block, analysing it if it is unknown."""
+        key = self._key(text, arcs)
+        analysis = self._analyses.get(key)
+        if analysis is None and self.disk is not None:
+            analysis = self.disk.get(key)
+        if analysis is None:
+            self.misses += 1
+            analysis = analyse_block(text, filename, arcs)
+            if self.disk is not None:
+                self.disk.set(key, analysis)
+        else:
+            self.hits += 1
+        self._analyses[key] = analysis
+        self._analyses.move_to_end(key)
+        if len(self._analyses) > self.maxsize:
+            self._analyses.popitem(last=False)
+        return analysis
+
+    def analyse(
+        self, text: str, multiline: Dict[int, int], filename: str, arcs: bool
+    ) -> BlockResults:
+        """Analyse a file block by block.
+
+        Raises SyntaxError if a block cannot be parsed on its own, in which
+        case the file should be analysed as a whole to report the error.
+
+        """
+        statements = {1}
+        all_arcs: Optional[set] = set() if arcs else None
+        fragments: Optional[dict] = {} if arcs else None
+        for block in split_blocks(text, multiline):
+            analysis = self.get(block.text, filename, arcs)
+            offset = block.start - 2
+            statements.update(line + offset for line in analysis.statements)
+            if all_arcs is not None and fragments is not None:
+                all_arcs.update(
+                    (_shift(a, offset), _shift(b, offset)) for a, b in analysis.arcs
+                )
+                for (a, b), arc_fragments in analysis.missing_arc_fragments.items():
+                    fragments[(_shift(a, offset), _shift(b, offset))] = [
+                        (_shift_fragment(s, offset), _shift_fragment(e, offset))
+                        for s, e in arc_fragments
+                    ]
+        return BlockResults(statements, all_arcs, fragments)
+
+    # --- Private API
+
+    def _key(self, text: str, arcs: bool) -> str:
+        options = "block|arcs" if arcs else "block"
+        if self.disk is not None:
+            return self.disk.key(text, options)
+        digest = hashlib.sha256(options.encode() + b"\0")
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
@@ -0,0 +1,236 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Caches of enaml file analyses, on disk and in memory.
+
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from importlib import metadata
+from typing import Dict, Optional, Tuple
+
+from .analysis import FileAnalysis
+
+#: Default maximal size of the cache on disk in MiB.
+DEFAULT_CACHE_SIZE = 256
+
+#: Environment variable used to provide the cache directory.
+CACHE_DIR_ENV = "ENAML_COVERAGE_CACHE_DIR"
+
+#: Bump when the layout of the cached analyses changes.
+CACHE_FORMAT = 2
+
+#: Fraction of the maximal size down to which the cache is pruned.
+PRUNE_RATIO = 0.8
+
+
+def _version(dist: str) -> str:
+    try:
+        return metadata.version(dist)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _environment_fingerprint() -> str:
+    """Identify the tools producing an analysis."""
+    return "|".join(
+        (
+            str(CACHE_FORMAT),
+            _version("enaml_coverage_plugin"),
+            _version("enaml"),
+            _version("coverage"),
+            sys.version,
+        )
+    )
+
+
+class AnalysisCache:
+    """Content-addressed cache storing one JSON file per analysis.
+
+    Entries are keyed by the hash of the source and of the versions of the
+    tools used to analyse it, so that stale entries are never returned. Writes
+    go through a temporary file which is atomically renamed which allows
+    several processes to share a cache directory. When the cache grows beyond
+    its maximal size, the least recently used entries are evicted.
+
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.directory = directory
+        self.max_size = max_size * 1024 * 1024
+        self._fingerprint = _environment_fingerprint()
+        self._size: Optional[int] = None
+
+    @classmethod
+    def from_options(cls, options: dict) -> Optional["AnalysisCache"]:
+        """Create a cache from the plugin options if one was requested."""
+        directory = options.get("cache_dir") or os.environ.get(CACHE_DIR_ENV)
+        if not directory:
+            return None
+        directory = os.path.expanduser(os.path.expandvars(directory))
+        return cls(directory, int(options.get("cache_size", DEFAULT_CACHE_SIZE)))
+
+    def key(self, text: str, options: str = "") -> str:
+        """Compute the key of the analysis of a source.
+
+        `options` should describe the settings influencing the analysis.
+
+        """
+        digest = hashlib.sha256(self._fingerprint.encode())
+        digest.update(b"\0" + options.encode() + b"\0")
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[FileAnalysis]:
+        """Retrieve an analysis, returning None if it is not cached."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Mark the entry as recently used.
+            os.utime(path)
+        except OSError:
+            pass
+        return FileAnalysis.from_dict(data)
+
+    def set(self, key: str, analysis: FileAnalysis) -> None:
+        """Store an analysis, silently giving up if the cache is not writable."""
+        path = self._path(key)
+        content = json.dumps(analysis.to_dict(), separators=(",", ":"))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path), prefix=".tmp-", suffix=".json"
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            return
+
+        if self._size is None:
+            self._size = self._disk_usage()
+        else:
+            self._size += len(content)
+        if self._size > self.max_size:
+            self.prune()
+
+    def prune(self) -> None:
+        """Evict the least recently used entries until the cache is small enough."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        size = sum(e[1] for e in entries)
+        target = self.max_size * PRUNE_RATIO
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                # Another process may have evicted it already.
+                pass
+            size -= entry_size
+        self._size = size
+
+    # --- Private API
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _entries(self):
+        try:
+            subdirs = os.scandir(self.directory)
+        except OSError:
+            return
+        with subdirs:
+            for subdir in subdirs:
+                if not subdir.is_dir():
+                    continue
+                try:
+                    with os.scandir(subdir.path) as files:
+                        for entry in files:
+                            if entry.name.endswith(".json") and not (
+                                entry.name.startswith(".tmp-")
+                            ):
+                                yield entry.path
+                except OSError:
+                    continue
+
+    def _disk_usage(self) -> int:
+        size = 0
+        for path in self._entries():
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+
+def source_digest(text: str) -> str:
+    """Hash of a source identifying the version of a file."""
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class MemoryCache:
+    """Process-wide cache of the analyses of the reported files.
+
+    Each report (text, XML, HTML, JSON) creates a new reporter for each file,
+    so reports produced one after another in the same process would analyse
+    the files again. Analyses are kept per canonical filename and analysis
+    options along with the digest of the source they were computed from, an
+    edited file being analysed again. Only the latest analysis of each file is
+    kept, hence the size of the cache is bounded by the number of files.
+
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._analyses: Dict[Tuple[str, str], Tuple[str, FileAnalysis]] = {}
+
+    def __len__(self) -> int:
+        return len(self._analyses)
+
+    def get(self, filename: str, digest: str, options: str) -> Optional[FileAnalysis]:
+        """Retrieve the analysis of a file if it was computed from `digest`."""
+        entry = self._analyses.get((filename, options))
+        if entry is None or entry[0] != digest:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def set(
+        self, filename: str, digest: str, options: str, analysis: FileAnalysis
+    ) -> None:
+        """Store the analysis of a file computed from the source of `digest`."""
+        self._analyses[(filename, options)] = (digest, analysis)
+
+    def clear(self) -> None:
+        """Discard all the analyses."""
+        self._analyses.clear()
+
+
+#: Analyses shared by all the reports of the process.
+MEMORY_CACHE = MemoryCache()
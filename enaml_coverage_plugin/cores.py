@@ -0,0 +1,72 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Detection of the measurement core used by coverage.
+
+Coverage measures execution with one of several cores: ``ctrace`` (the C
+tracer), ``pytrace`` (the Python tracer, used with ``timid``) and, on Python
+3.12+ with recent coverage versions, ``sysmon`` which relies on
+sys.monitoring. Enaml compiles each binding, handler and func into a code
+object whose filename is the .enaml file, and coverage only attributes those
+code objects to the plugin by asking its file tracer about them. Coverage
+disables file tracer plugins under the cores which do not consult them, in
+which case no enaml file is measured.
+
+Coverage picks the core when it starts measuring, after configuring the
+plugins: the Python tracer with ``timid``, else the core named by the
+COVERAGE_CORE environment variable (coverage 7.4+, sysmon falling back to the
+default without sys.monitoring), else the C tracer when it is built. The
+plugin follows the same rules, from the configuration and the environment,
+and coverage reports the core it actually uses in ``coverage debug sys``.
+
+"""
+import os
+import sys
+from typing import Any
+
+from coverage import version_info as coverage_version
+from coverage.collector import HAS_CTRACER
+from coverage.env import PYBEHAVIOR
+
+#: Cores able to consult the file tracer of the plugin.
+PLUGIN_CORES = frozenset(["ctrace"])
+
+#: Whether the interpreter provides sys.monitoring (PEP 669).
+HAS_SYS_MONITORING = sys.version_info >= (3, 12)
+
+#: Whether coverage selects its core from the COVERAGE_CORE variable.
+CORE_FROM_ENVIRONMENT = coverage_version >= (7, 4)
+
+
+def requested_core(config: Any) -> str:
+    """Name of the core coverage will use given its configuration."""
+    if config.get_option("run:timid"):
+        return "pytrace"
+    core = os.environ.get("COVERAGE_CORE") if CORE_FROM_ENVIRONMENT else None
+    if core == "sysmon" and not getattr(PYBEHAVIOR, "pep669", False):
+        core = None
+    return core or ("ctrace" if HAS_CTRACER else "pytrace")
+
+
+def core_supports_plugin(core: str) -> bool:
+    """Whether enaml files can be measured with the given core."""
+    return core in PLUGIN_CORES
+
+
+def unsupported_core_message(core: str) -> str:
+    """Explain why enaml files are not measured with the given core."""
+    message = (
+        f"enaml_coverage_plugin cannot measure enaml files with the {core!r} "
+        "coverage core: coverage disables file tracer plugins with this core. "
+    )
+    if core == "sysmon":
+        message += (
+            "sys.monitoring reports code objects to coverage without going "
+            "through plugins, so the code objects enaml compiles from .enaml "
+            "files cannot be attributed to them. "
+        )
+    return message + "Use the C tracer (COVERAGE_CORE=ctrace, timid = False)."
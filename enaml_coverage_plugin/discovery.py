@@ -0,0 +1,228 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Discovery of the enaml files of the source directories.
+
+Coverage asks the plugin for the files it handles in each ``source`` directory
+so that the files which were never imported are reported as not executed.
+Directories are listed with os.scandir, which tells the subdirectories apart
+without a stat per entry, and the walk does not descend into the directories
+which cannot hold measured enaml files: hidden directories (VCS metadata,
+tox and nox environments), bytecode caches, virtual environments and the
+directories matched by an omit pattern.
+
+The listing of each directory is kept along with the modification time of the
+directory, which changes whenever an entry is added, removed or renamed in
+it, so that walking an unchanged tree again only stats its directories. The
+listings can be persisted next to the analyses in the cache directory.
+
+"""
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from coverage.files import GlobMatcher, prep_patterns
+
+from .scope import TraceScope
+
+#: Name of the file storing the listings in the cache directory.
+LISTINGS_FILENAME = "discovery.json"
+
+#: Bump when the layout of the persisted listings changes.
+LISTINGS_FORMAT = 1
+
+#: Names of the directories never walked, in addition to the hidden ones.
+PRUNED_DIRECTORIES = frozenset(
+    ("__enamlcache__", "__pycache__", "site-packages", "node_modules", "CVS")
+)
+
+#: Entries marking the root of a virtual or conda environment.
+ENVIRONMENT_MARKERS = frozenset(("pyvenv.cfg", "conda-meta"))
+
+#: Listings of directories modified more recently than this (in ns) are not
+#: kept, since a later change in the same tick of a coarse file system clock
+#: would not change the modification time.
+RACY_WINDOW = 2_000_000_000
+
+
+class Listing(NamedTuple):
+    """Enaml files and walkable subdirectories of a directory."""
+
+    mtime: int
+    files: List[str]
+    subdirs: List[str]
+
+
+def scan_directory(directory: str, mtime: int) -> Listing:
+    """List the enaml files and the subdirectories worth walking of a directory."""
+    files = []
+    subdirs = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if name in ENVIRONMENT_MARKERS:
+                return Listing(mtime, [], [])
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if not name.startswith(".") and name not in PRUNED_DIRECTORIES:
+                    subdirs.append(name)
+            elif name.endswith(".enaml"):
+                files.append(name)
+    files.sort()
+    subdirs.sort()
+    return Listing(mtime, files, subdirs)
+
+
+class EnamlFileFinder:
+    """Find the enaml files under directories, caching the directory listings.
+
+    `scans` counts the directories actually listed. If `path` is given, the
+    listings are loaded from and saved to this file.
+
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.scans = 0
+        self._listings: Dict[str, Listing] = {}
+        self._loaded = path is None
+        self._dirty = False
+
+    @classmethod
+    def from_options(cls, options: dict) -> "EnamlFileFinder":
+        """Create a finder persisting its listings in the cache directory if any."""
+        from .cache import CACHE_DIR_ENV
+
+        directory = options.get("cache_dir") or os.environ.get(CACHE_DIR_ENV)
+        if not directory:
+            return cls()
+        directory = os.path.expanduser(os.path.expandvars(directory))
+        return cls(os.path.join(directory, LISTINGS_FILENAME))
+
+    def find(
+        self,
+        root: str,
+        include: Iterable[str] = (),
+        omit: Iterable[str] = (),
+        scope: Optional[TraceScope] = None,
+    ) -> List[str]:
+        """Find the enaml files under `root`, sorted.
+
+        Files are kept when they match one of the `include` patterns, if any,
+        none of the `omit` patterns and are traced by `scope`. The patterns
+        are coverage's file patterns, as in its run settings.
+
+        """
+        include_match = GlobMatcher(prep_patterns(include), "include")
+        omit_match = GlobMatcher(prep_patterns(omit), "omit")
+        has_include = bool(include_match.pats)
+        has_omit = bool(omit_match.pats)
+        self._load()
+
+        found = []
+        stack = [os.path.abspath(root)]
+        while stack:
+            directory = stack.pop()
+            listing = self._listing(directory)
+            if listing is None:
+                continue
+            if scope is None or scope.should_trace(os.path.join(directory, "")):
+                for name in listing.files:
+                    path = os.path.join(directory, name)
+                    if has_include and not include_match.match(path):
+                        continue
+                    if has_omit and omit_match.match(path):
+                        continue
+                    found.append(path)
+            for name in listing.subdirs:
+                path = os.path.join(directory, name)
+                # A directory matched by an omit pattern only holds omitted
+                # files, as */tests/* for .../tests/.
+                if not (has_omit and omit_match.match(path + os.sep)):
+                    stack.append(path)
+
+        self.save()
+        found.sort()
+        return found
+
+    def clear(self) -> None:
+        """Forget the listings, including the persisted ones."""
+        self._listings.clear()
+        self._loaded = True
+        self._dirty = self.path is not None
+        self.save()
+
+    def save(self) -> None:
+        """Persist the listings, silently giving up if the file is not writable."""
+        if not self._dirty or self.path is None:
+            return
+        content = json.dumps(
+            {
+                "format": LISTINGS_FORMAT,
+                "listings": {d: list(listing) for d, listing in self._listings.items()},
+            },
+            separators=(",", ":"),
+        )
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(content)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            return
+        self._dirty = False
+
+    # --- Private API
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        assert self.path is not None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["format"] != LISTINGS_FORMAT:
+                return
+            listings = {d: Listing(*entry) for d, entry in data["listings"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        listings.update(self._listings)
+        self._listings = listings
+
+    def _listing(self, directory: str) -> Optional[Listing]:
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            if self._listings.pop(directory, None) is not None:
+                self._dirty = True
+            return None
+        listing = self._listings.get(directory)
+        if listing is not None and listing.mtime == mtime:
+            return listing
+        try:
+            listing = scan_directory(directory, mtime)
+        except OSError:
+            return None
+        self.scans += 1
+        if time.time_ns() - mtime > RACY_WINDOW:
+            self._listings[directory] = listing
+            self._dirty = self.path is not None
+        else:
+            self._listings.pop(directory, None)
+        return listing
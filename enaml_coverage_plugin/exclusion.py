@@ -0,0 +1,120 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Exclusion and partial branch patterns applied to the lines of enaml files.
+
+"""
+import functools
+import json
+import re
+from typing import Iterable, List, NamedTuple, Optional, Pattern, Set, Tuple
+
+from coverage.config import DEFAULT_EXCLUDE, DEFAULT_PARTIAL, DEFAULT_PARTIAL_ALWAYS
+from coverage.misc import join_regex
+
+
+class LinePatterns(NamedTuple):
+    """Regexes selecting the excluded lines and the partial branches."""
+
+    #: Lines excluded from the report, along with the suite they introduce.
+    exclude: Tuple[str, ...] = tuple(DEFAULT_EXCLUDE)
+
+    #: Lines excused from having all their branches executed.
+    partial: Tuple[str, ...] = tuple(DEFAULT_PARTIAL + DEFAULT_PARTIAL_ALWAYS)
+
+    @classmethod
+    def from_config(cls, config, options: dict) -> "LinePatterns":
+        """Collect the patterns from the coverage configuration.
+
+        The ``exclude_lines`` and ``partial_branches`` plugin options, one
+        regex per line, extend the patterns configured for coverage.
+
+        """
+
+        def collect(names: Iterable[str], option: str) -> Tuple[str, ...]:
+            patterns: List[str] = []
+            for name in names:
+                patterns.extend(config.get_option(name) or ())
+            patterns.extend(_regex_list(options.get(option, "")))
+            return tuple(p for p in patterns if p)
+
+        return cls(
+            exclude=collect(["report:exclude_lines"], "exclude_lines"),
+            partial=collect(
+                ["report:partial_branches", "report:partial_branches_always"],
+                "partial_branches",
+            ),
+        )
+
+    @property
+    def exclude_regex(self) -> str:
+        """Single regex matching the excluded lines."""
+        return join_regex(self.exclude) if self.exclude else ""
+
+    @property
+    def partial_regex(self) -> str:
+        """Single regex matching the partial branches."""
+        return join_regex(self.partial) if self.partial else ""
+
+    def fingerprint(self) -> str:
+        """Identify the patterns in the keys of cached analyses."""
+        return json.dumps([self.exclude, self.partial])
+
+
+def _regex_list(value: str) -> Iterable[str]:
+    """Split a multi-line option into regexes, like coverage does."""
+    if not isinstance(value, str):
+        return value
+    return [line.strip() for line in value.splitlines() if line.strip()]
+
+
+@functools.lru_cache(maxsize=None)
+def compile_regex(regex: str) -> Optional[Pattern[str]]:
+    """Compile a line pattern once per process, None standing for no pattern.
+
+    The pattern is compiled in multi-line mode so that it can be searched in
+    a whole source at once.
+
+    """
+    if not regex:
+        return None
+    return re.compile(regex, re.MULTILINE)
+
+
+def lines_matching(text: str, regex: str) -> Set[int]:
+    """Find the lines of `text` containing a match for `regex`.
+
+    Rather than searching each line separately, the source is searched as a
+    whole and each match is checked against the line on which it starts, so
+    that patterns such as ``\\s*`` cannot match across lines.
+
+    """
+    compiled = compile_regex(regex)
+    matches: Set[int] = set()
+    if compiled is None:
+        return matches
+
+    lineno = 1
+    line_start = 0
+    pos = 0
+    search = compiled.search
+    while True:
+        match = search(text, pos)
+        if match is None:
+            break
+        start = match.start()
+        lineno += text.count("\n", line_start, start)
+        line_start = text.rfind("\n", 0, start) + 1
+        line_end = text.find("\n", start)
+        if line_end == -1:
+            line_end = len(text)
+        if match.end() <= line_end or search(text[line_start:line_end]):
+            matches.add(lineno)
+        pos = line_end + 1
+        if pos > len(text):
+            break
+    return matches
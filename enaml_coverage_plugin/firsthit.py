@@ -0,0 +1,226 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Low-overhead recording of the enaml code objects which ran at least once.
+
+Tracing every line of the enaml files makes long-running sessions (soak tests,
+manual QA) too slow, since bindings are re-evaluated over and over. In the
+first-hit mode, the plugin only records that each code object compiled from
+an enaml file (binding, handler, func, enamldef body) started executing. This
+relies on the PY_START event of sys.monitoring (PEP 669, Python 3.12+): the
+callback disables the event for the code object it was called for, so that
+each code object, from an enaml file or not, costs a single callback for the
+whole session. Tracers based on sys.settrace or sys.setprofile cannot stop
+being called for a given code object and cost as much as full tracing.
+
+The lines of the code objects which ran are mapped to the statements found by
+the static analysis of the files. This over-approximates the executed lines:
+the lines of a code object which were skipped on all its runs are reported as
+executed. Only lines are recorded, since no branch is known to be taken.
+
+"""
+import atexit
+import os
+import sys
+import warnings
+from types import CodeType
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from .cores import HAS_SYS_MONITORING
+from .scope import TraceScope
+
+#: Name under which the recorder registers with sys.monitoring.
+TOOL_NAME = "enaml_coverage_plugin"
+
+#: Name of the plugin recorded by coverage for the files it measured.
+PLUGIN_NAME = "enaml_coverage_plugin.EnamlCoveragePlugin"
+
+#: The sys.monitoring namespace, None before Python 3.12.
+_monitoring: Any = getattr(sys, "monitoring", None)
+
+#: Tool ids tried in order, the ones without an assigned role first.
+_TOOL_IDS = (3, 4, 2, 5, 0, 1)
+
+#: Pattern of the files coverage is told not to trace in the first-hit mode.
+ENAML_FILES = "*.enaml"
+
+UNAVAILABLE_MESSAGE = (
+    "The first_hit option of enaml_coverage_plugin requires sys.monitoring "
+    "(Python 3.12+), the enaml files are traced fully."
+)
+
+BRANCH_MESSAGE = (
+    "The first_hit option of enaml_coverage_plugin records lines only, its data "
+    "cannot be combined with the data of branch coverage."
+)
+
+
+class FirstHitRecorder:
+    """Record the code objects of enaml files which started executing.
+
+    `code_objects` maps the filename of each enaml file to the code objects of
+    the file which ran. If a scope is given when starting, only the files it
+    traces are recorded.
+
+    """
+
+    def __init__(self) -> None:
+        self.code_objects: Dict[str, Set[CodeType]] = {}
+        self.scope: Optional[TraceScope] = None
+        self._tool_id: Optional[int] = None
+        self._started = False
+        self._save_at_exit = False
+        self._exit_args: Any = None
+
+    @property
+    def running(self) -> bool:
+        return self._tool_id is not None
+
+    def start(self, scope: Optional[TraceScope] = None) -> None:
+        """Start recording, raises RuntimeError without sys.monitoring."""
+        if not HAS_SYS_MONITORING:
+            raise RuntimeError(UNAVAILABLE_MESSAGE)
+        self.scope = scope
+        if self.running:
+            return
+        monitoring = _monitoring
+        tool_id = next((i for i in _TOOL_IDS if monitoring.get_tool(i) is None), None)
+        if tool_id is None:
+            raise RuntimeError("No sys.monitoring tool id is available.")
+        monitoring.use_tool_id(tool_id, TOOL_NAME)
+        monitoring.register_callback(
+            tool_id, monitoring.events.PY_START, self._on_start
+        )
+        monitoring.set_events(tool_id, monitoring.events.PY_START)
+        if self._started:
+            # The code objects seen while previously recording were disabled.
+            monitoring.restart_events()
+        self._tool_id = tool_id
+        self._started = True
+
+    def stop(self) -> None:
+        """Stop recording, the code objects recorded so far are kept."""
+        if self._tool_id is None:
+            return
+        monitoring = _monitoring
+        monitoring.set_events(self._tool_id, 0)
+        monitoring.register_callback(self._tool_id, monitoring.events.PY_START, None)
+        monitoring.free_tool_id(self._tool_id)
+        self._tool_id = None
+
+    def clear(self) -> None:
+        """Discard the recorded code objects."""
+        self.code_objects.clear()
+
+    def executed_lines(self, filename: str, reporter: Any) -> Set[int]:
+        """Statements of the code objects of `filename` which ran.
+
+        `reporter` is the file reporter of the file, whose static analysis
+        maps the lines of the code objects to the statements.
+
+        """
+        lines = {
+            line
+            for code in self.code_objects.get(filename, ())
+            for _, _, line in code.co_lines()
+            if line is not None
+        }
+        return reporter.translate_lines(lines) & reporter.lines()
+
+    def save(
+        self,
+        data: Any,
+        file_reporter: Callable[[str], Any],
+        unexecuted: Iterable[str] = (),
+    ) -> None:
+        """Add the recorded lines to a CoverageData holding lines.
+
+        The files listed in `unexecuted` which did not run are recorded with
+        no line executed.
+
+        """
+        lines: Dict[str, Set[int]] = {filename: set() for filename in unexecuted}
+        for filename in sorted(self.code_objects):
+            executed = self.executed_lines(filename, file_reporter(filename))
+            if executed:
+                lines[filename] = executed
+        data.add_lines(lines)
+        data.add_file_tracers({filename: PLUGIN_NAME for filename in lines})
+
+    def save_at_exit(
+        self,
+        data_file: str,
+        file_reporter: Optional[Callable[[str], Any]] = None,
+        unexecuted: Optional[Callable[[], Iterable[str]]] = None,
+    ) -> None:
+        """Save the recorded lines to a data file when the process exits.
+
+        The data file is suffixed, as the ones of parallel runs, so that
+        ``coverage combine --append`` merges it with the data of coverage.
+        `file_reporter` defaults to the reporter of the plugin and
+        `unexecuted` lists the files to report even if they did not run.
+
+        """
+        if file_reporter is None:
+            # Imported now since imports can fail while the interpreter exits.
+            from .reporter import EnamlFileReporter
+
+            file_reporter = EnamlFileReporter
+        self._exit_args = (os.path.abspath(data_file), file_reporter, unexecuted)
+        if not self._save_at_exit:
+            atexit.register(self._save_data_file)
+            self._save_at_exit = True
+
+    # --- Private API
+
+    def _on_start(self, code: CodeType, offset: int) -> Any:
+        filename = code.co_filename
+        if filename.endswith(".enaml") and (
+            self.scope is None or self.scope.should_trace(filename)
+        ):
+            codes = self.code_objects.get(filename)
+            if codes is None:
+                codes = self.code_objects[filename] = set()
+            codes.add(code)
+        return _monitoring.DISABLE
+
+    def _save_data_file(self) -> None:
+        self.stop()
+        if not self.code_objects:
+            return
+        from coverage.data import CoverageData
+
+        data_file, file_reporter, unexecuted = self._exit_args
+        data = CoverageData(basename=data_file, suffix=True)
+        self.save(data, file_reporter, unexecuted() if unexecuted else ())
+
+
+#: Recorder shared by all the coverage instances of the process.
+RECORDER = FirstHitRecorder()
+
+
+def available() -> bool:
+    """Whether the first hits can be recorded, warns if they cannot."""
+    if not HAS_SYS_MONITORING:
+        warnings.warn(UNAVAILABLE_MESSAGE, RuntimeWarning)
+        return False
+    return True
+
+
+def start_recording(
+    data_file: str,
+    scope: Optional[TraceScope] = None,
+    file_reporter: Optional[Callable[[str], Any]] = None,
+    unexecuted: Optional[Callable[[], Iterable[str]]] = None,
+) -> None:
+    """Start recording the first hits and save them to `data_file` at exit.
+
+    Raises RuntimeError without sys.monitoring.
+
+    """
+    RECORDER.start(scope)
+    RECORDER.save_at_exit(data_file, file_reporter, unexecuted)
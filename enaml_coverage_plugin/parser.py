@@ -8,15 +8,19 @@
 """Plugin providing coverage support for enaml files.
 
 """
+import ast
 import collections
-import io
+import marshal
 import os
+import struct
 import types
-from tokenize import generate_tokens
-from typing import Dict, List, Optional, Set, Tuple, Union
+import warnings
+from importlib.util import MAGIC_NUMBER
+from tokenize import TokenError
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
-from atom.api import Typed
-from coverage.misc import NotPython, nice_pair
+from atom.api import Str, Typed
+from coverage.misc import NotPython, join_regex
 from coverage.parser import (
     AstArcAnalyzer,
     ByteParser,
@@ -25,15 +29,114 @@ from coverage.parser import (
     PythonParser,
     TryBlock,
 )
-from enaml.core.enaml_ast import ASTVisitor, PythonModule
+from enaml.core.enaml_ast import (
+    ASTVisitor,
+    Binding,
+    ChildDef,
+    EnamlDef,
+    FuncDef,
+    Module,
+    PythonModule,
+    StorageExpr,
+    Template,
+    TemplateInst,
+)
 from enaml.core.enaml_compiler import EnamlCompiler
+from enaml.core.import_hooks import make_file_info
 from enaml.core.parser import parse
 
+# ENAML_CACHE_STATS and NotEnaml are defined with the analyses, which can be
+# used without enaml, and re-exported here.
+from .analysis import ENAML_CACHE_STATS, FirstLineIndex, NotEnaml
+from .exclusion import lines_matching
+from .profiling import PROFILER
+from .scanner import scan_source
+
+
+def load_enaml_cache(filename: str) -> Optional[types.CodeType]:
+    """Load the code object cached by enaml import hooks for a source file.
 
-class NotEnaml(NotPython):
-    """Exception raised when parsing fails on enaml file."""
+    The cached code is only used if it was produced by the running Python
+    version and is at least as recent as the source, which are the criteria
+    enaml uses to decide whether to import it.
 
-    pass
+    """
+    file_info = make_file_info(filename)
+    try:
+        with open(file_info.cache_path, "rb") as cache_file:
+            magic = cache_file.read(4)
+            timestamp = struct.unpack("<L", cache_file.read(4))[0]
+            if magic != MAGIC_NUMBER:
+                return None
+            src_mod_time = int(os.path.getmtime(filename)) & 0xFFFF_FFFF
+            if src_mod_time > timestamp:
+                return None
+            code = marshal.load(cache_file)
+    except (OSError, EOFError, ValueError, TypeError, struct.error):
+        return None
+    return code if isinstance(code, types.CodeType) else None
+
+
+class EnamlParsedUnit:
+    """Source of an enaml file and the artifacts derived from it.
+
+    The enaml AST and the compiled code are built lazily and at most once so
+    that all the parsers analysing a file can share them.
+
+    When `use_enaml_cache` is True, `text` must be the current content of the
+    file `filename` and the code is loaded from the bytecode cache written by
+    enaml import hooks if it is up to date.
+
+    """
+
+    def __init__(
+        self,
+        text: str,
+        filename: Optional[str] = None,
+        use_enaml_cache: bool = False,
+    ) -> None:
+        self.text = text
+        self.filename = filename or "Enaml"
+        self.use_enaml_cache = use_enaml_cache
+        self._ast: Optional[Module] = None
+        self._code: Optional[types.CodeType] = None
+        self._cache_checked = False
+
+    @property
+    def ast(self) -> Module:
+        """Enaml AST of the source.
+
+        The unit does not keep the token stream, which is large and no longer
+        needed once the AST is built.
+
+        """
+        if self._ast is None:
+            with PROFILER.phase(self.filename, "parse"):
+                self._ast = parse(self.text, self.filename)
+        return self._ast
+
+    @property
+    def code(self) -> types.CodeType:
+        """Code object obtained by compiling the enaml AST."""
+        if self._code is None:
+            self._load_cached_code()
+            if self._code is None:
+                ast = self.ast
+                with PROFILER.phase(self.filename, "compile"):
+                    self._code = EnamlCompiler.compile(ast, self.filename)
+        return self._code
+
+    def has_code(self) -> bool:
+        """Whether the code is available without running the enaml compiler."""
+        self._load_cached_code()
+        return self._code is not None
+
+    def _load_cached_code(self) -> None:
+        """Load the code from the enaml bytecode cache, at most once."""
+        if self._code is None and self.use_enaml_cache and not self._cache_checked:
+            self._cache_checked = True
+            self._code = load_enaml_cache(self.filename)
+            ENAML_CACHE_STATS["hits" if self._code else "misses"] += 1
 
 
 class EnamlByteParser(ByteParser):
@@ -44,13 +147,16 @@ class EnamlByteParser(ByteParser):
         text: str,
         code: Optional[types.CodeType] = None,
         filename: Optional[str] = None,
+        unit: Optional[EnamlParsedUnit] = None,
     ) -> None:
         self.text = text
         if code:
             self.code = code
         else:
+            if unit is None:
+                unit = EnamlParsedUnit(text, filename)
             try:
-                self.code = EnamlCompiler.compile(parse(text), filename)
+                self.code = unit.code
             except SyntaxError as synerr:
                 raise NotPython(
                     f"Couldn't parse '{filename}' as Enaml source: "
@@ -58,48 +164,60 @@ class EnamlByteParser(ByteParser):
                 )
 
 
-def _generate_tokens(text):
-    """Use enaml lexer to generate tokens.
+class EnamlParser(PythonParser):
+    """Enaml parser analyser based on a custom arc analysis.
 
-    Enaml now uses tokenize internally but we manually reconstruct the
-    :: and => tokens which are not native Python tokens.
-
-    """
-    tok_gen = generate_tokens(io.StringIO(text).readline)
-    while True:
-        try:
-            tok = next(tok_gen)
-        except StopIteration:
-            break
-        # Resynthesize the :: and := operators from enaml
-        if tok.string == ":":
-            n_tok = next(tok_gen)
-            if n_tok.string in (":", "=") and tok.end == n_tok.start:
-                yield (
-                    tok.type,
-                    tok.string + n_tok.string,
-                    tok.start,
-                    n_tok.end,
-                    tok.line,
-                )
-        else:
-            yield tok
+    When `line_only` is True, the executable statements are found from the
+    enaml AST rather than from the compiled code, which avoids running the
+    enaml compiler when the arcs are not needed.
 
+    When a block cache is given as `blocks`, the file is analysed one
+    top-level block at a time, reusing the analyses of the blocks found in
+    the cache (see the blocks module).
 
-class EnamlParser(PythonParser):
-    """Enaml parser analyser based on a custom arc analysis."""
+    """
 
-    def __init__(self, text=None, filename=None, exclude=None):
+    def __init__(
+        self,
+        text=None,
+        filename=None,
+        exclude=None,
+        unit=None,
+        line_only=False,
+        blocks=None,
+    ):
         super().__init__(text=text, filename=filename, exclude=exclude)
+        self.line_only = line_only
+        self.blocks = blocks
+        self._unit = unit
         self._byte_parser = None
+        self._block_results = None
+
+    @property
+    def unit(self) -> EnamlParsedUnit:
+        """Create the parsed unit shared by all the analysis steps on demand."""
+        if self._unit is None:
+            self._unit = EnamlParsedUnit(self.text, self.filename)
+        return self._unit
 
     @property
     def byte_parser(self) -> EnamlByteParser:
         """Create a ByteParser on demand."""
         if self._byte_parser is None:
-            self._byte_parser = EnamlByteParser(self.text, filename=self.filename)
+            self._byte_parser = EnamlByteParser(
+                self.text, filename=self.filename, unit=self.unit
+            )
         return self._byte_parser
 
+    def lines_matching(self, *regexes: str) -> Set[int]:
+        """Find the lines matching one of a list of regexes.
+
+        The combined regex is compiled once per process and searched in the
+        whole source at once.
+
+        """
+        return lines_matching(self.text, join_regex([r for r in regexes if r]))
+
     def parse_source(self) -> None:
         """Parse source text to find executable lines, excluded lines, etc.
 
@@ -109,7 +227,7 @@ class EnamlParser(PythonParser):
         """
         try:
             self._raw_parse()
-        except IndentationError as err:
+        except (TokenError, IndentationError) as err:
             if hasattr(err, "lineno"):
                 lineno = err.lineno  # IndentationError
             else:
@@ -127,6 +245,8 @@ class EnamlParser(PythonParser):
 
     # --- Private API
 
+    _unit: Optional[EnamlParsedUnit]
+
     _byte_parser: Optional[EnamlByteParser]
 
     def _raw_parse(self) -> None:
@@ -137,92 +257,46 @@ class EnamlParser(PythonParser):
         """
         # Find lines which match an exclusion pattern.
         if self.exclude:
-            self.raw_excluded = self.lines_matching(self.exclude)
-
-        # Tokenize, to find excluded suites, to find docstrings, and to find
-        # multi-line statements.
-        indent = 0
-        exclude_indent = 0
-        excluding = False
-        excluding_decorators = False
-        prev_toktype: str = "INDENT"
-        first_line = None
-        empty = True
-        first_on_line = True
-
-        tokgen = _generate_tokens(self.text)
-        for toktype, ttext, (slineno, _), (elineno, _), ltext in tokgen:
-            if self.show_tokens:  # pragma: not covered
-                print(
-                    "%10s %5s %-20r %r"
-                    % (toktype, nice_pair((slineno, elineno)), ttext, ltext)
-                )
-
-            if toktype == "INDENT":
-                indent += 1
-            elif toktype == "DEDENT":
-                indent -= 1
-            elif toktype == "NAME":
-                if ttext == "class" or ttext == "enamldef":
-                    # Class definitions look like branches in the bytecode, so
-                    # we need to exclude them.  The simplest way is to note the
-                    # lines with the 'class' keyword.
-                    self.raw_classdefs.add(slineno)
-            elif toktype == "OPERATOR":
-                if ttext == ":":
-                    should_exclude = (
-                        elineno in self.raw_excluded
-                    ) or excluding_decorators
-                    if not excluding and should_exclude:
-                        # Start excluding a suite.  We trigger off of the colon
-                        # token so that the #pragma comment will be recognized
-                        # on the same line as the colon.
-                        self.raw_excluded.add(elineno)
-                        exclude_indent = indent
-                        excluding = True
-                        excluding_decorators = False
-                elif ttext == "@" and first_on_line:
-                    # A decorator.
-                    if elineno in self.raw_excluded:
-                        excluding_decorators = True
-                    if excluding_decorators:
-                        self.raw_excluded.add(elineno)
-
-            elif toktype == "STRING " and prev_toktype == "INDENT":
-                # Strings that are first on an indented line are docstrings.
-                # (a trick from trace.py in the stdlib.) This works for
-                # 99.9999% of cases.  For the rest (!) see:
-                # http://stackoverflow.com/questions/1769332/x/1769794#1769794
-                self.raw_docstrings.update(range(slineno, elineno + 1))
-            elif toktype == "NEWLINE":
-                if first_line is not None and elineno != first_line:
-                    # We're at the end of a line, and we've ended on a
-                    # different line than the first line of the statement,
-                    # so record a multi-line range.
-                    for line_number in range(first_line, elineno + 1):
-                        self._multiline[line_number] = first_line
-                first_line = None
-                first_on_line = True
-
-            if ttext is not None:
-                # A non-whitespace token.
-                empty = False
-                if first_line is None:
-                    # The token is not whitespace, and is the first in a
-                    # statement.
-                    first_line = slineno
-                    # Check whether to end an excluded suite.
-                    if excluding and indent <= exclude_indent:
-                        excluding = False
-                    if excluding:
-                        self.raw_excluded.add(elineno)
-                    first_on_line = False
-
-            prev_toktype = toktype
+            with PROFILER.phase(self.filename, "exclude"):
+                self.raw_excluded = self.lines_matching(self.exclude)
+
+        # Scan the source, to find excluded suites, to find docstrings, and to
+        # find multi-line statements.
+        with PROFILER.phase(self.filename, "scan"):
+            facts = scan_source(self.text, self.raw_excluded)
+        self.raw_excluded = facts.excluded
+        self.raw_classdefs = facts.classdefs
+        self.raw_docstrings = facts.docstrings
+        self._multiline = facts.multiline
 
         # Find the starts of the executable statements.
-        if not empty:
-            self.raw_statements.update(self.byte_parser._find_statements())
+        if not facts.empty:
+            with PROFILER.phase(self.filename, "statements"):
+                self.raw_statements.update(self._find_statements())
+
+    def _find_statements(self) -> Iterable[int]:
+        """Find the lines starting executable statements.
+
+        The compiled code is used when it is already available, since it does
+        not require parsing the source, unless the file is analysed block by
+        block, in which case the arcs must come from the blocks as well.
+
+        """
+        if self.blocks is not None:
+            try:
+                self._block_results = self.blocks.analyse(
+                    self.text, self._multiline, self.filename, arcs=not self.line_only
+                )
+            except SyntaxError:
+                # Let the analysis of the whole file report the error.
+                pass
+            else:
+                return self._block_results.statements
+        if self.line_only and not self.unit.has_code():
+            visitor = EnamlStatementVisitor(text=self.text, filename=self.unit.filename)
+            visitor.visit(self.unit.ast)
+            return visitor.statements
+        return self.byte_parser._find_statements()
 
     def _analyze_ast(self) -> None:
         """Run the AstArcAnalyzer and save its results.
@@ -230,25 +304,37 @@ class EnamlParser(PythonParser):
         `_all_arcs` is the set of arcs in the code.
 
         """
-        aaa = EnamlASTArcAnalyser(self.text, self.raw_statements, self._multiline)
-
-        EnamlASTVisitor(arc_analyser=aaa).visit(aaa.root_node)
-
-        self._all_arcs = set()
-        for l1, l2 in aaa.arcs:
-            fl1 = self.first_line(l1)
-            fl2 = self.first_line(l2)
-            if fl1 != fl2:
-                self._all_arcs.add((fl1, fl2))
+        results = self._block_results
+        if results is not None and results.arcs is not None:
+            arcs = results.arcs
+            self._missing_arc_fragments = results.missing_arc_fragments
+        else:
+            root_node = self.unit.ast
+            with PROFILER.phase(self.filename, "arcs"):
+                aaa = EnamlASTArcAnalyser(
+                    self.text, self.raw_statements, self._multiline, root_node=root_node
+                )
+                aaa.analyse_enaml()
+            arcs = aaa.arcs
+            self._missing_arc_fragments = aaa.missing_arc_fragments
 
-        self._missing_arc_fragments = aaa.missing_arc_fragments
+        first_lines = FirstLineIndex(self._multiline)
+        self._all_arcs = {
+            (fl1, fl2) for fl1, fl2 in first_lines.translate_arcs(arcs) if fl1 != fl2
+        }
 
 
 class EnamlASTArcAnalyser(AstArcAnalyzer):
     """Custom ast analyser modified to handle enaml ast."""
 
-    def __init__(self, text: str, statements: set, multiline) -> None:
-        self.root_node = parse(text)
+    def __init__(
+        self,
+        text: str,
+        statements: set,
+        multiline,
+        root_node: Optional[Module] = None,
+    ) -> None:
+        self.root_node = root_node if root_node is not None else parse(text)
         self.statements = set(
             multiline.get(line_number, line_number) for line_number in statements
         )
@@ -262,51 +348,171 @@ class EnamlASTArcAnalyser(AstArcAnalyzer):
         # For an arc from line 17, they should be usable like:
         #    "Line 17 {endmsg}, because {startmsg}"
         self.missing_arc_fragments: Dict[
-            Tuple[int, int], List[Tuple[str, str]]
+            Tuple[int, int], List[Tuple[Optional[str], Optional[str]]]
         ] = collections.defaultdict(list)
         self.block_stack: List[Union[TryBlock, FunctionBlock, LoopBlock]] = []
 
         self.debug = bool(int(os.environ.get("COVERAGE_TRACK_ARCS", 0)))
 
+    def analyse_enaml(self, root=None) -> None:
+        """Analyse the Python code of an enaml AST, the root node by default."""
+        code_module = self._code_object__Module
+        code_function = self._code_object__FunctionDef
+        for node in enaml_python_code(self.root_node if root is None else root):
+            if isinstance(node, ast.Module):
+                code_module(node)
+            else:
+                code_function(node)
+
+
+# Kinds of the enaml AST nodes relevant to the arc analysis.
+_BODY, _PYTHON, _FUNC, _OPERATOR = range(4)
+
+#: Kind of each enaml AST node type relevant to the arc analysis, the other
+#: nodes hold no code analysed for arcs.
+_ARC_NODE_KINDS = {
+    Module: _BODY,
+    EnamlDef: _BODY,
+    ChildDef: _BODY,
+    Template: _BODY,
+    TemplateInst: _BODY,
+    PythonModule: _PYTHON,
+    FuncDef: _FUNC,
+    Binding: _OPERATOR,
+    StorageExpr: _OPERATOR,
+}
+
+
+def enaml_python_code(root) -> List[Union[ast.Module, ast.FunctionDef]]:
+    """Collect the Python code analysed for arcs in an enaml AST.
+
+    The result holds, in source order, the ast.Module of the Python blocks and
+    of the handlers and the ast.FunctionDef of the funcs. The tree is walked
+    with an explicit stack, whatever its depth, and the nodes are dispatched
+    on their type through a table.
+
+    """
+    code: List[Union[ast.Module, ast.FunctionDef]] = []
+    kinds = _ARC_NODE_KINDS
+    stack = [root]
+    pop = stack.pop
+    push = stack.extend
+    while stack:
+        node = pop()
+        kind = kinds.get(type(node))
+        if kind is _BODY:
+            push(reversed(node.body))
+        elif kind is _OPERATOR:
+            expr = node.expr
+            # Handlers hold a PythonModule, other operators hold no arcs.
+            if expr is not None and type(expr.value) is PythonModule:
+                code.append(expr.value.ast)
+        elif kind is _PYTHON:
+            code.append(node.ast)
+        elif kind is _FUNC:
+            code.append(node.funcdef)
+    return code
+
 
 class EnamlASTVisitor(ASTVisitor):
-    """An enaml AST visitor replacing ast.walk"""
+    """Deprecated enaml AST visitor analysing the Python code for arcs.
+
+    Use EnamlASTArcAnalyser.analyse_enaml, which collects the code with
+    enaml_python_code, to which visiting a node is delegated.
+
+    """
 
     #: Reference to the analyser using this visitor.
     arc_analyser = Typed(EnamlASTArcAnalyser)
 
+    def __init__(self, **kwargs) -> None:
+        warnings.warn(
+            "EnamlASTVisitor is deprecated, use EnamlASTArcAnalyser.analyse_enaml",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        super().__init__(**kwargs)
+
+    def visit(self, node, *args, **kwargs) -> None:
+        """Analyse the Python code of the node and of its children."""
+        assert self.arc_analyser is not None
+        self.arc_analyser.analyse_enaml(node)
+
+
+class EnamlStatementVisitor(ASTVisitor):
+    """An enaml AST visitor collecting the lines of the executable statements.
+
+    The Python code embedded in the enaml AST is compiled on its own by the
+    builtin compiler, and the lines of the enaml constructs, which the enaml
+    compiler turns into code executed on their first line, are added
+    directly. The result matches the lines found in the code compiled by the
+    enaml compiler.
+
+    """
+
+    #: Source of the analysed module.
+    text = Str()
+
+    #: Name of the analysed file.
+    filename = Str()
+
+    #: Lines starting an executable statement.
+    statements = Typed(set, ())
+
     def default_visit(self, node, *args, **kwargs):
         """Skip nodes with no special meaning."""
         pass
 
+    def visit_Module(self, node, *args, **kwargs):
+        """Visit the module body, the enaml compiler sets it up on line 1."""
+        self.statements.add(1)
+        self.visit_body(node, *args, **kwargs)
+
     def visit_body(self, node, *args, **kwargs):
-        """Visit the body of a node."""
+        """Visit the body of a node after recording its line."""
+        self.statements.add(node.lineno)
         for n in node.body:
             self.visit(n, *args, **kwargs)
 
-    visit_Module = visit_body
     visit_EnamlDef = visit_body
     visit_ChildDef = visit_body
-    visit_TemplateInst = visit_body
     visit_Template = visit_body
+    visit_TemplateInst = visit_body
 
     def visit_PythonModule(self, node, *args, **kwargs):
-        """Analyse python module using the coverage arc analyser."""
-        self.arc_analyser._code_object__Module(node.ast)
+        """Collect the statements of Python code."""
+        self._add_code(node.ast, "exec")
 
-    def visit_FuncDef(self, node, *args, **kwargs):
-        """Analyse funcdef like normal functions."""
-        self.arc_analyser._code_object__FunctionDef(node.funcdef)
+    def visit_PythonExpression(self, node, *args, **kwargs):
+        """Collect the lines of a Python expression."""
+        self._add_code(node.ast, "eval")
 
-    def visit_operator_like_node(self, node, *args, **kwargs):
-        """Analyse a binding or storage expr.
+    def visit_FuncDef(self, node, *args, **kwargs):
+        """Collect the statements of a func as those of a function."""
+        self._add_code(ast.Module(body=[node.funcdef], type_ignores=[]), "exec")
 
-        If the OperatorExpr contains a PythonModule visit it otherwise
-        consider the line as containing no arcs.
+    visit_AsyncFuncDef = visit_FuncDef
 
-        """
-        if node.expr and isinstance(node.expr.value, PythonModule):
-            self.visit(node.expr.value, *args, **kwargs)
+    def visit_operator_like_node(self, node, *args, **kwargs):
+        """Record the line of a declaration and visit its expression."""
+        self.statements.add(node.lineno)
+        if node.expr is not None:
+            self.visit(node.expr, *args, **kwargs)
 
     visit_Binding = visit_operator_like_node
+    visit_ExBinding = visit_operator_like_node
     visit_StorageExpr = visit_operator_like_node
+    visit_ConstExpr = visit_operator_like_node
+    visit_TemplateInstBinding = visit_operator_like_node
+
+    def visit_AliasExpr(self, node, *args, **kwargs):
+        """Record the line of an alias."""
+        self.statements.add(node.lineno)
+
+    def visit_OperatorExpr(self, node, *args, **kwargs):
+        """Visit the Python code bound by an operator."""
+        self.visit(node.value, *args, **kwargs)
+
+    def _add_code(self, node, mode: str) -> None:
+        code = compile(node, self.filename, mode, dont_inherit=True)
+        self.statements.update(ByteParser(self.text, code=code)._find_statements())
@@ -8,25 +8,327 @@
 """Plugin providing coverage support for enaml files.
 
 """
-from typing import Optional
+import functools
+import os
+import warnings
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from coverage import CoveragePlugin, FileTracer
 
-from .reporter import EnamlFileReporter
+from . import firsthit
+from .cores import core_supports_plugin, requested_core, unsupported_core_message
+from .exclusion import LinePatterns
+from .profiling import PROFILER, enable_from_config
+from .scope import TraceScope
+
+# The analysis stack (enaml parser and compiler, caches) is only imported when
+# reporting: measuring only needs file_tracer, and coverage loads the plugin
+# in every process it measures.
+if TYPE_CHECKING:
+    from .batch import BatchAnalyser
+    from .blocks import BlockCache
+    from .cache import AnalysisCache
+    from .discovery import EnamlFileFinder
+    from .relocation import SourceResolver
+    from .reporter import EnamlFileReporter, ParserCache
+    from .server import AnalysisClient
+    from .sidecar import Sidecar
+    from .source import SourceLoader
 
 
 class EnamlCoveragePlugin(CoveragePlugin):
-    """Coverage plugin for enaml files."""
+    """Coverage plugin for enaml files.
+
+    Supported options (set in the ``[enaml_coverage_plugin]`` section of the
+    coverage configuration):
+
+    - cache_dir: directory in which to persist the analyses of enaml files
+      and the listings of the source directories, defaults to the
+      ENAML_COVERAGE_CACHE_DIR environment variable. Analyses are not
+      persisted if neither is set.
+    - cache_size: maximal size of the on-disk cache in MiB.
+    - parallel: analyse all the reported files up front in a process pool.
+    - workers: number of processes used for parallel analysis, defaults to
+      the number of CPUs.
+    - parallel_threshold: minimal number of files to analyse for a process
+      pool to be used.
+    - incremental: analyse the enaml files one top-level block (enamldef,
+      template or run of Python statements) at a time, reusing the analyses
+      of the unchanged blocks, which are persisted in the cache_dir if any.
+    - block_cache_size: number of block analyses kept in memory.
+    - read_ahead: number of enaml files whose source is read in advance by
+      a thread pool while reporting, which helps on slow file systems.
+    - parser_cache_size: number of parsers, holding the full state of the
+      analysis of a file, kept alive while reporting.
+    - server: Unix socket of an analysis server started with ``python -m
+      enaml_coverage_plugin serve``, defaults to the ENAML_COVERAGE_SERVER
+      environment variable. The files are analysed by the server when it can
+      be reached and in process otherwise.
+    - sidecar: file holding the analyses exported by ``python -m
+      enaml_coverage_plugin export``, which lets reporting work without
+      enaml. Defaults to the data file followed by ``-enaml.json.gz``, used
+      if it exists.
+    - include_roots: directories, one per line, whose enaml files are traced.
+      When given, files outside of them are not traced. The directories of
+      the ``source`` run setting are always included.
+    - exclude_roots: directories, one per line, whose enaml files are not
+      traced, defaults to the site-packages directories and to enaml itself.
+      The deepest root containing a file decides whether it is traced.
+    - exclude_lines: regexes, one per line, excluding lines of enaml files in
+      addition to the ``exclude_lines`` of the report section.
+    - partial_branches: regexes, one per line, marking partial branches in
+      enaml files in addition to the ``partial_branches`` of the report
+      section.
+    - first_hit: only record whether each code object compiled from an enaml
+      file (binding, handler, func, enamldef body) ran, instead of tracing
+      the enaml files, which gives a rough coverage at a much lower cost in
+      long-running sessions. Coverage is told to omit the enaml files, whose
+      lines are saved to a suffixed data file to merge with ``coverage
+      combine --append``. Requires Python 3.12+.
+    - profile_output: file to which the profile of the analysis of the enaml
+      files is dumped as JSON, defaults to the ENAML_COVERAGE_PROFILE_OUTPUT
+      environment variable. Profiling is enabled by the ``enaml_profile``
+      debug option of coverage or the ENAML_COVERAGE_PROFILE environment
+      variable.
+
+    """
+
+    def __init__(self, options: Optional[dict] = None) -> None:
+        options = options or {}
+        self._options = options
+        self._patterns = LinePatterns()
+        self._branch = True
+        self._core = "ctrace"
+        self._first_hit = _bool_option(options, "first_hit")
+        self._recording_first_hits = False
+        self._scope = TraceScope.from_options(options)
+        self._include: List[str] = []
+        self._omit: List[str] = []
+        self._source_dirs: List[str] = []
+        self._finder: Optional["EnamlFileFinder"] = None
+        self._paths: Dict[str, List[str]] = {}
+        self._resolver: Optional["SourceResolver"] = None
+        # Created along with the first file reporter by _setup_reporting.
+        self._reporting = False
+        self._cache: Optional["AnalysisCache"] = None
+        self._parsers: Optional["ParserCache"] = None
+        self._sources: Optional["SourceLoader"] = None
+        self._blocks: Optional["BlockCache"] = None
+        self._batch: Optional["BatchAnalyser"] = None
+        self._server: Optional["AnalysisClient"] = None
+        self._sidecar: Optional["Sidecar"] = None
+        self._sidecar_path: Optional[str] = None
+        self._data_file = ".coverage"
+
+    def configure(self, config: Any) -> None:
+        """Read the settings of coverage influencing the tracing and analysis."""
+        self._patterns = LinePatterns.from_config(config, self._options)
+        self._branch = bool(config.get_option("run:branch"))
+        self._data_file = config.get_option("run:data_file")
+        source = config.get_option("run:source") or ()
+        self._source_dirs = [d for d in source if os.path.isdir(d)]
+        self._scope.add_include_roots(self._source_dirs)
+        self._scope.coverage_filters_third_party = not config.get_option("run:include")
+        self._include = list(config.get_option("run:include") or ())
+        self._omit = list(config.get_option("run:omit") or ())
+        self._paths = dict(config.get_option("paths") or {})
+        self._resolver = None
+        self._core = requested_core(config)
+        if not core_supports_plugin(self._core):
+            warnings.warn(unsupported_core_message(self._core), RuntimeWarning)
+        enable_from_config(config, self._options)
+        if self._first_hit:
+            self._first_hit = firsthit.available()
+        if self._first_hit:
+            # Coverage then decides once per file not to trace the enaml files,
+            # while claiming them would cost a callback per frame.
+            config.set_option("run:omit", self._omit + [firsthit.ENAML_FILES])
+            if self._branch:
+                warnings.warn(firsthit.BRANCH_MESSAGE, RuntimeWarning)
 
-    def file_tracer(self, filename: str) -> Optional["EnamlFileTracer"]:
-        """Create a file tracer for each discovered enaml file."""
-        if filename.endswith(".enaml"):
+    def file_tracer(self, filename: str) -> Optional[FileTracer]:
+        """Create a file tracer for each discovered enaml file.
+
+        Enaml files out of the scope of the measurement get a tracer ignoring
+        their frames, since coverage would trace them as Python files if no
+        plugin claimed them. Code whose filename does not exist, loaded from
+        a zip, a frozen bundle or a relocated bytecode cache, gets a tracer
+        mapping it to its source. No file is claimed in first-hit mode.
+
+        """
+        if self._first_hit:
+            if not self._recording_first_hits:
+                # Unlike configure, file_tracer is only called when measuring,
+                # and not when reporting or combining.
+                self._recording_first_hits = True
+                # The reporter is imported now since imports can fail while the
+                # interpreter exits, when the recorded lines are saved.
+                from .reporter import EnamlFileReporter
+
+                firsthit.start_recording(
+                    self._data_file,
+                    self._scope,
+                    functools.partial(
+                        EnamlFileReporter, patterns=self._patterns, branch=False
+                    ),
+                    self._unexecuted_files,
+                )
+            # The enaml files are omitted by coverage, their first hits being
+            # recorded through sys.monitoring.
+            return None
+        if not filename.endswith(".enaml"):
+            return None
+        if not os.path.exists(filename):
+            # The scope of the source is checked once it is found, but code
+            # compiled under an exclude root is not worth looking for.
+            if not self._scope.excluded(filename):
+                return EnamlRelocatedFileTracer(filename, self._relocate)
+        if self._in_scope(filename):
             return EnamlFileTracer(filename)
-        return None
+        return IGNORED_FILE_TRACER
+
+    def find_executable_files(self, src_dir: str) -> Iterable[str]:
+        """Find the enaml files of a source directory, executed or not.
+
+        The files omitted, not included or out of the scope of the measurement
+        are skipped, as are the bytecode caches, virtual environments and VCS
+        directories.
 
-    def file_reporter(self, filename: str) -> EnamlFileReporter:
+        """
+        from .discovery import EnamlFileFinder
+
+        if self._finder is None:
+            self._finder = EnamlFileFinder.from_options(self._options)
+        return self._finder.find(
+            src_dir, include=self._include, omit=self._omit, scope=self._scope
+        )
+
+    def file_reporter(self, filename: str) -> "EnamlFileReporter":
         """Create a file reporter for a given filename."""
-        return EnamlFileReporter(filename)
+        from .cache import MEMORY_CACHE
+        from .reporter import EnamlFileReporter
+
+        self._setup_reporting()
+        assert self._sources is not None
+        reporter = EnamlFileReporter(
+            filename,
+            cache=self._cache,
+            batch=self._batch,
+            patterns=self._patterns,
+            branch=self._branch,
+            parsers=self._parsers,
+            blocks=self._blocks,
+            memory=MEMORY_CACHE,
+            sources=self._sources,
+            server=self._server,
+            sidecar=self._sidecar,
+        )
+        self._sources.register(reporter.filename)
+        if self._batch is not None:
+            self._batch.register(reporter)
+        return reporter
+
+    def sys_info(self) -> List[Tuple[str, Any]]:
+        """Report information useful for debugging."""
+        from .analysis import ENAML_CACHE_STATS
+        from .cache import MEMORY_CACHE
+
+        info = [
+            ("coverage_core", self._core),
+            ("first_hit", self._first_hit),
+            ("core_supports_plugin", core_supports_plugin(self._core)),
+            ("enaml_cache_hits", ENAML_CACHE_STATS["hits"]),
+            ("enaml_cache_misses", ENAML_CACHE_STATS["misses"]),
+            ("memory_cache_hits", MEMORY_CACHE.hits),
+            ("memory_cache_misses", MEMORY_CACHE.misses),
+            ("source_reads", self._sources.reads if self._sources else 0),
+        ]
+        if self._sidecar is not None:
+            info.append(("sidecar", self._sidecar_path))
+            info.append(("sidecar_hits", self._sidecar.hits))
+        if self._server is not None:
+            info.append(("analysis_server", self._server.path))
+            info.append(("analysis_server_answers", self._server.answers))
+        if self._resolver is not None:
+            info.append(("relocated_source_searches", self._resolver.searches))
+        if self._blocks is not None:
+            info.append(("block_cache_hits", self._blocks.hits))
+            info.append(("block_cache_misses", self._blocks.misses))
+        return info + PROFILER.sys_info()
+
+    # --- Private API
+
+    def _in_scope(self, filename: str) -> bool:
+        """Whether the frames of an enaml file should reach coverage."""
+        # Files which coverage does not trace anyway get a regular tracer, since
+        # coverage skips them at no cost when they are executed.
+        scope = self._scope
+        return scope.should_trace(filename) or scope.filtered_by_coverage(filename)
+
+    def _unexecuted_files(self) -> List[str]:
+        """Enaml files of the source directories, reported even if they never ran.
+
+        Coverage no longer finds them once they are omitted in first-hit mode.
+
+        """
+        return [
+            os.path.abspath(path)
+            for src_dir in self._source_dirs
+            for path in self.find_executable_files(src_dir)
+        ]
+
+    def _relocate(self, filename: str, module: Optional[str]) -> Optional[str]:
+        """Map the filename of a code object to the source which is traced."""
+        from .relocation import SourceResolver
+
+        if self._resolver is None:
+            self._resolver = SourceResolver(self._scope.include_roots, self._paths)
+        source = self._resolver.resolve(filename, module) or filename
+        return source if self._in_scope(source) else None
+
+    def _setup_reporting(self) -> None:
+        """Import the analysis stack and create the caches used by reporters."""
+        if self._reporting:
+            return
+        from .batch import DEFAULT_PARALLEL_THRESHOLD, BatchAnalyser
+        from .cache import AnalysisCache
+        from .reporter import DEFAULT_PARSER_CACHE_SIZE, ParserCache
+        from .server import AnalysisClient
+        from .sidecar import Sidecar, sidecar_path
+        from .source import SourceLoader
+
+        options = self._options
+        self._sidecar_path = options.get("sidecar") or sidecar_path(self._data_file)
+        self._sidecar = Sidecar.load(self._sidecar_path)
+        self._cache = AnalysisCache.from_options(options)
+        self._parsers = ParserCache(
+            int(options.get("parser_cache_size", DEFAULT_PARSER_CACHE_SIZE))
+        )
+        self._sources = SourceLoader(read_ahead=int(options.get("read_ahead", 0)))
+        self._server = AnalysisClient.from_options(options)
+        if _bool_option(options, "incremental"):
+            from .blocks import DEFAULT_BLOCK_CACHE_SIZE, BlockCache
+
+            self._blocks = BlockCache(
+                int(options.get("block_cache_size", DEFAULT_BLOCK_CACHE_SIZE)),
+                disk=self._cache,
+            )
+        if _bool_option(options, "parallel"):
+            self._batch = BatchAnalyser(
+                workers=int(options.get("workers") or 0) or None,
+                threshold=int(
+                    options.get("parallel_threshold", DEFAULT_PARALLEL_THRESHOLD)
+                ),
+            )
+        self._reporting = True
+
+
+def _bool_option(options: dict, name: str, default: bool = False) -> bool:
+    """Interpret a plugin option as a boolean."""
+    value = options.get(name, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
 
 
 class EnamlFileTracer(FileTracer):
@@ -38,3 +340,54 @@ class EnamlFileTracer(FileTracer):
     def source_filename(self) -> str:
         """Return the filename passed as creation."""
         return self._filename
+
+
+class EnamlIgnoredFileTracer(FileTracer):
+    """Tracer of the enaml files which should not be measured."""
+
+    def has_dynamic_source_filename(self) -> bool:
+        """Use a dynamic source filename to be able to reject all frames."""
+        return True
+
+    def dynamic_source_filename(self, filename: str, frame: Any) -> None:
+        """Do not trace the frame."""
+        return None
+
+
+#: Marker of the relocated tracers which did not resolve their source yet.
+_UNRESOLVED: Any = object()
+
+
+class EnamlRelocatedFileTracer(EnamlFileTracer):
+    """Tracer of the enaml code whose filename does not exist.
+
+    The source is resolved on the first frame, whose module name helps with
+    relative filenames, and memoised so that the other frames only cost an
+    attribute lookup. Code whose source cannot be found is recorded under its
+    filename, as by the regular tracer.
+
+    """
+
+    def __init__(
+        self, filename: str, relocate: Callable[[str, Optional[str]], Optional[str]]
+    ) -> None:
+        super().__init__(filename)
+        self._relocate = relocate
+        self._source: Any = _UNRESOLVED
+
+    def has_dynamic_source_filename(self) -> bool:
+        """Map the frames to the source found for the filename."""
+        return True
+
+    def dynamic_source_filename(self, filename: str, frame: Any) -> Optional[str]:
+        """Return the source of the code, None if it should not be traced."""
+        source = self._source
+        if source is _UNRESOLVED:
+            module = frame.f_globals.get("__name__") if frame is not None else None
+            # The C tracer of coverage passes None as filename.
+            source = self._source = self._relocate(self._filename, module)
+        return source
+
+
+#: Tracer shared by all the ignored enaml files.
+IGNORED_FILE_TRACER = EnamlIgnoredFileTracer()
@@ -0,0 +1,239 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Opt-in instrumentation of the phases of the analysis of enaml files.
+
+The profiler records, for each file and each phase of its analysis, the wall
+time spent in the phase and the peak memory allocated during it. Phases may
+nest (parsing happens on demand while finding statements for example): the
+time of a phase excludes the time of the phases nested in it while its peak
+allocation includes them.
+
+Profiling is disabled by default and only costs a method call per phase in
+that case. Memory is measured with tracemalloc, started by the first recorded
+phase, which slows down the analysis noticeably.
+
+"""
+import atexit
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+#: Name of the coverage debug option enabling the profiler.
+DEBUG_OPTION = "enaml_profile"
+
+#: Environment variable enabling the profiler when set to a non empty value.
+PROFILE_ENV = "ENAML_COVERAGE_PROFILE"
+
+#: Environment variable giving the path of the JSON dump of the profile.
+PROFILE_OUTPUT_ENV = "ENAML_COVERAGE_PROFILE_OUTPUT"
+
+#: Phases of the analysis in the order in which they happen.
+PHASES = ("read", "exclude", "scan", "parse", "compile", "statements", "arcs")
+
+
+class _Frame:
+    """Running phase of the analysis of a file."""
+
+    __slots__ = ("filename", "phase", "start", "children", "base", "peak")
+
+    def __init__(self, filename: str, phase: str, base: int) -> None:
+        self.filename = filename
+        self.phase = phase
+        self.start = time.perf_counter()
+        self.children = 0.0
+        self.base = base
+        self.peak = base
+
+
+class PhaseProfiler:
+    """Record the time and peak allocation of each phase for each file.
+
+    Results are stored as ``{filename: {phase: [seconds, peak_bytes]}}``,
+    phases happening several times for a file being accumulated (maximum for
+    the peak allocation).
+
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.output: Optional[str] = None
+        self.results: Dict[str, Dict[str, List[float]]] = {}
+        self._stack: List[_Frame] = []
+        self._memory = False
+        self._report_at_exit = False
+
+    def enable(self, memory: bool = True, output: Optional[str] = None) -> None:
+        """Start recording, tracing allocations if `memory` is True.
+
+        If `output` is given, the results are dumped to it as JSON when the
+        process exits, along with the summary printed on stderr.
+
+        Allocations are only traced from the first recorded phase, since the
+        profiler is also enabled in the measured processes where nothing is
+        analysed and tracing would slow down the whole run.
+
+        """
+        self.enabled = True
+        self.output = output or self.output
+        # Resetting the peak is needed to measure the peak of each phase.
+        self._memory = memory and hasattr(tracemalloc, "reset_peak")
+
+    def disable(self) -> None:
+        """Stop recording, the results recorded so far are kept."""
+        self.enabled = False
+
+    def clear(self) -> None:
+        """Discard the recorded results."""
+        self.results.clear()
+
+    def phase(self, filename: str, name: str):
+        """Context manager recording a phase of the analysis of a file."""
+        if not self.enabled:
+            return _NULL_PHASE
+        return self._record(filename, name)
+
+    def totals(self) -> Dict[str, List[float]]:
+        """Total time and largest peak allocation of each phase."""
+        totals: Dict[str, List[float]] = {}
+        for phases in self.results.values():
+            for name, (seconds, peak) in phases.items():
+                total = totals.setdefault(name, [0.0, 0])
+                total[0] += seconds
+                total[1] = max(total[1], peak)
+        return totals
+
+    def slowest(self, limit: int = 10) -> List[Tuple[str, float]]:
+        """Files whose analysis took the longest, slowest first."""
+        durations = [
+            (filename, sum(seconds for seconds, _ in phases.values()))
+            for filename, phases in self.results.items()
+        ]
+        durations.sort(key=lambda item: item[1], reverse=True)
+        return durations[:limit]
+
+    def summary(self, limit: int = 10) -> str:
+        """Table of the slowest files with the time of each of their phases."""
+        phases = [p for p in PHASES if p in self.totals()]
+        header = f"{'file':<40} {'total':>9}" + "".join(f" {p:>10}" for p in phases)
+        lines = ["enaml_coverage_plugin analysis profile (ms, peak KiB)", header]
+        for filename, total in self.slowest(limit):
+            name = filename if len(filename) <= 40 else "..." + filename[-37:]
+            line = f"{name:<40} {total * 1e3:9.1f}"
+            for phase in phases:
+                seconds, _ = self.results[filename].get(phase, (0.0, 0))
+                line += f" {seconds * 1e3:10.1f}"
+            lines.append(line)
+        if self._memory:
+            totals = self.totals()
+            lines.append(
+                f"{'peak allocation':<40} {'':>9}"
+                + "".join(f" {totals[p][1] / 1024:10.0f}" for p in phases)
+            )
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Machine readable form of the results."""
+        return {
+            "memory": self._memory,
+            "files": {
+                filename: {
+                    name: {"seconds": seconds, "peak_bytes": int(peak)}
+                    for name, (seconds, peak) in phases.items()
+                }
+                for filename, phases in self.results.items()
+            },
+        }
+
+    def dump(self, path: str) -> None:
+        """Write the results as JSON to `path`."""
+        with open(path, "w", encoding="utf-8") as dump_file:
+            json.dump(self.to_dict(), dump_file, indent=1)
+
+    def sys_info(self) -> List[Tuple[str, Any]]:
+        """Totals per phase, in the format of the plugin sys_info."""
+        if not self.enabled and not self.results:
+            return [("enaml_profile", "disabled")]
+        info: List[Tuple[str, Any]] = [("enaml_profile_files", len(self.results))]
+        for name, (seconds, peak) in self.totals().items():
+            info.append((f"enaml_profile_{name}", f"{seconds:.3f} s, {peak} B"))
+        return info
+
+    # --- Private API
+
+    @contextmanager
+    def _record(self, filename: str, name: str) -> Iterator[None]:
+        if not self._report_at_exit:
+            self._start()
+        stack = self._stack
+        base = 0
+        if self._memory:
+            base, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+        frame = _Frame(filename, name, base)
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            duration = time.perf_counter() - frame.start
+            if self._memory:
+                frame.peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1].children += duration
+                stack[-1].peak = max(stack[-1].peak, frame.peak)
+                if self._memory:
+                    tracemalloc.reset_peak()
+            result = self.results.setdefault(filename, {}).setdefault(name, [0.0, 0])
+            result[0] += duration - frame.children
+            result[1] = max(result[1], frame.peak - frame.base)
+
+    def _start(self) -> None:
+        """Trace the allocations and report at exit once a phase is recorded."""
+        if self._memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        atexit.register(self._report)
+        self._report_at_exit = True
+
+    def _report(self, stream: Optional[TextIO] = None) -> None:
+        """Print the summary and dump the results, if any were recorded."""
+        if not self.results:
+            return
+        print(self.summary(), file=stream or sys.stderr)
+        if self.output:
+            self.dump(self.output)
+
+
+class _NullPhase:
+    """Context manager doing nothing, used when profiling is disabled."""
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+#: Profiler shared by all the analyses of the process.
+PROFILER = PhaseProfiler()
+
+
+def enable_from_config(config: Any, options: dict) -> None:
+    """Enable the profiler if requested by the coverage debug option or env."""
+    debug = config.get_option("run:debug") or ()
+    if DEBUG_OPTION in debug or os.environ.get(PROFILE_ENV):
+        PROFILER.enable(
+            output=options.get("profile_output") or os.environ.get(PROFILE_OUTPUT_ENV)
+        )
@@ -0,0 +1,104 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Mapping of the filenames of enaml code objects to existing sources.
+
+The filename of the code compiled from an enaml file is the path the file had
+when it was compiled. It does not exist when the code is loaded from a zipped
+application or a frozen bundle, or from an ``__enamlcache__`` entry compiled
+before the tree was moved or on another machine. Coverage would record such
+code under a path which cannot be read at report time, and drop it.
+
+The sources are looked for, in order:
+
+- through the aliases of the ``[paths]`` section of the coverage
+  configuration, as ``coverage combine`` does
+- from the name of the module executing the code, under each source root or
+  its parent
+- from the longest trailing part of the filename, with at least its parent
+  directory, found under a source root
+
+The source roots are the directories of the ``source`` run setting, the
+include_roots of the plugin and the current directory.
+
+"""
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+from coverage.files import PathAliases
+
+
+class SourceResolver:
+    """Map the filenames of enaml code objects to existing enaml files.
+
+    Resolutions are memoised per filename, `searches` counts the filenames
+    which had to be looked for.
+
+    """
+
+    def __init__(
+        self,
+        roots: Iterable[str] = (),
+        paths: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        self.roots: List[str] = []
+        for root in list(roots) + [os.curdir]:
+            root = os.path.abspath(os.path.expanduser(os.path.expandvars(root)))
+            if root not in self.roots:
+                self.roots.append(root)
+        self._aliases: Optional[PathAliases] = None
+        if paths:
+            self._aliases = PathAliases()
+            for aliases in paths.values():
+                for pattern in aliases[1:]:
+                    self._aliases.add(pattern, aliases[0])
+        self._resolved: Dict[str, Optional[str]] = {}
+        self.searches = 0
+
+    def resolve(self, filename: str, module: Optional[str] = None) -> Optional[str]:
+        """Find the source of the code compiled from `filename`.
+
+        `module` is the name of the module executing the code, if known, which
+        distinguishes between relative filenames. It is only used the first
+        time a filename is resolved. None is returned if no source was found.
+
+        """
+        try:
+            return self._resolved[filename]
+        except KeyError:
+            pass
+        self.searches += 1
+        source = self.search(filename, module)
+        self._resolved[filename] = source
+        return source
+
+    def search(self, filename: str, module: Optional[str] = None) -> Optional[str]:
+        """Look for the source of `filename`, without memoising the result."""
+        if os.path.isfile(filename):
+            return os.path.abspath(filename)
+        if self._aliases is not None:
+            mapped = self._aliases.map(filename, exists=os.path.isfile)
+            if mapped != filename:
+                return mapped
+        if module and module != "__main__":
+            relative = os.path.join(*module.split(".")) + ".enaml"
+            for root in self.roots:
+                for base in (root, os.path.dirname(root)):
+                    candidate = os.path.join(base, relative)
+                    if os.path.isfile(candidate):
+                        return candidate
+        # The filename may come from another platform. At least the parent
+        # directory must match, a basename alone is too ambiguous.
+        parts = [p for p in re.split(r"[\\/]", filename) if p]
+        for start in range(1, len(parts) - 1):
+            relative = os.path.join(*parts[start:])
+            for root in self.roots:
+                candidate = os.path.join(root, relative)
+                if os.path.isfile(candidate):
+                    return candidate
+        return None
@@ -8,24 +8,104 @@
 """Plugin providing coverage support for enaml files.
 
 """
+import collections
 import os.path
 import types
-from typing import Set, Tuple
+from typing import TYPE_CHECKING, Dict, Optional, Set, Tuple
 
 from coverage import files
-from coverage.misc import CoverageException, isolate_module
+from coverage.misc import CoverageException, NoSource, NotPython, isolate_module
 from coverage.plugin import FileReporter
-from coverage.python import get_python_source
 
-from .parser import EnamlParser
+from .analysis import FileAnalysis, NotEnaml
+from .cache import AnalysisCache, MemoryCache, source_digest
+from .exclusion import LinePatterns
+from .source import SourceLoader
+
+# The enaml parser is only imported when a file is analysed in this process,
+# the analyses may come from the caches or from an analysis server.
+if TYPE_CHECKING:
+    from .batch import BatchAnalyser
+    from .blocks import BlockCache
+    from .parser import EnamlParser
+    from .server import AnalysisClient
+    from .sidecar import Sidecar
 
 os = isolate_module(os)
 
+#: Default number of parsers kept alive by a ParserCache.
+DEFAULT_PARSER_CACHE_SIZE = 8
+
+
+class ParserCache:
+    """Size-bounded LRU of the parsers of the reported files.
+
+    Parsers hold the source, the enaml AST and the code of a file which are
+    only needed while analysing it. Reporters only keep the compact result of
+    the analysis and rebuild a parser on demand if it was evicted.
+
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_PARSER_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._parsers: "collections.OrderedDict[Tuple[str, bool], EnamlParser]"
+        self._parsers = collections.OrderedDict()
+
+    def __contains__(self, key: Tuple[str, bool]) -> bool:
+        return key in self._parsers
+
+    def __len__(self) -> int:
+        return len(self._parsers)
+
+    def get(self, key: Tuple[str, bool]) -> Optional["EnamlParser"]:
+        """Retrieve a parser, marking it as recently used."""
+        parser = self._parsers.get(key)
+        if parser is not None:
+            self._parsers.move_to_end(key)
+        return parser
+
+    def set(self, key: Tuple[str, bool], parser: "EnamlParser") -> None:
+        """Store a parser, evicting the least recently used ones if needed."""
+        self._parsers[key] = parser
+        self._parsers.move_to_end(key)
+        while len(self._parsers) > max(self.maxsize, 0):
+            self._parsers.popitem(last=False)
+
+    def clear(self) -> None:
+        """Discard all the parsers."""
+        self._parsers.clear()
+
 
 class EnamlFileReporter(FileReporter):
-    """Enaml file reporter."""
+    """Enaml file reporter.
+
+    When `branch` is False, the file is analysed for line coverage only, which
+    is faster. The arcs are still analysed if they are requested. When a block
+    cache is given as `blocks`, the file is analysed incrementally. When a
+    memory cache is given as `memory`, the analysis is shared with the later
+    reporters of the file. The source is read through `sources`, which
+    should be shared by the reporters so that each file is read once. When a
+    client of an analysis server is given as `server`, the files which are not
+    in the caches are analysed by the server if it can be reached. The
+    analyses exported to a sidecar given as `sidecar` are used first, even
+    when the source is not available.
+
+    """
 
-    def __init__(self, morf):
+    def __init__(
+        self,
+        morf,
+        cache: Optional[AnalysisCache] = None,
+        batch: Optional["BatchAnalyser"] = None,
+        patterns: Optional[LinePatterns] = None,
+        branch: bool = True,
+        parsers: Optional[ParserCache] = None,
+        blocks: Optional["BlockCache"] = None,
+        memory: Optional[MemoryCache] = None,
+        sources: Optional[SourceLoader] = None,
+        server: Optional["AnalysisClient"] = None,
+        sidecar: Optional["Sidecar"] = None,
+    ):
         if hasattr(morf, "__file__"):
             filename = morf.__file__
         elif isinstance(morf, types.ModuleType):
@@ -40,32 +120,72 @@ class EnamlFileReporter(FileReporter):
         if hasattr(morf, "__name__"):
             name = morf.__name__
             name = name.replace(".", os.sep) + ".enaml"
-            name = files.unicode_filename(name)
         else:
             name = files.relative_filename(filename)
         self.relname = name
 
-        self._source = None
-        self._parser = None
-        self._statements = None
-        self._excluded = None
+        self._parsers = parsers if parsers is not None else ParserCache(1)
+        self._key: Optional[str] = None
+        self._cache = cache
+        self._batch = batch
+        self._patterns = patterns or LinePatterns()
+        self._branch = branch
+        self._blocks = blocks
+        self._memory = memory
+        self._sources = sources if sources is not None else SourceLoader(1)
+        self._server = server
+        self._sidecar = sidecar
+        self._digest: Optional[str] = None
+        self._analysis: Optional[FileAnalysis] = None
 
     def relative_filename(self) -> str:
         return self.relname
 
     @property
-    def parser(self) -> EnamlParser:
-        """Lazily create a parser."""
-        if self._parser is None:
-            with open(self.filename, "r") as src_file:
-                src = src_file.read()
-            self._parser = EnamlParser(
+    def parser(self) -> "EnamlParser":
+        """Lazily create a parser, which is only kept in the parser cache."""
+        parser = self._parsers.get(self._parser_key())
+        if parser is None:
+            from .parser import EnamlParsedUnit, EnamlParser
+
+            src = self.source()
+            parser = EnamlParser(
                 text=src,
                 filename=self.filename,
-                #                exclude=self.coverage._exclude_regex('exclude'),
+                exclude=self._patterns.exclude_regex,
+                unit=EnamlParsedUnit(src, self.filename, use_enaml_cache=True),
+                line_only=not self._branch,
+                blocks=self._blocks,
             )
-            self._parser.parse_source()
-        return self._parser
+            parser.parse_source()
+            self._parsers.set(self._parser_key(), parser)
+        return parser
+
+    @property
+    def analysis(self) -> FileAnalysis:
+        """Lazily analyse the file, reusing a cached analysis when possible."""
+        if self._analysis is None:
+            if self._batch is not None:
+                batch, self._batch = self._batch, None
+                batch.run()
+            if not self._load_cached_analysis():
+                self._set_analysis(self._request_analysis() or self._analyse())
+        analysis = self._analysis
+        assert analysis is not None
+        if analysis.error is not None:
+            raise NotEnaml(analysis.error)
+        return analysis
+
+    @property
+    def arc_analysis(self) -> FileAnalysis:
+        """Analysis of the file including the arcs."""
+        if not self.analysis.has_arcs:
+            # Arcs measured with branch coverage are reported although branch
+            # coverage is now off, analyse the file again.
+            self._branch = True
+            self._key = None
+            self._analysis = None
+        return self.analysis
 
     def lines(self) -> Set[int]:
         """Get the executable lines in this file.
@@ -76,7 +196,7 @@ class EnamlFileReporter(FileReporter):
         Returns a set of line numbers.
 
         """
-        return self.parser.statements
+        return self.analysis.statements
 
     def excluded_lines(self) -> Set[int]:
         """Get the excluded executable lines in this file.
@@ -89,11 +209,11 @@ class EnamlFileReporter(FileReporter):
         The base implementation returns the empty set.
 
         """
-        return self.parser.excluded
+        return self.analysis.excluded
 
     def translate_lines(self, lines: Set[int]) -> Set[int]:
         """Translate recorded lines into reported lines."""
-        return self.parser.translate_lines(lines)
+        return self.analysis.translate_lines(lines)
 
     def translate_arcs(self, arcs: Set[Tuple[int, int]]) -> Set[Tuple[int, int]]:
         """Translate recorded arcs into reported arcs.
@@ -102,27 +222,132 @@ class EnamlFileReporter(FileReporter):
         line number pairs.
 
         """
-        return self.parser.translate_arcs(arcs)
+        return self.analysis.translate_arcs(arcs)
 
     def no_branch_lines(self) -> Set[int]:
         """Get the lines excused from branch coverage in this file."""
-        no_branch = self.parser.lines_matching()
-        return no_branch
+        return self.analysis.no_branch
 
     def arcs(self) -> Set[Tuple[int, int]]:
-        return self.parser.arcs()
+        return self.arc_analysis.arcs
 
-    def exit_counts(self) -> Set[Tuple[int, int]]:
+    def exit_counts(self) -> Dict[int, int]:
         """Get a count of exits from that each line."""
-        return self.parser.exit_counts()
+        return self.arc_analysis.exit_counts
 
     def missing_arc_description(
         self, start: int, end: int, executed_arcs: Set[Tuple[int, int]] = None
     ) -> str:
         """Provide an English sentence describing a missing arc."""
-        return self.parser.missing_arc_description(start, end, executed_arcs)
+        return self.arc_analysis.missing_arc_description(start, end, executed_arcs)
 
     def source(self) -> str:
-        if self._source is None:
-            self._source = get_python_source(self.filename)
-        return self._source
+        # The source is kept by the shared source loader.
+        return self._sources.get(self.filename)
+
+    def should_be_python(self) -> bool:
+        """Report the enaml files which cannot be parsed as errors.
+
+        Coverage assumes that only the reporters of Python files raise
+        NotPython, and asks them whether the error should be reported or the
+        file silently skipped.
+
+        """
+        return True
+
+    # --- Private API
+
+    def _load_cached_analysis(self) -> bool:
+        """Retrieve the analysis from the caches and return whether it is known."""
+        if self._analysis is None and self._sidecar is not None:
+            self._analysis = self._sidecar.get(
+                self.filename, self._patterns, self._sidecar_digest()
+            )
+            if self._analysis is not None:
+                return True
+        if self._analysis is None and self._memory is not None:
+            self._analysis = self._memory.get(
+                self.filename, self._source_digest(), self._options()
+            )
+            if self._analysis is not None:
+                return True
+        if self._analysis is None and self._cache is not None:
+            self._analysis = self._cache.get(self._cache_key())
+            if self._analysis is not None and self._memory is not None:
+                self._memory.set(
+                    self.filename,
+                    self._source_digest(),
+                    self._options(),
+                    self._analysis,
+                )
+        return self._analysis is not None
+
+    def _set_analysis(self, analysis: FileAnalysis) -> None:
+        """Set the analysis of the file and store it in the caches."""
+        self._analysis = analysis
+        if self._memory is not None:
+            self._memory.set(
+                self.filename, self._source_digest(), self._options(), analysis
+            )
+        if self._cache is not None:
+            self._cache.set(self._cache_key(), analysis)
+
+    def _options(self) -> str:
+        """Describe the settings influencing the analysis of the file."""
+        options = self._patterns.fingerprint()
+        if self._branch:
+            options += "|branch"
+        return options
+
+    def _source_digest(self) -> str:
+        """Digest of the source of the file, computed once per reporter."""
+        if self._digest is None:
+            self._digest = source_digest(self.source())
+        return self._digest
+
+    def _sidecar_digest(self) -> Optional[str]:
+        """Digest of the source, None if the source is not available."""
+        try:
+            return self._source_digest()
+        except NoSource:
+            return None
+
+    def _cache_key(self) -> str:
+        """Key of the analysis of the file in the cache."""
+        assert self._cache is not None
+        if self._key is None:
+            self._key = self._cache.key(self.source(), self._options())
+        return self._key
+
+    def _parser_key(self) -> Tuple[str, bool]:
+        """Key of the parser of the file in the parser cache."""
+        return (self.filename, self._branch)
+
+    def _has_parser(self) -> bool:
+        """Whether a parser of the file is available without parsing it."""
+        return self._parser_key() in self._parsers
+
+    def _request_analysis(self) -> Optional[FileAnalysis]:
+        """Ask the analysis server for the analysis of the file, if any."""
+        if self._server is None:
+            return None
+        return self._server.analyse(
+            self.filename, self._source_digest(), self._patterns, self._branch
+        )
+
+    def _analyse(self) -> FileAnalysis:
+        """Analyse the file using a parser.
+
+        Parsing failures are recorded in the analysis so that they can be
+        cached like any other result.
+
+        """
+        try:
+            parser = self.parser
+            return FileAnalysis.from_parser(
+                parser,
+                no_branch=parser.lines_matching(self._patterns.partial_regex),
+                arcs=self._branch,
+            )
+        except NotPython as err:
+            return FileAnalysis.from_error(str(err))
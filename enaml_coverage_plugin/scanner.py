@@ -0,0 +1,217 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Single pass scanner collecting the line facts needed by the enaml parser.
+
+The scanner replaces a tokenize based pass. Rather than producing every token,
+a single regular expression only stops on the elements relevant to the
+analysis (line ends, strings, comments, brackets and colons) and the scanner
+tracks the indentation and the logical lines itself. Enaml operators (``::``
+and ``:=``) are recognized natively.
+
+"""
+import re
+from tokenize import TokenError
+from typing import Dict, List, NamedTuple, Set
+
+_STRING_PREFIX = r"(?:\b[rRbBuUfF]{1,2})?"
+
+_STRING = (
+    r"'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''"
+    r'|"""[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""'
+    r"|'(?!'')[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    r'|"(?!"")[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+)
+
+# The leading lookahead lets the regex engine skip quickly over the characters
+# which cannot start a match. A newline is matched along with the indentation
+# of the following line.
+_SCANNER = re.compile(
+    r"(?=[\n\r'\"#:()\[\]{}\\])(?:"
+    r"(?P<newline>\r?\n)(?P<indentation>[ \t\f]*)"
+    r"|(?P<string>" + _STRING + r")"
+    r"|(?P<comment>#[^\r\n]*)"
+    r"|(?P<continuation>\\\r?\n)"
+    r"|(?P<op>::|:=|[:()\[\]{}])"
+    r"|(?P<quote>['\"])"
+    r")",
+    re.DOTALL,
+)
+
+_STRING_START = re.compile(_STRING_PREFIX + "['\"]")
+
+_CLASS_START = re.compile(r"(?:class|enamldef)\b")
+
+_OPENING = frozenset("([{")
+
+_CLOSING = frozenset(")]}")
+
+_TABSIZE = 8
+
+
+class SourceFacts(NamedTuple):
+    """Facts about the lines of a source collected by scan_source."""
+
+    #: Lines on which a class or an enamldef is defined.
+    classdefs: Set[int]
+
+    #: Lines belonging to docstrings.
+    docstrings: Set[int]
+
+    #: Excluded lines, including the lines of excluded suites.
+    excluded: Set[int]
+
+    #: Map of the lines of multi-line statements to their first line.
+    multiline: Dict[int, int]
+
+    #: Whether the source contains no statement at all.
+    empty: bool
+
+
+def _column(indentation: str) -> int:
+    """Compute the column of an indentation the way tokenize does."""
+    column = 0
+    for char in indentation:
+        if char == " ":
+            column += 1
+        elif char == "\t":
+            column = (column // _TABSIZE + 1) * _TABSIZE
+        else:
+            column = 0
+    return column
+
+
+def scan_source(text: str, excluded: Set[int]) -> SourceFacts:  # noqa: C901
+    """Scan an enaml source to find the interesting facts about its lines.
+
+    `excluded` are the lines matching an exclusion pattern, the returned facts
+    contain them along with the lines of the suites they introduce.
+
+    The logic mirrors the one of coverage PythonParser._raw_parse.
+
+    """
+    excluded = set(excluded)
+    classdefs: Set[int] = set()
+    docstrings: Set[int] = set()
+    multiline: Dict[int, int] = {}
+    empty = True
+
+    # The text is scanned with a leading newline so that the first line is
+    # handled like any other line.
+    text = "\n" + text
+    lineno = 0
+    indents: List[int] = [0]
+    indent = 0
+    exclude_indent = 0
+    excluding = False
+    excluding_decorators = False
+    nesting = 0
+    first_line = 0
+    # Set when a logical line starts with a string, in which case the first
+    # token of the statement is only handled once the string end is known.
+    pending_string = False
+    after_indent = False
+
+    for match in _SCANNER.finditer(text):
+        kind = match.lastgroup
+
+        if kind == "indentation":
+            # The end of a line, which may be the end of a logical line.
+            if first_line and not nesting:
+                if lineno != first_line:
+                    for line in range(first_line, lineno + 1):
+                        multiline[line] = first_line
+                first_line = 0
+            lineno += 1
+            if nesting or first_line:
+                continue
+
+            end = match.end()
+            char = text[end : end + 1]
+            if char in ("", "\n", "\r", "#", "\\"):
+                # Blank and comment lines do not start a statement.
+                continue
+
+            # The start of a logical line.
+            column = _column(match.group("indentation"))
+            # Like tokenize, consider that the source starts with an indent.
+            after_indent = match.start() == 0
+            if column > indents[-1]:
+                indents.append(column)
+                indent += 1
+                after_indent = True
+            elif column < indents[-1]:
+                while column < indents[-1]:
+                    indents.pop()
+                    indent -= 1
+                if column != indents[-1]:
+                    raise IndentationError(
+                        "unindent does not match any outer indentation level",
+                        ("<tokenize>", lineno, column, text[match.end(1) : end]),
+                    )
+
+            first_line = lineno
+            empty = False
+            if char == "@":
+                # A decorator.
+                if lineno in excluded:
+                    excluding_decorators = True
+                if excluding_decorators:
+                    excluded.add(lineno)
+            elif _CLASS_START.match(text, end):
+                classdefs.add(lineno)
+            if excluding and indent <= exclude_indent:
+                excluding = False
+            pending_string = bool(_STRING_START.match(text, end))
+            if excluding and not pending_string:
+                excluded.add(lineno)
+
+        elif kind == "string":
+            elineno = lineno + match.group().count("\n")
+            if pending_string:
+                pending_string = False
+                if excluding:
+                    excluded.add(elineno)
+                if after_indent:
+                    # Strings that are first on an indented line are
+                    # docstrings.
+                    docstrings.update(range(lineno, elineno + 1))
+            lineno = elineno
+
+        elif kind == "op":
+            op = match.group()
+            if op == ":" or op == "::":
+                # Both a colon and the enaml :: operator introduce a suite.
+                if not nesting:
+                    should_exclude = lineno in excluded or excluding_decorators
+                    if not excluding and should_exclude:
+                        # Start excluding a suite.  We trigger off of the colon
+                        # token so that the #pragma comment will be recognized
+                        # on the same line as the colon.
+                        excluded.add(lineno)
+                        exclude_indent = indent
+                        excluding = True
+                        excluding_decorators = False
+            elif op in _OPENING:
+                nesting += 1
+            elif op in _CLOSING:
+                nesting = max(nesting - 1, 0)
+
+        elif kind == "continuation":
+            lineno += 1
+
+        elif kind == "quote":
+            if text.startswith(match.group() * 3, match.start()):
+                raise TokenError("EOF in multi-line string", (lineno, 0))
+
+    if nesting:
+        raise TokenError("EOF in multi-line statement", (lineno, 0))
+    if first_line and lineno != first_line:
+        for line in range(first_line, lineno + 1):
+            multiline[line] = first_line
+
+    return SourceFacts(classdefs, docstrings, excluded, multiline, empty)
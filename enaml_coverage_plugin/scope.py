@@ -0,0 +1,157 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Selection of the enaml files which should be traced.
+
+"""
+import importlib.util
+import os
+import site
+import sysconfig
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from coverage.inorout import add_third_party_paths
+
+
+def default_exclude_roots() -> List[str]:
+    """Directories holding third-party code, including enaml itself."""
+    roots = set()
+    for name in ("purelib", "platlib"):
+        path = sysconfig.get_paths().get(name)
+        if path:
+            roots.add(path)
+    try:
+        roots.update(site.getsitepackages())
+    except AttributeError:  # Old virtualenv site.py
+        pass
+    if site.ENABLE_USER_SITE and site.USER_SITE:
+        roots.add(site.USER_SITE)
+    # Locate enaml without importing it, which is not needed to measure.
+    spec = importlib.util.find_spec("enaml")
+    if spec is not None and spec.origin:
+        roots.add(os.path.dirname(spec.origin))
+    return sorted(roots)
+
+
+def _roots_option(value) -> List[str]:
+    """Split a multi-line option into paths."""
+    if isinstance(value, str):
+        value = value.splitlines()
+    return [path.strip() for path in value if path.strip()]
+
+
+class TraceScope:
+    """Decide which enaml files are traced based on their directory.
+
+    A file is traced when the deepest of the roots containing it is an
+    include root. Files outside of all the roots are traced unless include
+    roots are given. Decisions are cached per directory since many files share
+    few directories.
+
+    Coverage does not trace the files installed in third-party locations
+    unless they are explicitly included. `coverage_filters_third_party` tells
+    whether this filtering applies.
+
+    """
+
+    def __init__(
+        self,
+        include_roots: Iterable[str] = (),
+        exclude_roots: Optional[Iterable[str]] = None,
+    ) -> None:
+        if exclude_roots is None:
+            exclude_roots = default_exclude_roots()
+        self._include_roots = [self._normalize(r) for r in include_roots]
+        self._exclude_roots = [self._normalize(r) for r in exclude_roots]
+        self._roots: List[Tuple[str, bool]] = []
+        self._default = True
+        self._decisions: Dict[str, bool] = {}
+        self._third_party: Set[str] = set()
+        add_third_party_paths(self._third_party)
+        self._third_party_prefixes = tuple(
+            self._prefix(self._normalize(p)) for p in self._third_party if p
+        )
+        self._filtered: Dict[str, bool] = {}
+        self.coverage_filters_third_party = True
+        self._update_roots()
+
+    @classmethod
+    def from_options(cls, options: dict) -> "TraceScope":
+        """Create a scope from the include_roots and exclude_roots options."""
+        exclude = options.get("exclude_roots")
+        return cls(
+            include_roots=_roots_option(options.get("include_roots", "")),
+            exclude_roots=_roots_option(exclude) if exclude is not None else None,
+        )
+
+    @property
+    def include_roots(self) -> List[str]:
+        """Directories whose enaml files are traced."""
+        return list(self._include_roots)
+
+    def add_include_roots(self, roots: Iterable[str]) -> None:
+        """Trace the files found under `roots`."""
+        self._include_roots.extend(self._normalize(r) for r in roots)
+        self._update_roots()
+
+    def should_trace(self, filename: str) -> bool:
+        """Whether the enaml file `filename` should be traced."""
+        directory = os.path.dirname(filename)
+        try:
+            return self._decisions[directory]
+        except KeyError:
+            pass
+        decision = self._decide(self._normalize(directory))
+        self._decisions[directory] = decision
+        return decision
+
+    def excluded(self, filename: str) -> bool:
+        """Whether the deepest root containing `filename` is an exclude root."""
+        directory = self._prefix(self._normalize(os.path.dirname(filename)))
+        for prefix, include in self._roots:
+            if directory.startswith(prefix):
+                return not include
+        return False
+
+    def filtered_by_coverage(self, filename: str) -> bool:
+        """Whether coverage itself does not trace the file `filename`."""
+        if not self.coverage_filters_third_party:
+            return False
+        directory = os.path.dirname(filename)
+        try:
+            return self._filtered[directory]
+        except KeyError:
+            pass
+        prefix = self._prefix(self._normalize(directory))
+        filtered = prefix.startswith(self._third_party_prefixes)
+        self._filtered[directory] = filtered
+        return filtered
+
+    def _update_roots(self) -> None:
+        roots = [(r, True) for r in self._include_roots]
+        roots += [(r, False) for r in self._exclude_roots]
+        # Sort deepest roots first so that the first match is the deepest.
+        roots.sort(key=lambda root: len(root[0]), reverse=True)
+        self._roots = [(self._prefix(root), include) for root, include in roots]
+        self._default = not self._include_roots
+        self._decisions.clear()
+
+    def _decide(self, directory: str) -> bool:
+        directory = self._prefix(directory)
+        for prefix, include in self._roots:
+            if directory.startswith(prefix):
+                return include
+        return self._default
+
+    @staticmethod
+    def _prefix(path: str) -> str:
+        return path if path.endswith(os.sep) else path + os.sep
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        path = os.path.expanduser(os.path.expandvars(path))
+        return os.path.normcase(os.path.abspath(path))
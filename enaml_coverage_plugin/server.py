@@ -0,0 +1,249 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Long-lived local server analysing enaml files for the report jobs.
+
+Each job reporting on enaml files (coverage report, html, diff-cover, IDE
+gutters) otherwise starts cold: it imports the enaml parser and analyses the
+files again. ``python -m enaml_coverage_plugin serve`` starts a process which
+keeps the analysis stack imported and the analyses in memory, and answers the
+requests of the reporters on a Unix socket. Reporters configured with the
+socket ask the server for the analysis of their file and analyse the file
+themselves when the server cannot be reached.
+
+The protocol is one JSON object per line in each direction. A request gives
+the file, the digest of the source read by the client, the line patterns and
+whether the arcs are needed. The answer holds the serialized analysis, or an
+error, for example when the server read another version of the file.
+
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from .exclusion import LinePatterns
+
+if TYPE_CHECKING:
+    from .analysis import FileAnalysis
+    from .cache import AnalysisCache
+
+#: Environment variable used to provide the socket of the server.
+SERVER_ENV = "ENAML_COVERAGE_SERVER"
+
+#: Seconds a client waits for an answer before analysing the file itself.
+DEFAULT_TIMEOUT = 30.0
+
+#: Unix sockets are not available on all platforms.
+HAS_UNIX_SOCKETS = hasattr(socket, "AF_UNIX")
+
+
+def socket_path_from_options(options: dict) -> Optional[str]:
+    """Path of the socket of the server from the plugin options, if any."""
+    path = options.get("server") or os.environ.get(SERVER_ENV)
+    if not path:
+        return None
+    return os.path.expanduser(os.path.expandvars(path))
+
+
+class AnalysisClient:
+    """Ask a local analysis server for the analyses of enaml files.
+
+    The connection is kept open for all the requests of a report. Once the
+    server could not be reached, the client gives up for the rest of the
+    process so that reporting falls back to the in-process analysis without
+    waiting on each file.
+
+    """
+
+    def __init__(self, path: str, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.path = path
+        self.timeout = timeout
+        self.requests = 0
+        self.answers = 0
+        self._socket: Optional[socket.socket] = None
+        self._file: Any = None
+        self._unavailable = not HAS_UNIX_SOCKETS
+
+    @classmethod
+    def from_options(cls, options: dict) -> Optional["AnalysisClient"]:
+        """Create a client from the plugin options if a server was given."""
+        path = socket_path_from_options(options)
+        return cls(path) if path else None
+
+    @property
+    def available(self) -> bool:
+        return not self._unavailable
+
+    def analyse(
+        self, filename: str, digest: str, patterns: LinePatterns, branch: bool
+    ) -> Optional["FileAnalysis"]:
+        """Retrieve the analysis of a file, None if the server cannot provide it.
+
+        `digest` is the digest of the source read by the client, the server
+        refuses to answer if it read another version of the file.
+
+        """
+        from .analysis import FileAnalysis
+
+        if self._unavailable:
+            return None
+        self.requests += 1
+        try:
+            response = self.request(
+                {
+                    "command": "analyse",
+                    "filename": filename,
+                    "digest": digest,
+                    "exclude": list(patterns.exclude),
+                    "partial": list(patterns.partial),
+                    "branch": branch,
+                }
+            )
+        except (OSError, ValueError):
+            self.close()
+            self._unavailable = True
+            return None
+        if "analysis" not in response:
+            return None
+        self.answers += 1
+        return FileAnalysis.from_dict(response["analysis"])
+
+    def request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a request and return the answer of the server."""
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._socket = sock
+            self._file = sock.makefile("rwb")
+        self._file.write(json.dumps(request).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("The analysis server closed the connection.")
+        return json.loads(line)
+
+    def close(self) -> None:
+        """Close the connection to the server."""
+        if self._socket is not None:
+            try:
+                self._file.close()
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+            self._file = None
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answer the requests of a client until it disconnects."""
+
+    server: "AnalysisServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = self.server.answer(json.loads(line))
+            except Exception as err:
+                response = {"error": f"{type(err).__name__}: {err}"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class AnalysisServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Server keeping the analyses of the enaml files in memory.
+
+    The analyses are kept in a memory cache keyed by file, settings and
+    digest of the source, and are also stored in `cache` if given. Clients
+    are served concurrently but the files are analysed one at a time. The
+    socket is only accessible to the user running the server.
+
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, cache: Optional["AnalysisCache"] = None) -> None:
+        from .cache import MemoryCache
+
+        if os.path.exists(path):
+            if _is_listening(path):
+                raise OSError(f"An analysis server is already listening on {path}")
+            # Left over by a server which did not exit cleanly.
+            os.unlink(path)
+        # The server reads any file its owner can read on request, only the
+        # owner may connect to it.
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        self.path = path
+        self.cache = cache
+        self.memory = MemoryCache()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def answer(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Compute the answer to a request."""
+        self.requests += 1
+        command = request.get("command")
+        if command == "stats":
+            return {
+                "requests": self.requests,
+                "hits": self.memory.hits,
+                "misses": self.memory.misses,
+            }
+        if command != "analyse":
+            return {"error": f"Unknown command {command!r}"}
+        return self._analyse(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    # --- Private API
+
+    def _analyse(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        from .reporter import EnamlFileReporter
+
+        patterns = LinePatterns(
+            exclude=tuple(request["exclude"]), partial=tuple(request["partial"])
+        )
+        reporter = EnamlFileReporter(
+            request["filename"],
+            cache=self.cache,
+            patterns=patterns,
+            branch=bool(request["branch"]),
+            memory=self.memory,
+        )
+        with self._lock:
+            if reporter._source_digest() != request["digest"]:
+                return {"error": "The file differs from the one of the client."}
+            if not reporter._load_cached_analysis():
+                reporter._set_analysis(reporter._analyse())
+        assert reporter._analysis is not None
+        return {"analysis": reporter._analysis.to_dict()}
+
+
+def _is_listening(path: str) -> bool:
+    """Whether a server accepts connections on the socket `path`."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
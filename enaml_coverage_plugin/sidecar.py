@@ -0,0 +1,145 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Analyses of the enaml files exported next to the coverage data.
+
+Analysing enaml files requires enaml, atom and the Qt bindings, which the
+stage reporting on or aggregating the coverage data may not have. The
+analyses of the measured files can be exported, where enaml is installed, to
+a gzipped JSON sidecar of the data file (``.coverage-enaml.json.gz`` for
+``.coverage``), with the digest of each source. The reporters answer from
+the sidecar without importing enaml as long as the source of the file, when
+it can be read, is the one which was analysed.
+
+The name of the sidecar does not match ``<data_file>.*`` so that
+``coverage combine`` does not mistake it for a data file.
+
+"""
+import gzip
+import json
+import os
+import warnings
+from typing import Any, Dict, Iterable, Optional
+
+from coverage.exceptions import NoSource
+
+from .analysis import FileAnalysis
+from .cache import AnalysisCache, source_digest
+from .exclusion import LinePatterns
+from .source import read_source
+
+#: Suffix added to the data file to name its sidecar.
+SIDECAR_SUFFIX = "-enaml.json.gz"
+
+#: Bump when the layout of the sidecar changes.
+SIDECAR_FORMAT = 1
+
+
+def sidecar_path(data_file: str) -> str:
+    """Path of the sidecar of a coverage data file."""
+    return os.path.abspath(data_file) + SIDECAR_SUFFIX
+
+
+class Sidecar:
+    """Analyses, with arcs, of enaml files along with the digest of their source.
+
+    The analyses depend on the exclusion and partial branch patterns, which
+    are stored with them. `hits` counts the analyses retrieved.
+
+    """
+
+    def __init__(self, patterns: Optional[LinePatterns] = None) -> None:
+        self.patterns = patterns or LinePatterns()
+        self.hits = 0
+        self._files: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._files
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Sidecar"]:
+        """Read a sidecar, None if it is missing or unreadable."""
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["format"] != SIDECAR_FORMAT:
+                return None
+            sidecar = cls(LinePatterns(*(tuple(p) for p in data["patterns"])))
+            sidecar._files = data["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return sidecar
+
+    def save(self, path: str) -> None:
+        """Write the sidecar."""
+        data = {
+            "format": SIDECAR_FORMAT,
+            "patterns": [list(self.patterns.exclude), list(self.patterns.partial)],
+            "files": self._files,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    def add(self, filename: str, digest: str, analysis: Dict[str, Any]) -> None:
+        """Store the serialized analysis of a file whose source has `digest`."""
+        self._files[filename] = {"digest": digest, "analysis": analysis}
+
+    def get(
+        self, filename: str, patterns: LinePatterns, digest: Optional[str]
+    ) -> Optional[FileAnalysis]:
+        """Retrieve the analysis of a file.
+
+        Nothing is returned if the analysis used other patterns or if `digest`
+        differs from the one of the analysed source. A `digest` of None, for
+        files whose source is not available, matches any source.
+
+        """
+        entry = self._files.get(filename)
+        if entry is None or patterns != self.patterns:
+            return None
+        if digest is not None and digest != entry["digest"]:
+            return None
+        self.hits += 1
+        return FileAnalysis.from_dict(entry["analysis"])
+
+
+def export_sidecar(
+    paths: Iterable[str],
+    output: str,
+    workers: Optional[int] = None,
+    patterns: Optional[LinePatterns] = None,
+    cache: Optional[AnalysisCache] = None,
+) -> Sidecar:
+    """Analyse enaml files, with arcs, and write their analyses to a sidecar.
+
+    Files which cannot be parsed are stored as such, files which cannot be
+    analysed because of an unexpected error are left out and will be analysed
+    by the reporters. Files which cannot be read are left out with a warning.
+
+    """
+    from .batch import analyze_many
+
+    paths = list(paths)
+    results = analyze_many(paths, workers, patterns=patterns, branch=True, cache=cache)
+    sidecar = Sidecar(patterns)
+    for path, analysis in results.items():
+        try:
+            digest = source_digest(read_source(path))
+        except (OSError, NoSource) as err:
+            warnings.warn(
+                f"Not exporting the analysis of {path}: {err}", RuntimeWarning
+            )
+            continue
+        if analysis.get("unexpected"):
+            # Only the parsing errors are meaningful to report.
+            continue
+        sidecar.add(path, digest, analysis)
+    sidecar.save(output)
+    return sidecar
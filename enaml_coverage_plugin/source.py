@@ -0,0 +1,124 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Loading of the sources of the enaml files, reading each file once.
+
+A reporter needs the source of its file to key the analysis caches, to parse
+it and to display it (HTML and annotated reports), which all happen while the
+file is being reported. Sources are read and decoded as coverage reads Python
+sources (PEP 263 encoding declaration, universal newlines) and kept in a
+size-bounded LRU shared by the reporters.
+
+On slow file systems, the sources can be read ahead by a thread pool: the
+plugin registers the file of each reporter it creates and, when a source is
+loaded, the next registered files are read in the background.
+
+"""
+import collections
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from coverage.python import get_python_source
+
+from .profiling import PROFILER
+
+#: Default number of sources kept in memory by a SourceLoader.
+DEFAULT_SOURCE_CACHE_SIZE = 16
+
+#: Maximal number of threads reading sources ahead.
+MAX_READ_AHEAD_WORKERS = 8
+
+
+def read_source(filename: str) -> str:
+    """Read and decode the source of an enaml file.
+
+    The encoding is found according to PEP 263, newlines are normalized and
+    the source ends with a newline, as for the Python sources read by
+    coverage.
+
+    """
+    with PROFILER.phase(filename, "read"):
+        return get_python_source(filename)
+
+
+class SourceLoader:
+    """Read the sources of the reported files, keeping the recent ones.
+
+    The sources are not kept by the reporters since the reporters of all the
+    reported files are alive at the same time, only the `maxsize` most recently
+    used sources stay in memory.
+
+    `reads` counts the files actually read. When `read_ahead` is positive, the
+    sources of up to `read_ahead` registered files are read in the background
+    each time a source is loaded.
+
+    """
+
+    def __init__(
+        self, maxsize: int = DEFAULT_SOURCE_CACHE_SIZE, read_ahead: int = 0
+    ) -> None:
+        self.maxsize = maxsize
+        self.read_ahead = read_ahead
+        self.reads = 0
+        self._sources: "collections.OrderedDict[str, str]" = collections.OrderedDict()
+        self._pending: "collections.OrderedDict[str, None]" = collections.OrderedDict()
+        self._futures: Dict[str, "Future[str]"] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._sources
+
+    def register(self, filename: str) -> None:
+        """Announce that the source of `filename` will be needed."""
+        if self.read_ahead <= 0:
+            return
+        if filename not in self._sources and filename not in self._futures:
+            self._pending[filename] = None
+
+    def get(self, filename: str) -> str:
+        """Return the source of a file, reading it if it is not known."""
+        source = self._sources.get(filename)
+        if source is not None:
+            self._sources.move_to_end(filename)
+            return source
+        future = self._futures.pop(filename, None)
+        self._pending.pop(filename, None)
+        if future is not None:
+            source = future.result()
+        else:
+            self.reads += 1
+            source = read_source(filename)
+        self._sources[filename] = source
+        while len(self._sources) > max(self.maxsize, 1):
+            self._sources.popitem(last=False)
+        self._read_ahead()
+        return source
+
+    def clear(self) -> None:
+        """Discard the sources and stop reading ahead."""
+        self._sources.clear()
+        self._pending.clear()
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # --- Private API
+
+    def _read_ahead(self) -> None:
+        while self._pending and len(self._futures) < self.read_ahead:
+            filename, _ = self._pending.popitem(last=False)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=min(self.read_ahead, MAX_READ_AHEAD_WORKERS),
+                    thread_name_prefix="enaml-coverage-read",
+                )
+            self.reads += 1
+            # The profiler is not thread-safe, reads ahead are not profiled.
+            self._futures[filename] = self._executor.submit(get_python_source, filename)
@@ -0,0 +1,49 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the parallel analysis of enaml files.
+
+"""
+import pathlib
+
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+def make_files(tmp_path, count):
+    source = (DATA / "test_simple.enaml").read_text(encoding="utf-8")
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"view_{i}.enaml"
+        path.write_text(source, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def test_parallel_pre_analysis(tmp_path):
+    paths = make_files(tmp_path, 3)
+    plugin = EnamlCoveragePlugin(
+        {"parallel": "true", "workers": "2", "parallel_threshold": "2"}
+    )
+    reporters = [plugin.file_reporter(p) for p in paths]
+
+    expected = EnamlCoveragePlugin().file_reporter(paths[0]).analysis.to_dict()
+    assert reporters[0].analysis.to_dict() == expected
+    for reporter in reporters:
+        assert not reporter._has_parser()
+        assert reporter._analysis.to_dict() == expected
+
+
+def test_serial_fallback_for_few_files(tmp_path):
+    paths = make_files(tmp_path, 2)
+    plugin = EnamlCoveragePlugin({"parallel": "true", "parallel_threshold": "8"})
+    reporters = [plugin.file_reporter(p) for p in paths]
+
+    reporters[0].lines()
+    assert reporters[0]._has_parser()
+    assert reporters[1]._analysis is None
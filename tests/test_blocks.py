@@ -0,0 +1,144 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the incremental analysis of enaml files.
+
+"""
+import importlib
+import pathlib
+import sys
+
+import enaml
+import pytest
+
+from enaml_coverage_plugin.analysis import FileAnalysis
+from enaml_coverage_plugin.blocks import BlockCache, split_blocks
+from enaml_coverage_plugin.cache import AnalysisCache
+from enaml_coverage_plugin.parser import EnamlParser, load_enaml_cache
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+from enaml_coverage_plugin.scanner import scan_source
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+pytestmark = pytest.mark.filterwarnings("ignore:unhandled pragma")
+
+ENAML_SOURCES = sorted(pathlib.Path(enaml.__file__).parent.glob("**/*.enaml"))
+
+SOURCE = '''\
+"""Module docstring.
+
+"""
+from enaml.widgets.api import Window, Container, PushButton
+
+pragma foo
+enamldef Main(Window):
+    attr count = 0
+    Container:
+        PushButton:
+            clicked ::
+                count += 1
+                print(count)
+
+# Python code between enamldefs.
+def helper(value):
+    return [x for x in (lambda: value)()]
+
+handler = helper(
+    1
+)
+
+template Tmp(Base):
+    Base:
+        pass
+
+enamldef Other(Window):
+    func f(a):
+        if a:
+            return 1
+        return 2
+'''
+
+
+def analyse(text: str, blocks=None, arcs: bool = True) -> FileAnalysis:
+    parser = EnamlParser(
+        text=text, filename="test.enaml", line_only=not arcs, blocks=blocks
+    )
+    parser.parse_source()
+    return FileAnalysis.from_parser(parser, arcs=arcs)
+
+
+def test_split_blocks():
+    blocks = split_blocks(SOURCE, scan_source(SOURCE, set()).multiline)
+    assert [b.start for b in blocks] == [1, 6, 16, 23, 27]
+    assert "".join(b.text for b in blocks) == SOURCE
+
+
+@pytest.mark.parametrize(
+    "path",
+    [DATA / "test_simple.enaml"] + ENAML_SOURCES,
+    ids=lambda p: p.name,
+)
+@pytest.mark.parametrize("arcs", [True, False])
+def test_incremental_matches_full(path, arcs):
+    text = path.read_text(encoding="utf-8")
+    assert (
+        analyse(text, BlockCache(), arcs).to_dict()
+        == analyse(text, arcs=arcs).to_dict()
+    )
+
+
+def test_changed_block_reanalysed():
+    blocks = BlockCache()
+    analyse(SOURCE, blocks)
+    assert (blocks.hits, blocks.misses) == (0, 5)
+
+    edited = SOURCE.replace(
+        "                print(count)\n",
+        "                if count > 1:\n                    print(count)\n",
+    )
+    analysis = analyse(edited, blocks)
+    assert (blocks.hits, blocks.misses) == (4, 6)
+    assert analysis.to_dict() == analyse(edited).to_dict()
+    assert analysis.missing_arc_description(17, -16) == analyse(
+        edited
+    ).missing_arc_description(17, -16)
+
+
+def test_blocks_persisted(tmp_path):
+    disk = AnalysisCache(str(tmp_path))
+    analyse(SOURCE, BlockCache(disk=disk))
+    blocks = BlockCache(disk=disk)
+    assert analyse(SOURCE, blocks).to_dict() == analyse(SOURCE).to_dict()
+    assert (blocks.hits, blocks.misses) == (5, 0)
+
+
+def test_plugin_incremental_option():
+    plugin = EnamlCoveragePlugin({"incremental": "true"})
+    reporter = plugin.file_reporter(str(DATA / "test_simple.enaml"))
+    assert reporter.parser.blocks is plugin._blocks
+    assert ("block_cache_misses", 2) in plugin.sys_info()
+    assert reporter.lines() == analyse(reporter.source()).statements
+
+
+def test_incremental_with_enaml_cache(tmp_path, monkeypatch):
+    # Re-running the tests after an edit writes an up to date __enamlcache__.
+    source = tmp_path / "blocks_view.enaml"
+    monkeypatch.syspath_prepend(str(tmp_path))
+    text = (DATA / "test_simple.enaml").read_text(encoding="utf-8")
+    options = {"incremental": "true", "cache_dir": str(tmp_path / "cache")}
+    added = "enamldef Other(Main):\n    pass\n"
+    for edited, hits, misses in [(text, 0, 2), (text + added, 2, 1)]:
+        source.write_text(edited, encoding="utf-8")
+        monkeypatch.delitem(sys.modules, "blocks_view", raising=False)
+        with enaml.imports():
+            importlib.import_module("blocks_view")
+        assert load_enaml_cache(str(source)) is not None
+
+        plugin = EnamlCoveragePlugin(options)
+        reporter = plugin.file_reporter(str(source))
+        assert reporter.arcs() == analyse(edited).arcs
+        assert (plugin._blocks.hits, plugin._blocks.misses) == (hits, misses)
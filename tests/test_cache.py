@@ -0,0 +1,155 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the persistent cache of enaml file analyses.
+
+"""
+import json
+import os
+import pathlib
+
+import pytest
+
+from enaml_coverage_plugin import clear_analysis_cache
+from enaml_coverage_plugin.analysis import FileAnalysis
+from enaml_coverage_plugin.cache import AnalysisCache, MemoryCache
+from enaml_coverage_plugin.parser import NotEnaml
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+from enaml_coverage_plugin.reporter import EnamlFileReporter, ParserCache
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+def test_analysis_round_trip():
+    reporter = EnamlFileReporter(str(DATA / "test_simple.enaml"))
+    analysis = reporter.analysis
+    restored = FileAnalysis.from_dict(json.loads(json.dumps(analysis.to_dict())))
+    assert restored.to_dict() == analysis.to_dict()
+    assert restored.statements == reporter.parser.statements
+    assert restored.exit_counts == reporter.parser.exit_counts()
+    for start, end in restored.arcs:
+        assert restored.missing_arc_description(
+            start, end
+        ) == reporter.parser.missing_arc_description(start, end)
+
+
+def test_reporter_served_from_cache(tmp_path):
+    cache = AnalysisCache(str(tmp_path))
+    path = str(DATA / "test_simple.enaml")
+    first = EnamlFileReporter(path, cache=cache)
+    expected = first.lines()
+
+    second = EnamlFileReporter(path, cache=cache)
+    assert second.lines() == expected
+    assert second.arcs() == first.arcs()
+    assert not second._has_parser()
+
+
+def test_negative_entries(tmp_path):
+    source = tmp_path / "broken.enaml"
+    source.write_text("enamldef Main(Window):\n    attr a = (\n")
+    cache = AnalysisCache(str(tmp_path / "cache"))
+
+    reporter = EnamlFileReporter(str(source), cache=cache)
+    with pytest.raises(NotEnaml):
+        reporter.lines()
+    entry = cache.get(reporter._cache_key())
+    assert entry is not None and entry.error
+
+    reporter = EnamlFileReporter(str(source), cache=cache)
+    with pytest.raises(NotEnaml):
+        reporter.lines()
+    assert not reporter._has_parser()
+
+
+def test_eviction(tmp_path):
+    cache = AnalysisCache(str(tmp_path), max_size=1)
+    analysis = FileAnalysis(statements=range(20000))
+    keys = [cache.key(str(i)) for i in range(20)]
+    for i, key in enumerate(keys):
+        cache.set(key, analysis)
+        path = cache._path(key)
+        os.utime(path, (i, i))
+    cache.prune()
+
+    assert cache._disk_usage() <= cache.max_size
+    assert cache.get(keys[-1]) is not None
+    assert cache.get(keys[0]) is None
+
+
+def test_parser_cache_eviction(tmp_path):
+    source = (DATA / "test_simple.enaml").read_text(encoding="utf-8")
+    parsers = ParserCache(maxsize=2)
+    reporters = []
+    for i in range(3):
+        path = tmp_path / f"view_{i}.enaml"
+        path.write_text(source, encoding="utf-8")
+        reporters.append(EnamlFileReporter(str(path), parsers=parsers))
+        reporters[-1].lines()
+
+    assert len(parsers) == 2
+    assert not reporters[0]._has_parser()
+    # Evicted parsers are rebuilt on demand.
+    assert reporters[0].parser.statements == reporters[0].lines()
+    assert not reporters[1]._has_parser()
+
+
+def test_compact_analysis():
+    first = EnamlFileReporter(str(DATA / "test_simple.enaml")).analysis
+    second = FileAnalysis.from_dict(first.to_dict())
+    assert first.missing_arc_fragments
+    for arc, fragments in first.missing_arc_fragments.items():
+        copies = second.missing_arc_fragments[arc]
+        for fragment, copy in zip(fragments, copies):
+            assert all(a is b for a, b in zip(fragment, copy))
+
+
+def test_bulk_translation():
+    reporter = EnamlFileReporter(str(DATA / "test_simple.enaml"))
+    parser = reporter.parser
+    analysis = reporter.analysis
+    lines = set(range(1, 40))
+    arcs = {(a, b) for a in range(-36, 36) for b in (-a, a + 1, 50) if a}
+    assert analysis.translate_lines(lines) == parser.translate_lines(lines)
+    assert analysis.translate_arcs(arcs) == parser.translate_arcs(arcs)
+    assert analysis.translate_lines(iter([9, 100])) == {8, 100}
+    assert analysis.translate_arcs([]) == set()
+
+
+def test_memory_cache(tmp_path):
+    path = tmp_path / "view.enaml"
+    path.write_text((DATA / "test_simple.enaml").read_text(encoding="utf-8"))
+    memory = MemoryCache()
+    first = EnamlFileReporter(str(path), memory=memory)
+    expected = first.analysis
+
+    second = EnamlFileReporter(str(path), memory=memory)
+    assert second.analysis is expected
+    assert not second._has_parser()
+    # Analyses of other options are kept separately.
+    line_only = EnamlFileReporter(str(path), memory=memory, branch=False)
+    assert not line_only.analysis.has_arcs
+    assert len(memory) == 2
+
+    # Edited files are analysed again.
+    path.write_text(path.read_text() + "\nenamldef Other(Window):\n    pass\n")
+    edited = EnamlFileReporter(str(path), memory=memory)
+    assert edited.analysis is not expected
+    assert max(edited.lines()) > max(expected.statements)
+
+    memory.clear()
+    assert len(memory) == 0
+    assert EnamlFileReporter(str(path), memory=memory).analysis is not edited.analysis
+
+
+def test_clear_analysis_cache():
+    plugin = EnamlCoveragePlugin()
+    path = str(DATA / "test_simple.enaml")
+    analysis = plugin.file_reporter(path).analysis
+    assert plugin.file_reporter(path).analysis is analysis
+    clear_analysis_cache()
+    assert plugin.file_reporter(path).analysis is not analysis
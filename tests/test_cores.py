@@ -0,0 +1,87 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the detection of the coverage core.
+
+"""
+import warnings
+
+import coverage
+import pytest
+
+from enaml_coverage_plugin.cores import (
+    CORE_FROM_ENVIRONMENT,
+    HAS_SYS_MONITORING,
+    core_supports_plugin,
+    requested_core,
+)
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+
+
+@pytest.fixture(autouse=True)
+def no_core_env(monkeypatch):
+    monkeypatch.delenv("COVERAGE_CORE", raising=False)
+
+
+def test_default_core():
+    config = coverage.Coverage(config_file=False).config
+    assert requested_core(config) == "ctrace"
+    assert core_supports_plugin("ctrace")
+
+    plugin = EnamlCoveragePlugin()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        plugin.configure(config)
+    assert ("coverage_core", "ctrace") in plugin.sys_info()
+
+
+def test_timid_core():
+    config = coverage.Coverage(config_file=False, timid=True).config
+    assert requested_core(config) == "pytrace"
+    with pytest.warns(RuntimeWarning, match="'pytrace' coverage core"):
+        EnamlCoveragePlugin().configure(config)
+
+
+#: Names of the cores by the name of their tracer, in coverage system info.
+TRACER_CORES = {"CTracer": "ctrace", "PyTracer": "pytrace", "SysMonitor": "sysmon"}
+
+
+def started_core(cov):
+    """Core used by coverage once started, from its system information."""
+    cov.start()
+    try:
+        info = dict(cov.sys_info())
+    finally:
+        cov.stop()
+    return TRACER_CORES[info.get("core", info.get("tracer"))]
+
+
+@pytest.mark.parametrize(
+    "timid, environment",
+    [(False, None), (True, None), (False, "pytrace"), (True, "ctrace")]
+    + [(False, "sysmon")],
+)
+@pytest.mark.filterwarnings("ignore:sys.monitoring isn't available")
+def test_core_matches_coverage(monkeypatch, tmp_path, timid, environment):
+    if environment is not None:
+        monkeypatch.setenv("COVERAGE_CORE", environment)
+    cov = coverage.Coverage(data_file=None, config_file=False, timid=timid)
+    expected = started_core(cov)
+    assert requested_core(cov.config) == expected
+    if environment == "sysmon" and CORE_FROM_ENVIRONMENT and HAS_SYS_MONITORING:
+        assert expected == "sysmon"
+
+
+def test_sysmon_core(monkeypatch):
+    monkeypatch.setenv("COVERAGE_CORE", "sysmon")
+    config = coverage.Coverage(config_file=False).config
+    if requested_core(config) != "sysmon":
+        pytest.skip("coverage does not provide the sys.monitoring core here")
+    plugin = EnamlCoveragePlugin()
+    with pytest.warns(RuntimeWarning, match="sys.monitoring"):
+        plugin.configure(config)
+    assert ("core_supports_plugin", False) in plugin.sys_info()
@@ -0,0 +1,137 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the discovery of the enaml files of the source directories.
+
+"""
+import os
+import time
+
+import coverage
+import pytest
+
+from enaml_coverage_plugin.discovery import EnamlFileFinder
+from enaml_coverage_plugin.scope import TraceScope
+
+SOURCE = "enamldef Main(Window):\n    title = 'main'\n"
+
+
+def age(path, seconds=60):
+    """Move the modification time of a directory out of the racy window."""
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "app"
+    files = [
+        "main.enaml",
+        "views/form.enaml",
+        "views/deep/list.enaml",
+        "tests/test_view.enaml",
+        "__enamlcache__/cached.enaml",
+        ".git/objects.enaml",
+        "venv/lib/site.enaml",
+        "notes.txt",
+    ]
+    for name in files:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(SOURCE)
+    (root / "venv" / "pyvenv.cfg").write_text("home = /usr/bin\n")
+    for directory, _, _ in os.walk(root):
+        age(directory)
+    return root
+
+
+def test_find(tree):
+    finder = EnamlFileFinder()
+    found = finder.find(str(tree))
+    assert found == sorted(
+        str(tree / name)
+        for name in (
+            "main.enaml",
+            "views/form.enaml",
+            "views/deep/list.enaml",
+            "tests/test_view.enaml",
+        )
+    )
+    found = finder.find(str(tree), omit=["*/tests/*"])
+    assert str(tree / "tests" / "test_view.enaml") not in found
+    assert finder.find(str(tree), include=["*/views/*"]) == [
+        str(tree / "views" / "deep" / "list.enaml"),
+        str(tree / "views" / "form.enaml"),
+    ]
+    scope = TraceScope(exclude_roots=[str(tree / "views")])
+    assert finder.find(str(tree), scope=scope) == [
+        str(tree / "main.enaml"),
+        str(tree / "tests" / "test_view.enaml"),
+    ]
+
+
+def test_omitted_directories_are_not_walked(tree):
+    finder = EnamlFileFinder()
+    finder.find(str(tree), omit=["*/views/*"])
+    # app, tests and venv, whose pyvenv.cfg stops the walk.
+    assert finder.scans == 3
+
+
+def test_listings_cache(tree, tmp_path):
+    path = str(tmp_path / "cache" / "discovery.json")
+    finder = EnamlFileFinder(path)
+    expected = finder.find(str(tree))
+    assert finder.scans == 5
+    assert finder.find(str(tree)) == expected
+    assert finder.scans == 5
+
+    # Only the modified directory is listed again.
+    (tree / "views" / "new.enaml").write_text(SOURCE)
+    age(tree / "views", 30)
+    assert str(tree / "views" / "new.enaml") in finder.find(str(tree))
+    assert finder.scans == 6
+
+    other = EnamlFileFinder(path)
+    assert other.find(str(tree)) == finder.find(str(tree))
+    assert other.scans == 0
+
+    other.clear()
+    assert other.find(str(tree)) == finder.find(str(tree))
+    assert other.scans == 5
+
+
+def test_racy_listings_are_not_kept(tree):
+    (tree / "views" / "new.enaml").write_text(SOURCE)
+    finder = EnamlFileFinder()
+    finder.find(str(tree))
+    finder.find(str(tree))
+    assert finder.scans == 6
+
+
+def test_unexecuted_files_are_reported(tree, tmp_path):
+    rcfile = tmp_path / ".coveragerc"
+    rcfile.write_text(
+        "[run]\nplugins = enaml_coverage_plugin\nomit = */tests/*\n"
+        "disable_warnings = no-data-collected\n",
+        encoding="utf-8",
+    )
+    cov = coverage.Coverage(
+        data_file=str(tmp_path / ".coverage"),
+        source=[str(tree)],
+        config_file=str(rcfile),
+    )
+    cov.start()
+    cov.stop()
+    data = cov.get_data()
+    assert sorted(data.measured_files()) == [
+        str(tree / "main.enaml"),
+        str(tree / "views" / "deep" / "list.enaml"),
+        str(tree / "views" / "form.enaml"),
+    ]
+    assert data.file_tracer(str(tree / "main.enaml")) == (
+        "enaml_coverage_plugin.EnamlCoveragePlugin"
+    )
@@ -0,0 +1,95 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the exclusion and partial branch patterns applied to enaml files.
+
+"""
+import re
+
+import coverage
+import pytest
+
+from enaml_coverage_plugin.exclusion import LinePatterns, compile_regex, lines_matching
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+from enaml_coverage_plugin.reporter import EnamlFileReporter
+
+SOURCE = """\
+from enaml.widgets.api import Window, Label
+
+def helper(a):  # pragma: no cover
+    return a
+
+enamldef Main(Window): main:
+    attr counter = 0
+    counter ::  # pragma: no cover
+        print(counter)
+        print(counter + 1)
+    Label:
+        text << str(counter)
+    func check(a):
+        while True:  # pragma: no branch
+            if a:
+                break
+"""
+
+
+@pytest.mark.parametrize(
+    "regex",
+    [
+        r"#\s*pragma",
+        r"^\s*print",
+        r"counter\)?$",
+        r"\s*$",
+        r"#\s*(pragma|PRAGMA)[:\s]?\s*(no|NO)\s*(cover|COVER)",
+        r"(?:a\s*)|(?:z)",
+    ],
+)
+def test_lines_matching(regex):
+    expected = {
+        i
+        for i, line in enumerate(SOURCE.split("\n"), start=1)
+        if re.search(regex, line)
+    }
+    assert lines_matching(SOURCE, regex) == expected
+
+
+def test_no_pattern():
+    assert lines_matching(SOURCE, "") == set()
+
+
+def test_reporter_exclusion(tmp_path):
+    path = tmp_path / "excluded.enaml"
+    path.write_text(SOURCE)
+    reporter = EnamlFileReporter(str(path))
+    assert {3, 4, 8, 9, 10} <= reporter.excluded_lines()
+    assert not reporter.lines() & {3, 4, 8, 9, 10}
+    assert reporter.no_branch_lines() == {14}
+
+
+def test_shared_matcher(tmp_path):
+    patterns = LinePatterns(exclude=("print",), partial=())
+    compile_regex.cache_clear()
+    for i in range(3):
+        path = tmp_path / f"view_{i}.enaml"
+        path.write_text(SOURCE)
+        reporter = EnamlFileReporter(str(path), patterns=patterns)
+        assert {9, 10} <= reporter.excluded_lines()
+        assert reporter.no_branch_lines() == set()
+    assert compile_regex.cache_info().misses == 2
+
+
+def test_plugin_configure():
+    cov = coverage.Coverage(config_file=False)
+    cov.set_option("report:exclude_lines", ["never"])
+    cov.set_option("report:partial_branches", ["sometimes"])
+    cov.set_option("report:partial_branches_always", [])
+    plugin = EnamlCoveragePlugin({"exclude_lines": "\nenaml only\n"})
+    plugin.configure(cov.config)
+    assert plugin._patterns == LinePatterns(
+        exclude=("never", "enaml only"), partial=("sometimes",)
+    )
+    assert plugin.file_reporter("view.enaml")._patterns is plugin._patterns
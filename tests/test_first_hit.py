@@ -0,0 +1,236 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the first-hit recording of the enaml code objects.
+
+"""
+import atexit
+import pathlib
+import types
+
+import coverage
+import pytest
+from coverage.data import CoverageData
+from enaml.core.enaml_compiler import EnamlCompiler
+from enaml.core.parser import parse
+
+import enaml_coverage_plugin
+from enaml_coverage_plugin import firsthit
+from enaml_coverage_plugin.cores import HAS_SYS_MONITORING
+from enaml_coverage_plugin.firsthit import PLUGIN_NAME, FirstHitRecorder
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin, EnamlFileTracer
+from enaml_coverage_plugin.reporter import EnamlFileReporter
+from enaml_coverage_plugin.scope import TraceScope
+
+FILENAME = str(pathlib.Path(__file__).parent / "data" / "test_simple.enaml")
+
+
+def code_objects(code):
+    """Collect a code object and all the code objects nested in it."""
+    codes = {code}
+    for const in code.co_consts:
+        if hasattr(const, "co_lines"):
+            codes |= code_objects(const)
+    return codes
+
+
+@pytest.fixture
+def recorder():
+    with open(FILENAME) as source:
+        module = parse(source.read(), FILENAME)
+    recorder = FirstHitRecorder()
+    recorder.code_objects[FILENAME] = code_objects(
+        EnamlCompiler.compile(module, FILENAME)
+    )
+    return recorder
+
+
+@pytest.fixture
+def monitoring(monkeypatch):
+    """Stand-in for the parts of sys.monitoring used by the callback."""
+    fake = types.SimpleNamespace(DISABLE=object())
+    monkeypatch.setattr(firsthit, "_monitoring", fake)
+    return fake
+
+
+def test_executed_lines(recorder):
+    reporter = EnamlFileReporter(FILENAME)
+    lines = recorder.executed_lines(FILENAME, reporter)
+    assert lines and lines <= reporter.lines()
+    assert recorder.executed_lines("other.enaml", reporter) == set()
+
+
+def test_save(recorder, tmp_path):
+    data = CoverageData(no_disk=True)
+    unexecuted = str(tmp_path / "unexecuted.enaml")
+    recorder.save(data, EnamlFileReporter, [unexecuted, FILENAME])
+    lines = recorder.executed_lines(FILENAME, EnamlFileReporter(FILENAME))
+    assert set(data.lines(FILENAME)) == lines
+    assert not data.has_arcs()
+    assert data.file_tracer(FILENAME) == PLUGIN_NAME
+    assert data.lines(unexecuted) == []
+    assert data.file_tracer(unexecuted) == PLUGIN_NAME
+
+
+def test_on_start_scope(monitoring, tmp_path):
+    recorder = FirstHitRecorder()
+    recorder.scope = TraceScope(exclude_roots=[str(tmp_path / "excluded")])
+    traced = compile("pass", str(tmp_path / "view.enaml"), "exec")
+    excluded = compile("pass", str(tmp_path / "excluded" / "view.enaml"), "exec")
+    python = compile("pass", str(tmp_path / "module.py"), "exec")
+    for code in (traced, excluded, python, traced):
+        assert recorder._on_start(code, 0) is monitoring.DISABLE
+    assert recorder.code_objects == {traced.co_filename: {traced}}
+
+
+def test_save_at_exit(recorder, tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, "register", registered.append)
+    data_file = str(tmp_path / ".coverage")
+    recorder.save_at_exit(data_file, EnamlFileReporter)
+    recorder.save_at_exit(data_file, EnamlFileReporter)
+    assert registered == [recorder._save_data_file]
+
+    registered[0]()
+    # The data file is suffixed to be combined with the one of coverage.
+    (saved,) = tmp_path.glob(".coverage.*")
+    data = CoverageData(basename=str(saved))
+    data.read()
+    assert not data.has_arcs()
+    lines = recorder.executed_lines(FILENAME, EnamlFileReporter(FILENAME))
+    assert set(data.lines(FILENAME)) == lines
+
+    # Nothing is written if nothing was recorded.
+    saved.unlink()
+    recorder.clear()
+    registered[0]()
+    assert not list(tmp_path.glob(".coverage*"))
+
+
+def test_record_first_hits(recorder, tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, "register", registered.append)
+    monkeypatch.setattr(firsthit, "RECORDER", recorder)
+    monkeypatch.setattr(recorder, "start", lambda scope=None: None)
+    enaml_coverage_plugin.record_first_hits(str(tmp_path / ".coverage"))
+
+    # The files are analysed by the reporter of the plugin.
+    registered[0]()
+    (saved,) = tmp_path.glob(".coverage.*")
+    data = CoverageData(basename=str(saved))
+    data.read()
+    lines = recorder.executed_lines(FILENAME, EnamlFileReporter(FILENAME))
+    assert set(data.lines(FILENAME)) == lines
+
+
+@pytest.fixture
+def first_hit(monkeypatch):
+    """Pretend that sys.monitoring is available and collect the recordings."""
+    started = []
+    monkeypatch.setattr(firsthit, "HAS_SYS_MONITORING", True)
+    monkeypatch.setattr(firsthit, "start_recording", lambda *args: started.append(args))
+    return started
+
+
+def test_recording_starts_when_measuring(first_hit, tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "view.enaml").touch()
+    cov = coverage.Coverage(
+        data_file=str(tmp_path / ".cov"),
+        config_file=False,
+        source=[str(source)],
+        omit=["*/skip/*"],
+    )
+    plugin = EnamlCoveragePlugin({"first_hit": "true"})
+    plugin.configure(cov.config)
+    # configure also runs when reporting or combining.
+    assert not first_hit
+    assert cov.config.get_option("run:omit") == ["*/skip/*", "*.enaml"]
+
+    assert plugin.file_tracer(str(tmp_path / "module.py")) is None
+    assert plugin.file_tracer(FILENAME) is None
+    assert len(first_hit) == 1
+    data_file, scope, _, unexecuted = first_hit[0]
+    assert data_file.endswith(".cov") and scope is plugin._scope
+    assert unexecuted() == [str(source / "view.enaml")]
+
+
+@pytest.mark.filterwarnings("ignore:No data was collected")
+def test_enaml_files_not_traced(first_hit, tmp_path):
+    rcfile = tmp_path / ".coveragerc"
+    rcfile.write_text(
+        "[run]\nplugins = enaml_coverage_plugin\n"
+        "[enaml_coverage_plugin]\nfirst_hit = true\n",
+        encoding="utf-8",
+    )
+    code = compile("a = 1\n", str(tmp_path / "view.enaml"), "exec")
+    cov = coverage.Coverage(data_file=None, config_file=str(rcfile))
+    cov.start()
+    try:
+        exec(code, {})
+    finally:
+        cov.stop()
+    assert len(first_hit) == 1
+    assert code.co_filename not in cov.get_data().measured_files()
+
+
+def test_branch_warning(first_hit):
+    config = coverage.Coverage(config_file=False, branch=True).config
+    with pytest.warns(RuntimeWarning, match="branch"):
+        EnamlCoveragePlugin({"first_hit": "true"}).configure(config)
+
+
+@pytest.mark.skipif(HAS_SYS_MONITORING, reason="sys.monitoring is available")
+def test_unavailable():
+    config = coverage.Coverage(config_file=False).config
+    plugin = EnamlCoveragePlugin({"first_hit": "true"})
+    with pytest.warns(RuntimeWarning, match="first_hit"):
+        plugin.configure(config)
+    assert ("first_hit", False) in plugin.sys_info()
+    assert isinstance(plugin.file_tracer(FILENAME), EnamlFileTracer)
+    with pytest.raises(RuntimeError):
+        FirstHitRecorder().start()
+
+
+@pytest.mark.skipif(not HAS_SYS_MONITORING, reason="requires sys.monitoring")
+def test_record():
+    recorder = FirstHitRecorder()
+    code = compile("def f():\n    return 1\n\nf()\nf()\n", "view.enaml", "exec")
+    recorder.start()
+    try:
+        exec(code, {})
+    finally:
+        recorder.stop()
+    assert {c.co_name for c in recorder.code_objects["view.enaml"]} == {
+        "<module>",
+        "f",
+    }
+    recorder.clear()
+    recorder.start()
+    try:
+        exec(code, {})
+    finally:
+        recorder.stop()
+    assert len(recorder.code_objects["view.enaml"]) == 2
+
+
+@pytest.mark.skipif(not HAS_SYS_MONITORING, reason="requires sys.monitoring")
+def test_plugin_ignores_enaml_files(tmp_path):
+    from enaml_coverage_plugin.firsthit import RECORDER
+
+    plugin = EnamlCoveragePlugin({"first_hit": "true"})
+    config = coverage.Coverage(
+        data_file=str(tmp_path / ".coverage"), config_file=False
+    ).config
+    plugin.configure(config)
+    try:
+        assert plugin.file_tracer(FILENAME) is None
+        assert ("first_hit", True) in plugin.sys_info()
+    finally:
+        RECORDER.stop()
+        RECORDER.clear()
@@ -0,0 +1,58 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test that loading the plugin for measuring does not import the analysis.
+
+"""
+import json
+import subprocess
+import sys
+
+SCRIPT = """\
+import json
+import sys
+
+import coverage
+import enaml_coverage_plugin
+
+class Registry:
+    def add_file_tracer(self, plugin):
+        self.plugin = plugin
+
+    def add_configurer(self, plugin):
+        pass
+
+registry = Registry()
+enaml_coverage_plugin.coverage_init(registry, {})
+plugin = registry.plugin
+plugin.configure(coverage.Coverage(config_file=False).config)
+tracer = plugin.file_tracer(sys.argv[1])
+assert tracer.source_filename() == sys.argv[1]
+loaded = sorted(sys.modules)
+plugin.file_reporter(sys.argv[1])
+print(json.dumps([loaded, sorted(sys.modules)]))
+"""
+
+ANALYSIS_MODULES = (
+    "atom",
+    "enaml.core.parser",
+    "enaml.core.enaml_compiler",
+    "enaml_coverage_plugin.parser",
+    "enaml_coverage_plugin.reporter",
+)
+
+
+def test_measuring_does_not_import_analysis(tmp_path):
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT, str(tmp_path / "view.enaml")],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout
+    measuring, reporting = json.loads(output)
+    assert not [m for m in measuring if m.startswith(ANALYSIS_MODULES)]
+    assert "enaml_coverage_plugin.reporter" in reporting
@@ -0,0 +1,136 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the static analysis of enaml files.
+
+"""
+import importlib
+import os
+import pathlib
+import sys
+
+import enaml
+import pytest
+from enaml.core.enaml_ast import ChildDef, Module
+from enaml.core.parser import parse
+
+from enaml_coverage_plugin import parser as enaml_parser
+from enaml_coverage_plugin.parser import (
+    ENAML_CACHE_STATS,
+    EnamlASTArcAnalyser,
+    EnamlASTVisitor,
+    EnamlParser,
+    enaml_python_code,
+    load_enaml_cache,
+)
+from enaml_coverage_plugin.reporter import EnamlFileReporter
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+def analysed_parser(name: str) -> EnamlParser:
+    """Create a parser for a test file and run a full analysis."""
+    path = DATA / name
+    parser = EnamlParser(text=path.read_text(encoding="utf-8"), filename=str(path))
+    parser.parse_source()
+    parser.arcs()
+    return parser
+
+
+def test_source_parsed_once(monkeypatch):
+    calls = []
+    original = enaml_parser.parse
+
+    def counting_parse(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(enaml_parser, "parse", counting_parse)
+    parser = analysed_parser("test_simple.enaml")
+    assert len(calls) == 1
+    assert parser.unit.ast is parser.unit.ast
+
+
+def test_enaml_bytecode_cache_reuse(tmp_path, monkeypatch):
+    source = tmp_path / "cached_view.enaml"
+    source.write_text((DATA / "test_simple.enaml").read_text(encoding="utf-8"))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "cached_view", raising=False)
+    with enaml.imports():
+        importlib.import_module("cached_view")
+    assert load_enaml_cache(str(source)) is not None
+
+    hits = ENAML_CACHE_STATS["hits"]
+    cached = EnamlFileReporter(str(source)).lines()
+    assert ENAML_CACHE_STATS["hits"] == hits + 1
+    assert cached == analysed_parser("test_simple.enaml").statements
+
+    # A source more recent than the cache is recompiled.
+    mtime = source.stat().st_mtime + 10
+    os.utime(source, (mtime, mtime))
+    misses = ENAML_CACHE_STATS["misses"]
+    assert load_enaml_cache(str(source)) is None
+    EnamlFileReporter(str(source)).lines()
+    assert ENAML_CACHE_STATS["misses"] == misses + 1
+
+
+ENAML_SOURCES = sorted(pathlib.Path(enaml.__file__).parent.glob("**/*.enaml"))
+
+
+@pytest.mark.parametrize(
+    "path",
+    [DATA / "test_simple.enaml"] + ENAML_SOURCES,
+    ids=lambda p: p.name,
+)
+def test_ast_statements(path):
+    text = path.read_text(encoding="utf-8")
+    line_only = EnamlParser(text=text, filename=str(path), line_only=True)
+    line_only.parse_source()
+    assert line_only.unit._code is None
+
+    parser = EnamlParser(text=text, filename=str(path), unit=line_only.unit)
+    parser.parse_source()
+    assert line_only.statements == parser.statements
+
+
+def test_line_only_reporter():
+    path = str(DATA / "test_simple.enaml")
+    reporter = EnamlFileReporter(path, branch=False)
+    assert reporter.lines() == analysed_parser("test_simple.enaml").statements
+    assert not reporter.analysis.has_arcs
+
+    # Reporting arcs requires a full analysis.
+    assert reporter.arcs() == EnamlFileReporter(path).arcs()
+    assert reporter.analysis.has_arcs
+
+
+def test_python_code_of_deep_ast():
+    leaf = parse("enamldef Main(Window):\n    attr a = 1\n    a ::\n        a = 2\n")
+    handler = leaf.body[0].body[1].expr.value.ast
+    node = leaf.body[0]
+    for _ in range(3 * sys.getrecursionlimit()):
+        node = ChildDef(typename="Container", body=[node], lineno=1)
+    assert enaml_python_code(Module(body=[node])) == [handler]
+
+
+def test_deprecated_ast_visitor():
+    parser = analysed_parser("test_simple.enaml")
+    root = parser.unit.ast
+
+    def analyser():
+        return EnamlASTArcAnalyser(
+            parser.text, parser.raw_statements, parser._multiline, root_node=root
+        )
+
+    expected = analyser()
+    expected.analyse_enaml()
+    visited = analyser()
+    with pytest.warns(DeprecationWarning):
+        visitor = EnamlASTVisitor(arc_analyser=visited)
+    visitor.visit(root)
+    assert visited.arcs == expected.arcs
+    assert visited.arcs
@@ -0,0 +1,74 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the batch analysis API and the precompute command.
+
+"""
+import json
+import pathlib
+
+import pytest
+
+from enaml_coverage_plugin import analyze_many
+from enaml_coverage_plugin.__main__ import find_enaml_files, main
+from enaml_coverage_plugin.cache import AnalysisCache
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def sources(tmp_path):
+    source = (DATA / "test_simple.enaml").read_text(encoding="utf-8")
+    views = tmp_path / "app" / "views"
+    views.mkdir(parents=True)
+    paths = []
+    for i in range(3):
+        path = views / f"view_{i}.enaml"
+        path.write_text(source, encoding="utf-8")
+        paths.append(str(path))
+    broken = tmp_path / "app" / "broken.enaml"
+    broken.write_text("enamldef Broken(\n", encoding="utf-8")
+    return [str(broken)] + paths
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_analyze_many(sources, workers):
+    results = analyze_many(sources, workers=workers)
+    assert list(results) == sources
+    assert "Couldn't parse" in results[sources[0]]["error"]
+    assert "unexpected" not in results[sources[0]]
+    expected = EnamlCoveragePlugin().file_reporter(sources[1]).analysis.to_dict()
+    for path in sources[1:]:
+        assert results[path] == expected
+    json.dumps(results)
+
+
+def test_precompute_command(sources, tmp_path, capsys):
+    rcfile = tmp_path / ".coveragerc"
+    rcfile.write_text("[run]\nbranch = True\n", encoding="utf-8")
+    cache_dir = str(tmp_path / "cache")
+    output = tmp_path / "analyses.json"
+    assert find_enaml_files([str(tmp_path / "app")]) == sorted(sources)
+
+    argv = ["precompute", str(tmp_path / "app"), "--rcfile", str(rcfile)]
+    argv += ["--cache-dir", cache_dir, "--output", str(output)]
+    assert main(argv) == 0
+    assert "Analysed 4 enaml files" in capsys.readouterr().out
+    assert set(json.loads(output.read_text())) == set(sources)
+
+    # Reporting with the same settings finds the analyses in the cache.
+    plugin = EnamlCoveragePlugin({"cache_dir": cache_dir})
+    for path in sources:
+        reporter = plugin.file_reporter(path)
+        assert reporter._load_cached_analysis()
+
+
+def test_precompute_requires_cache(sources, monkeypatch):
+    monkeypatch.delenv("ENAML_COVERAGE_CACHE_DIR", raising=False)
+    assert main(["precompute", sources[1], "--rcfile", ""]) == 2
+    assert AnalysisCache.from_options({}) is None
@@ -0,0 +1,110 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the instrumentation of the analysis phases.
+
+"""
+import atexit
+import json
+import pathlib
+import time
+import tracemalloc
+
+import coverage
+import pytest
+
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+from enaml_coverage_plugin.profiling import PROFILER, PhaseProfiler
+from enaml_coverage_plugin.reporter import EnamlFileReporter
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def profiler():
+    was_tracing = tracemalloc.is_tracing()
+    PROFILER.clear()
+    yield PROFILER
+    PROFILER.disable()
+    PROFILER.clear()
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def test_phases_recorded(profiler, tmp_path):
+    profiler.enable()
+    filename = str(DATA / "test_simple.enaml")
+    reporter = EnamlFileReporter(filename)
+    reporter.lines()
+    reporter.arcs()
+
+    phases = profiler.results[filename]
+    assert {"read", "scan", "parse", "compile", "statements", "arcs"} <= set(phases)
+    assert all(seconds >= 0 for seconds, _ in phases.values())
+    assert phases["parse"][1] > 0
+    assert "test_simple.enaml" in profiler.summary()
+    assert profiler.slowest(1)[0][0] == filename
+
+    output = tmp_path / "profile.json"
+    profiler.dump(str(output))
+    dumped = json.loads(output.read_text())
+    assert dumped["files"][filename]["arcs"]["peak_bytes"] >= 0
+    assert ("enaml_profile_files", 1) in profiler.sys_info()
+
+
+def test_nested_phases_time():
+    profiler = PhaseProfiler()
+    profiler.enable(memory=False)
+    with profiler.phase("a.enaml", "statements"):
+        time.sleep(0.01)
+        with profiler.phase("a.enaml", "parse"):
+            time.sleep(0.05)
+    statements, parse = (
+        profiler.results["a.enaml"][p][0] for p in ("statements", "parse")
+    )
+    assert parse >= 0.05
+    assert 0.01 <= statements < 0.05
+    profiler.clear()
+
+
+def test_disabled_by_default():
+    assert PhaseProfiler().phase("a.enaml", "scan") is PhaseProfiler().phase(
+        "b.enaml", "arcs"
+    )
+    assert ("enaml_profile", "disabled") in PhaseProfiler().sys_info()
+
+
+def test_enabled_by_debug_option(profiler, tmp_path, monkeypatch):
+    monkeypatch.delenv("ENAML_COVERAGE_PROFILE", raising=False)
+    output = str(tmp_path / "profile.json")
+    plugin = EnamlCoveragePlugin({"profile_output": output})
+    plugin.configure(coverage.Coverage(config_file=False).config)
+    assert not profiler.enabled
+
+    plugin.configure(
+        coverage.Coverage(config_file=False, debug=["enaml_profile"]).config
+    )
+    assert profiler.enabled
+    assert profiler.output == output
+
+
+@pytest.mark.skipif(tracemalloc.is_tracing(), reason="tracemalloc already running")
+def test_memory_traced_from_first_phase(monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, "register", registered.append)
+    profiler = PhaseProfiler()
+    profiler.enable()
+    # Enabling happens in the measured processes, which analyse nothing.
+    assert not tracemalloc.is_tracing()
+    assert not registered
+    try:
+        with profiler.phase("a.enaml", "scan"):
+            pass
+        assert tracemalloc.is_tracing() == hasattr(tracemalloc, "reset_peak")
+        assert registered == [profiler._report]
+    finally:
+        tracemalloc.stop()
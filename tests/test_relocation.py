@@ -0,0 +1,169 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the mapping of the enaml code whose filename does not exist.
+
+"""
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import types
+
+import pytest
+
+from enaml_coverage_plugin.plugin import (
+    IGNORED_FILE_TRACER,
+    EnamlCoveragePlugin,
+    EnamlFileTracer,
+    EnamlRelocatedFileTracer,
+)
+from enaml_coverage_plugin.relocation import SourceResolver
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+IMPORT = """\
+import json
+import sys
+
+import coverage
+import enaml
+
+sys.path.insert(0, sys.argv[1])
+cov = None
+if len(sys.argv) > 2:
+    cov = coverage.Coverage(data_file=sys.argv[2], config_file=sys.argv[3])
+    cov.start()
+with enaml.imports():
+    from app.views import view
+if cov is not None:
+    cov.stop()
+    cov.save()
+print(json.dumps(view.Main.answer.__func__.__code__.co_filename))
+"""
+
+
+@pytest.fixture
+def tree(tmp_path):
+    src = tmp_path / "src"
+    (src / "app" / "views").mkdir(parents=True)
+    (src / "app" / "__init__.py").touch()
+    (src / "app" / "views" / "__init__.py").touch()
+    shutil.copy(DATA / "test_simple.enaml", src / "app" / "views" / "view.enaml")
+    return src
+
+
+def frame(module):
+    return types.SimpleNamespace(f_globals={"__name__": module})
+
+
+def test_resolve(tree, tmp_path):
+    view = str(tree / "app" / "views" / "view.enaml")
+    resolver = SourceResolver([str(tree)])
+    assert resolver.resolve(view) == view
+    moved = "/build/worker/src/app/views/view.enaml"
+    assert resolver.resolve(moved) == view
+    assert resolver.resolve("C:\\build\\app\\views\\view.enaml") == view
+    assert resolver.resolve("/build/app.zip/app/views/missing.enaml") is None
+
+    # Relative filenames are resolved from the module executing the code.
+    assert resolver.resolve("view.enaml", "app.views.view") == view
+    assert resolver.search("view.enaml") is None
+
+    # The resolutions are memoised per filename.
+    searches = resolver.searches
+    assert resolver.resolve(moved) == view
+    assert resolver.resolve("view.enaml") == view
+    assert resolver.searches == searches
+
+
+def test_basename_alone_does_not_match(tree):
+    (tree / "view.enaml").touch()
+    view = str(tree / "app" / "views" / "view.enaml")
+    resolver = SourceResolver([str(tree)])
+    assert resolver.resolve("/build/other/view.enaml") is None
+    assert resolver.resolve("/build/app/views/view.enaml") == view
+
+
+def test_resolve_through_paths(tree, tmp_path):
+    other = tmp_path / "elsewhere"
+    shutil.copytree(tree, other)
+    view = str(other / "app" / "views" / "view.enaml")
+    resolver = SourceResolver(
+        [str(tree)], paths={"source": [str(other), "/ci/*/checkout/"]}
+    )
+    assert resolver.resolve("/ci/42/checkout/app/views/view.enaml") == view
+
+
+def test_plugin_relocated_tracer(tree, tmp_path):
+    plugin = EnamlCoveragePlugin({"include_roots": str(tree)})
+    view = str(tree / "app" / "views" / "view.enaml")
+    assert type(plugin.file_tracer(view)) is EnamlFileTracer
+
+    moved = "/build/src/app/views/view.enaml"
+    tracer = plugin.file_tracer(moved)
+    assert isinstance(tracer, EnamlRelocatedFileTracer)
+    assert tracer.has_dynamic_source_filename()
+    assert tracer.source_filename() == moved
+    assert tracer.dynamic_source_filename(moved, frame("app.views.view")) == view
+    assert tracer.dynamic_source_filename(moved, frame("other")) == view
+    assert ("relocated_source_searches", 1) in plugin.sys_info()
+
+    # Sources out of the scope are not traced, unresolved files keep their name.
+    outside = tmp_path / "outside.enaml"
+    outside.touch()
+    tracer = plugin.file_tracer("/build/outside.enaml")
+    assert tracer.dynamic_source_filename("/build/outside.enaml", frame("m")) is None
+    missing = os.path.join(str(tree), "missing.enaml")
+    tracer = plugin.file_tracer(missing)
+    assert tracer.dynamic_source_filename(missing, frame("missing")) == missing
+
+
+def test_excluded_code_is_not_relocated(tree, tmp_path):
+    frozen = tmp_path / "frozen"
+    plugin = EnamlCoveragePlugin(
+        {"include_roots": str(tree), "exclude_roots": str(frozen)}
+    )
+    assert plugin.file_tracer(str(frozen / "view.enaml")) is IGNORED_FILE_TRACER
+    assert plugin._resolver is None
+
+
+def test_sourceless_enaml_cache(tree, tmp_path):
+    # Deploy the files compiled at another location without their sources.
+    build = tmp_path / "build"
+    shutil.copytree(tree, build)
+    run = [sys.executable, "-c", IMPORT]
+    subprocess.run(run + [str(build)], check=True, stdout=subprocess.PIPE)
+    deploy = tmp_path / "deploy"
+    shutil.copytree(build, deploy, ignore=shutil.ignore_patterns("*.enaml"))
+    shutil.rmtree(build)
+
+    rcfile = tmp_path / ".coveragerc"
+    rcfile.write_text(
+        f"[run]\nplugins = enaml_coverage_plugin\nsource = {tree}\n",
+        encoding="utf-8",
+    )
+    data_file = str(tmp_path / ".coverage")
+    output = subprocess.run(
+        run + [str(deploy), data_file, str(rcfile)],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=str(tmp_path),
+    ).stdout
+    # The code still refers to the path it was compiled at.
+    assert json.loads(output).startswith(str(build))
+
+    import coverage
+
+    cov = coverage.Coverage(data_file=data_file, config_file=str(rcfile))
+    cov.load()
+    view = str(tree / "app" / "views" / "view.enaml")
+    assert view in cov.get_data().measured_files()
+    assert cov.get_data().lines(view)
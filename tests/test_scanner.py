@@ -0,0 +1,156 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the scanner collecting facts about the lines of enaml sources.
+
+"""
+import io
+import pathlib
+import token
+import tokenize
+
+import pytest
+
+from enaml_coverage_plugin.scanner import scan_source
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+def reference_scan(text, excluded):
+    """Tokenize based implementation of the scan, following coverage."""
+    excluded = set(excluded)
+    classdefs, docstrings, multiline = set(), set(), {}
+    indent = exclude_indent = nesting = 0
+    excluding = excluding_decorators = False
+    prev_toktype = token.INDENT
+    first_line = None
+    empty = first_on_line = True
+
+    tokens = list(tokenize.generate_tokens(io.StringIO(text).readline))
+    for i, (toktype, ttext, (slineno, _), (elineno, _), _) in enumerate(tokens):
+        if toktype == token.INDENT:
+            indent += 1
+        elif toktype == token.DEDENT:
+            indent -= 1
+        elif toktype == token.NAME:
+            if ttext in ("class", "enamldef"):
+                classdefs.add(slineno)
+        elif toktype == token.OP:
+            after = tokens[i - 1] if i else None
+            is_second_colon = (
+                ttext == ":"
+                and after is not None
+                and after.string == ":"
+                and after.end == tokens[i].start
+            )
+            if ttext == ":" and nesting == 0 and not is_second_colon:
+                should_exclude = (elineno in excluded) or excluding_decorators
+                if not excluding and should_exclude:
+                    excluded.add(elineno)
+                    exclude_indent = indent
+                    excluding = True
+                    excluding_decorators = False
+            elif ttext == "@" and first_on_line:
+                if elineno in excluded:
+                    excluding_decorators = True
+                if excluding_decorators:
+                    excluded.add(elineno)
+            elif ttext in "([{":
+                nesting += 1
+            elif ttext in ")]}":
+                nesting -= 1
+        elif toktype == token.STRING and prev_toktype == token.INDENT:
+            docstrings.update(range(slineno, elineno + 1))
+        elif toktype == token.NEWLINE:
+            if first_line is not None and elineno != first_line:
+                for line in range(first_line, elineno + 1):
+                    multiline[line] = first_line
+            first_line = None
+            first_on_line = True
+
+        if ttext.strip() and toktype != tokenize.COMMENT:
+            empty = False
+            if first_line is None:
+                first_line = slineno
+                if excluding and indent <= exclude_indent:
+                    excluding = False
+                if excluding:
+                    excluded.add(elineno)
+                first_on_line = False
+
+        prev_toktype = toktype
+
+    return classdefs, docstrings, excluded, multiline, empty
+
+
+SOURCES = {
+    "enamldef": (DATA / "test_simple.enaml").read_text(encoding="utf-8"),
+    "multiline": (
+        "enamldef Main(Window):\n"
+        "    attr a = (1,\n"
+        "        2)\n"
+        "    Label:\n"
+        "        text << ('a' +\n"
+        "                 'b')\n"
+        "        clicked ::\n"
+        "            x = [\n"
+        "                i for i in range(3)\n"
+        "            ]\n"
+        "            y = x \\\n"
+        "                + 1\n"
+    ),
+    "docstrings": (
+        '"""Module docstring."""\n'
+        "def f():\n"
+        "    # A comment before the docstring.\n"
+        "    r'''Multi-line\n"
+        "    docstring.'''\n"
+        "    return 1\n"
+        "class A:\n"
+        '    """Class docstring."""\n'
+        "\n"
+        "    def g(self):\n"
+        '        return "not a docstring"\n'
+    ),
+    "excluded": (
+        "def f():  # pragma: no cover\n"
+        "    a = 1\n"
+        "    b = '''\n"
+        "    '''\n"
+        "c = 2\n"
+        "@decorator  # pragma: no cover\n"
+        "@other\n"
+        "def g(\n"
+        "    x,\n"
+        "):\n"
+        "    return x\n"
+        "enamldef Main(Window):\n"
+        "    clicked :: # pragma: no cover\n"
+        "        print(1)\n"
+        "    d = {'a': 1}\n"
+        "    attr e : int = 1  # pragma: no cover\n"
+        "    attr f = 1"
+    ),
+    "tabs": "if a:\n\tif b:\n\t\tc = 1\n        d = 2\n",
+}
+
+
+@pytest.mark.parametrize("name", sorted(SOURCES))
+def test_scan_matches_tokenize(name):
+    text = SOURCES[name]
+    lines = text.splitlines()
+    excluded = {i for i, line in enumerate(lines, 1) if "pragma: no cover" in line}
+    assert tuple(scan_source(text, excluded)) == reference_scan(text, excluded)
+
+
+def test_scan_errors():
+    with pytest.raises(tokenize.TokenError):
+        scan_source("a = (1,\n", set())
+    with pytest.raises(tokenize.TokenError):
+        scan_source("a = '''\n", set())
+    with pytest.raises(IndentationError):
+        scan_source("if a:\n        b = 1\n    c = 2\n", set())
@@ -0,0 +1,78 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the selection of the traced enaml files.
+
+"""
+import os
+import pathlib
+
+import coverage
+import enaml
+
+from enaml_coverage_plugin.plugin import (
+    IGNORED_FILE_TRACER,
+    EnamlCoveragePlugin,
+    EnamlFileTracer,
+)
+from enaml_coverage_plugin.scope import TraceScope
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+ENAML_STDLIB = os.path.join(os.path.dirname(enaml.__file__), "stdlib", "fields.enaml")
+
+
+def test_default_scope():
+    scope = TraceScope()
+    assert not scope.should_trace(ENAML_STDLIB)
+    assert scope.should_trace(str(DATA / "test_simple.enaml"))
+
+
+def test_deepest_root_wins(tmp_path):
+    app = tmp_path / "app"
+    scope = TraceScope(
+        include_roots=[str(tmp_path), str(app / "vendored" / "mine")],
+        exclude_roots=[str(app / "vendored")],
+    )
+    assert scope.should_trace(str(app / "view.enaml"))
+    assert not scope.should_trace(str(app / "vendored" / "view.enaml"))
+    assert scope.should_trace(str(app / "vendored" / "mine" / "view.enaml"))
+    assert not scope.should_trace(str(DATA / "test_simple.enaml"))
+
+
+def test_decisions_cached_per_directory(tmp_path):
+    scope = TraceScope(exclude_roots=[])
+    for i in range(5):
+        assert scope.should_trace(str(tmp_path / f"view_{i}.enaml"))
+    assert list(scope._decisions) == [str(tmp_path)]
+
+
+def test_plugin_file_tracer(tmp_path):
+    plugin = EnamlCoveragePlugin({"exclude_roots": f"\n{tmp_path}\n"})
+    (tmp_path / "view.enaml").touch()
+    assert plugin.file_tracer(str(tmp_path / "view.enaml")) is IGNORED_FILE_TRACER
+    assert IGNORED_FILE_TRACER.has_dynamic_source_filename()
+    assert IGNORED_FILE_TRACER.dynamic_source_filename("view.enaml", None) is None
+    assert isinstance(plugin.file_tracer(ENAML_STDLIB), EnamlFileTracer)
+    assert plugin.file_tracer(str(tmp_path / "module.py")) is None
+
+    # The source directories are always traced.
+    cov = coverage.Coverage(config_file=False, source=[str(tmp_path)])
+    plugin.configure(cov.config)
+    tracer = plugin.file_tracer(str(tmp_path / "view.enaml"))
+    assert isinstance(tracer, EnamlFileTracer)
+
+
+def test_third_party_left_to_coverage():
+    plugin = EnamlCoveragePlugin()
+    plugin.configure(coverage.Coverage(config_file=False).config)
+    assert not plugin._scope.should_trace(ENAML_STDLIB)
+    assert isinstance(plugin.file_tracer(ENAML_STDLIB), EnamlFileTracer)
+
+    # Coverage traces third-party files matching its include patterns.
+    plugin.configure(coverage.Coverage(config_file=False, include=["*"]).config)
+    assert plugin.file_tracer(ENAML_STDLIB) is IGNORED_FILE_TRACER
@@ -0,0 +1,114 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the analysis server shared by the report jobs.
+
+"""
+import os
+import pathlib
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+
+import pytest
+
+from enaml_coverage_plugin import clear_analysis_cache
+from enaml_coverage_plugin.cache import source_digest
+from enaml_coverage_plugin.exclusion import LinePatterns
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+from enaml_coverage_plugin.reporter import EnamlFileReporter
+from enaml_coverage_plugin.server import (
+    HAS_UNIX_SOCKETS,
+    AnalysisClient,
+    AnalysisServer,
+)
+
+pytestmark = pytest.mark.skipif(not HAS_UNIX_SOCKETS, reason="requires AF_UNIX")
+
+FILENAME = str(pathlib.Path(__file__).parent / "data" / "test_simple.enaml")
+
+
+@pytest.fixture
+def socket_dir():
+    # The path of a Unix socket is limited to about a hundred characters.
+    directory = tempfile.mkdtemp(prefix="enaml-")
+    yield directory
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def server(socket_dir):
+    server = AnalysisServer(os.path.join(socket_dir, "server.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def digest(filename):
+    return source_digest(EnamlFileReporter(filename).source())
+
+
+@pytest.mark.parametrize("branch", [False, True])
+def test_analyse(server, branch):
+    client = AnalysisClient(server.path)
+    patterns = LinePatterns()
+    analysis = client.analyse(FILENAME, digest(FILENAME), patterns, branch)
+    expected = EnamlFileReporter(FILENAME, branch=branch)._analyse()
+    assert analysis.to_dict() == expected.to_dict()
+    client.analyse(FILENAME, digest(FILENAME), patterns, branch)
+    assert client.request({"command": "stats"}) == {
+        "requests": 3,
+        "hits": 1,
+        "misses": 1,
+    }
+    client.close()
+
+
+def test_stale_source(server):
+    client = AnalysisClient(server.path)
+    assert client.analyse(FILENAME, "outdated", LinePatterns(), True) is None
+    assert client.available
+    assert client.request({"command": "unknown"})["error"]
+
+
+def test_unreachable_server(socket_dir):
+    client = AnalysisClient(os.path.join(socket_dir, "missing.sock"))
+    reporter = EnamlFileReporter(FILENAME, server=client)
+    assert reporter.lines() == EnamlFileReporter(FILENAME).lines()
+    assert not client.available
+    assert client.analyse(FILENAME, digest(FILENAME), LinePatterns(), True) is None
+    assert client.requests == 1
+
+
+def test_plugin_uses_server(server):
+    clear_analysis_cache()
+    plugin = EnamlCoveragePlugin({"server": server.path})
+    reporter = plugin.file_reporter(FILENAME)
+    assert reporter.lines() == EnamlFileReporter(FILENAME).lines()
+    assert ("analysis_server_answers", 1) in plugin.sys_info()
+
+
+def test_socket_owner_only(server):
+    assert stat.S_IMODE(os.stat(server.path).st_mode) == 0o600
+
+
+def test_socket_in_use(server, socket_dir):
+    with pytest.raises(OSError, match="already listening"):
+        AnalysisServer(server.path)
+
+    # A socket left over by a server which was killed is replaced.
+    path = os.path.join(socket_dir, "stale.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+    other = AnalysisServer(path)
+    other.server_close()
+    assert not os.path.exists(path)
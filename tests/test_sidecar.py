@@ -0,0 +1,133 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the analyses exported to a sidecar of the coverage data.
+
+"""
+import json
+import pathlib
+import subprocess
+import sys
+
+import pytest
+from coverage.data import CoverageData
+
+from enaml_coverage_plugin.__main__ import main
+from enaml_coverage_plugin.cache import source_digest
+from enaml_coverage_plugin.exclusion import LinePatterns
+from enaml_coverage_plugin.firsthit import PLUGIN_NAME
+from enaml_coverage_plugin.reporter import EnamlFileReporter
+from enaml_coverage_plugin.sidecar import Sidecar, export_sidecar, sidecar_path
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+REPORT = """\
+import io
+import json
+import sys
+
+# Make enaml and atom unimportable, as in an environment lacking them.
+for name in ("enaml", "atom"):
+    sys.modules[name] = None
+
+import coverage
+
+from enaml_coverage_plugin.plugin import EnamlCoveragePlugin
+
+cov = coverage.Coverage(data_file=sys.argv[1], config_file=sys.argv[2])
+cov.load()
+output = io.StringIO()
+total = cov.report(file=output, show_missing=True)
+info = dict(EnamlCoveragePlugin().sys_info())
+print(json.dumps([total, output.getvalue(), info, sorted(sys.modules)]))
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "view.enaml"
+    path.write_text((DATA / "test_simple.enaml").read_text(encoding="utf-8"))
+    return str(path)
+
+
+def test_export(source, tmp_path):
+    output = str(tmp_path / "analyses.json.gz")
+    broken = tmp_path / "broken.enaml"
+    broken.write_text("enamldef Broken(\n", encoding="utf-8")
+    export_sidecar([source, str(broken)], output, workers=1)
+
+    sidecar = Sidecar.load(output)
+    assert len(sidecar) == 2 and str(broken) in sidecar
+    expected = EnamlFileReporter(source)._analyse().to_dict()
+    digest = source_digest(EnamlFileReporter(source).source())
+    assert sidecar.get(source, LinePatterns(), digest).to_dict() == expected
+    assert sidecar.get(source, LinePatterns(), None).to_dict() == expected
+    assert sidecar.get(source, LinePatterns(), "outdated") is None
+    assert sidecar.get(source, LinePatterns(exclude=("never",)), digest) is None
+    assert "Couldn't parse" in sidecar.get(str(broken), LinePatterns(), None).error
+    assert Sidecar.load(str(tmp_path / "missing.json.gz")) is None
+
+
+def test_export_deleted_file(source, tmp_path):
+    output = str(tmp_path / "analyses.json.gz")
+    deleted = str(tmp_path / "deleted.enaml")
+    with pytest.warns(RuntimeWarning, match="deleted.enaml"):
+        sidecar = export_sidecar([source, deleted], output, workers=1)
+    assert source in sidecar and deleted not in sidecar
+
+
+def test_reporter_without_source(source, tmp_path):
+    output = str(tmp_path / "analyses.json.gz")
+    export_sidecar([source], output, workers=1)
+    expected = EnamlFileReporter(source)
+    lines, arcs, exit_counts = expected.lines(), expected.arcs(), expected.exit_counts()
+    start, end = sorted(arcs)[-1]
+    description = expected.missing_arc_description(start, end)
+    pathlib.Path(source).unlink()
+
+    reporter = EnamlFileReporter(source, branch=False, sidecar=Sidecar.load(output))
+    assert reporter.lines() == lines
+    assert reporter.arcs() == arcs
+    assert reporter.exit_counts() == exit_counts
+    assert reporter.missing_arc_description(start, end) == description
+
+
+def test_report_without_enaml(source, tmp_path):
+    rcfile = tmp_path / ".coveragerc"
+    rcfile.write_text(
+        "[run]\nplugins = enaml_coverage_plugin\nbranch = True\n"
+        "[report]\nignore_errors = True\n",
+        encoding="utf-8",
+    )
+    # Files which cannot be parsed are stored as such in the sidecar.
+    broken = str(tmp_path / "broken.enaml")
+    pathlib.Path(broken).write_text("enamldef Broken(\n", encoding="utf-8")
+    data_file = str(tmp_path / ".coverage")
+    data = CoverageData(basename=data_file)
+    arcs = sorted(EnamlFileReporter(source).arcs())
+    data.add_arcs({source: arcs[: len(arcs) // 2], broken: [(-1, 1)]})
+    data.add_file_tracers({source: PLUGIN_NAME, broken: PLUGIN_NAME})
+    data.write()
+
+    argv = ["export", "--rcfile", str(rcfile), "--data-file", data_file]
+    assert main(argv + ["--workers", "1"]) == 0
+    assert Sidecar.load(sidecar_path(data_file)) is not None
+
+    process = subprocess.run(
+        [sys.executable, "-c", REPORT, data_file, str(rcfile)],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        cwd=str(tmp_path),
+    )
+    total, report, info, modules = json.loads(process.stdout)
+    assert 0 < total < 100
+    assert "view.enaml" in report and "broken.enaml" not in report
+    assert "Couldn't parse" in process.stderr and "broken.enaml" in process.stderr
+    assert info["enaml_cache_hits"] == 0
+    assert not [m for m in modules if m.startswith(("enaml.", "atom."))]
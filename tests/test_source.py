@@ -0,0 +1,79 @@
+# -----------------------------------------------------------------------------
+# Copyright 2016-2023 by Enaml coverage Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the loading of the sources of the enaml files.
+
+"""
+import pathlib
+
+from enaml_coverage_plugin.cache import AnalysisCache, MemoryCache
+from enaml_coverage_plugin.reporter import EnamlFileReporter
+from enaml_coverage_plugin.source import SourceLoader
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+SOURCE = (DATA / "test_simple.enaml").read_text(encoding="utf-8")
+
+
+def test_single_read(tmp_path):
+    sources = SourceLoader()
+    reporter = EnamlFileReporter(
+        str(DATA / "test_simple.enaml"),
+        cache=AnalysisCache(str(tmp_path)),
+        memory=MemoryCache(),
+        sources=sources,
+    )
+    reporter.lines()
+    reporter.arcs()
+    assert reporter.source() == SOURCE
+    assert sources.reads == 1
+
+
+def test_encoding_declaration(tmp_path):
+    path = tmp_path / "latin.enaml"
+    source = "# -*- coding: latin-1 -*-\n" + SOURCE.replace("Test handling", "Été")
+    path.write_bytes(source.encode("latin-1"))
+    reference = tmp_path / "utf8.enaml"
+    reference.write_text(source.replace("latin-1", "utf-8"), encoding="utf-8")
+    reporter = EnamlFileReporter(str(path))
+    assert reporter.source() == source
+    assert reporter.lines() == EnamlFileReporter(str(reference)).lines()
+
+
+def test_newlines(tmp_path):
+    path = tmp_path / "crlf.enaml"
+    path.write_bytes(SOURCE.replace("\n", "\r\n").encode("utf-8"))
+    assert EnamlFileReporter(str(path)).source() == SOURCE
+
+
+def test_eviction(tmp_path):
+    sources = SourceLoader(maxsize=2)
+    paths = []
+    for i in range(3):
+        paths.append(str(tmp_path / f"view_{i}.enaml"))
+        pathlib.Path(paths[-1]).write_text(SOURCE)
+        sources.get(paths[-1])
+    assert paths[0] not in sources and paths[2] in sources
+    sources.get(paths[0])
+    assert sources.reads == 4
+
+
+def test_read_ahead(tmp_path):
+    sources = SourceLoader(read_ahead=2)
+    paths = []
+    for i in range(4):
+        paths.append(str(tmp_path / f"view_{i}.enaml"))
+        pathlib.Path(paths[-1]).write_text(SOURCE + f"# {i}\n")
+        sources.register(paths[-1])
+
+    assert sources.get(paths[0]).endswith("# 0\n")
+    # The next two registered files are being read in the background.
+    assert sources.reads == 3
+    for i, path in enumerate(paths):
+        assert sources.get(path).endswith(f"# {i}\n")
+    assert sources.reads == 4
+    sources.clear()